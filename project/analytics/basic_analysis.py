@@ -1,9 +1,21 @@
+import os
+import json
+import hashlib
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import sqlite3
-def plot_and_save_graph(data, x_col, y_col, y_label, title, output_path, color, scale_factor=None):
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+HASH_SUFFIX = '.sha256'
+
+def chart_spec(data, x_col, y_col, y_label, title, output_path, color, scale_factor=None):
     """
-    Plots a graph for the given data and saves it as a PNG file.
+    Build a self-contained description of one line chart.
+
+    The x/y columns are copied out of ``data`` as NumPy arrays, so the spec can
+    be sent to a worker process and ``data`` itself is never modified.
 
     Parameters:
     - data: DataFrame containing the data to plot.
@@ -15,70 +27,159 @@ def plot_and_save_graph(data, x_col, y_col, y_label, title, output_path, color,
     - color: Color of the plot line.
     - scale_factor: Factor to scale the y-axis values, if needed.
     """
-    plt.figure(figsize=(12, 6))
+    y = pd.to_numeric(data[y_col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
     if scale_factor:
-        data[y_col] = data[y_col] / scale_factor
+        y = y / scale_factor
         y_label = f'{y_label} (scaled by {scale_factor})'
-    plt.plot(data[x_col], data[y_col], color=color, label=y_label)
-    plt.xlabel('Timestamp')
-    plt.ylabel(y_label)
-    plt.title(title)
-    plt.grid(visible=True, linestyle='--', linewidth=0.5)
-    plt.legend()
-    plt.savefig(output_path)
-    plt.close()
+    return {
+        'x': data[x_col].to_numpy(),
+        'y': y,
+        'y_label': y_label,
+        'title': title,
+        'output_path': output_path,
+        'color': color,
+    }
+
+def spec_digest(spec):
+    """Hash a chart spec's data and styling; the PNG only needs re-rendering when this changes."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(spec['x']).tobytes())
+    digest.update(str(spec['x'].dtype).encode())
+    digest.update(np.ascontiguousarray(spec['y']).tobytes())
+    styling = {key: value for key, value in spec.items() if key not in ('x', 'y', 'output_path')}
+    digest.update(json.dumps(styling, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def is_up_to_date(spec, digest):
+    """Return True if the spec's PNG exists and its hash sidecar matches ``digest``."""
+    hash_path = spec['output_path'] + HASH_SUFFIX
+    if not (os.path.exists(spec['output_path']) and os.path.exists(hash_path)):
+        return False
+    with open(hash_path, 'r') as hash_file:
+        return hash_file.read().strip() == digest
+
+def render_chart(spec):
+    """
+    Render one chart spec to its PNG with the object-oriented Agg API.
+
+    No pyplot state is touched, so specs can be rendered concurrently in worker
+    processes. The PNG is written to a temporary file and moved into place,
+    then the spec hash is recorded next to it.
+    """
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(spec['x'], spec['y'], color=spec['color'], label=spec['y_label'])
+    ax.set_xlabel('Timestamp')
+    ax.set_ylabel(spec['y_label'])
+    ax.set_title(spec['title'])
+    ax.grid(visible=True, linestyle='--', linewidth=0.5)
+    ax.legend()
+
+    output_path = spec['output_path']
+    tmp_path = f"{output_path}.tmp.png"
+    fig.savefig(tmp_path)
+    os.replace(tmp_path, output_path)
+    with open(output_path + HASH_SUFFIX, 'w') as hash_file:
+        hash_file.write(spec_digest(spec))
     print(f"Saved plot to {output_path}.")
+    return output_path
+
+def render_charts(specs, max_workers=None):
+    """
+    Render a list of chart specs, skipping charts whose data and styling are unchanged.
+
+    Stale charts are rendered in a process pool when there is more than one of
+    them; ``max_workers=1`` renders them in the calling process.
+
+    Returns a dict mapping each output path to 'rendered' or 'skipped'.
+    """
+    results = {}
+    stale = []
+    for spec in specs:
+        if is_up_to_date(spec, spec_digest(spec)):
+            print(f"Plot {spec['output_path']} is up to date.")
+            results[spec['output_path']] = 'skipped'
+        else:
+            stale.append(spec)
+
+    if len(stale) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(stale))) as executor:
+            list(executor.map(render_chart, stale))
+    else:
+        for spec in stale:
+            render_chart(spec)
+    results.update((spec['output_path'], 'rendered') for spec in stale)
+    return results
 
-def plot_separate_graphs_with_normalization_and_save(db_path, table_name, volume_scale_factor=1000, output_dir='./'):
+def plot_and_save_graph(data, x_col, y_col, y_label, title, output_path, color, scale_factor=None):
+    """
+    Plots a graph for the given data and saves it as a PNG file.
+
+    Parameters:
+    - data: DataFrame containing the data to plot; it is not modified.
+    - x_col: Column name for the x-axis.
+    - y_col: Column name for the y-axis.
+    - y_label: Label for the y-axis.
+    - title: Title of the plot.
+    - output_path: Path to save the PNG image.
+    - color: Color of the plot line.
+    - scale_factor: Factor to scale the y-axis values, if needed.
+    """
+    render_chart(chart_spec(data, x_col, y_col, y_label, title, output_path, color, scale_factor))
+
+def plot_separate_graphs_with_normalization_and_save(db_path, table_name, volume_scale_factor=1000, output_dir='./', max_workers=None):
     """
     Plots and saves separate graphs for price and normalized volume from the merged data.
 
+    Charts whose data and styling have not changed since the last run are
+    skipped; the others are rendered in parallel (see ``render_charts``).
+
     Parameters:
     - db_path: Path to the SQLite database file.
     - table_name: Name of the table containing merged data.
     - volume_scale_factor: Factor to scale down the volume for better visualization.
     - output_dir: Directory to save the PNG images.
+    - max_workers: Worker processes used for rendering; 1 renders in-process.
     """
     try:
         # Connect to the SQLite database
         conn = sqlite3.connect(db_path)
-        
+
         # Load the merged data into a DataFrame
         query = f"SELECT * FROM {table_name}"
         merged_df = pd.read_sql_query(query, conn)
-        
+
         # Ensure the timestamp column is datetime
         merged_df['timestamp'] = pd.to_datetime(merged_df['timestamp'])
-        
+
         # Close the connection
         conn.close()
-        
-        # Plot and save Price graph
-        plot_and_save_graph(
-            data=merged_df,
-            x_col='timestamp',
-            y_col='price',
-            y_label='Price',
-            title='Gasoline Prices Over Time',
-            output_path=f"{output_dir}/gasoline_prices.png",
-            color='tab:blue'
-        )
-
-        # Plot and save Normalized Volume graph
-        plot_and_save_graph(
-            data=merged_df,
-            x_col='timestamp',
-            y_col='volume',
-            y_label='Volume',
-            title='Normalized EV Volume Over Time',
-            output_path=f"{output_dir}/normalized_ev_volume.png",
-            color='tab:orange',
-            scale_factor=volume_scale_factor
-        )
-        
-    except Exception as e:
-        print(f"Error plotting and saving graphs: {e}")
-
 
+        specs = [
+            # Price graph
+            chart_spec(
+                data=merged_df,
+                x_col='timestamp',
+                y_col='price',
+                y_label='Price',
+                title='Gasoline Prices Over Time',
+                output_path=f"{output_dir}/gasoline_prices.png",
+                color='tab:blue'
+            ),
+            # Normalized Volume graph
+            chart_spec(
+                data=merged_df,
+                x_col='timestamp',
+                y_col='volume',
+                y_label='Volume',
+                title='Normalized EV Volume Over Time',
+                output_path=f"{output_dir}/normalized_ev_volume.png",
+                color='tab:orange',
+                scale_factor=volume_scale_factor
+            ),
+        ]
+        return render_charts(specs, max_workers=max_workers)
 
- 
\ No newline at end of file
+    except Exception as e:
+        print(f"Error plotting and saving graphs: {e}")
@@ -0,0 +1,126 @@
+import sqlite3
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LAG = 24
+DEFAULT_MIN_PERIODS = 3
+
+
+def correlate(a, b, size, max_lag):
+    """
+    Return sum_t a[t] * b[:, t + k] for k = -max_lag..max_lag, computed with one FFT product.
+
+    ``a`` has shape (n,) and ``b`` shape (series, n); both are zero-padded to
+    ``size`` so the circular correlation equals the linear one.
+    """
+    product = np.conj(np.fft.rfft(a, size))[np.newaxis, :] * np.fft.rfft(b, size, axis=1)
+    circular = np.fft.irfft(product, size, axis=1)
+    # Lag k >= 0 sits at index k, lag -k at index size - k
+    return np.concatenate([circular[:, size - max_lag:], circular[:, :max_lag + 1]], axis=1)
+
+
+def lagged_cross_correlation(reference, series, max_lag=DEFAULT_MAX_LAG, min_periods=DEFAULT_MIN_PERIODS):
+    """
+    Pearson correlation of every series with ``reference`` at every lag in -max_lag..max_lag.
+
+    The value at lag ``k`` pairs ``reference[t]`` with ``series[t + k]``, i.e.
+    ``pd.Series(reference).corr(pd.Series(column).shift(-k))``: a positive lag
+    means the reference (e.g. the gas price) leads the series. As in pandas,
+    each lag uses only the overlapping pairs where both values are present,
+    with their own means and variances.
+
+    All overlap counts, sums, sums of squares and cross products are
+    cross-correlations of masked arrays, so the whole (series x lags) matrix
+    comes from a handful of batched FFTs instead of a loop over lags.
+
+    Parameters:
+    - reference: 1-D array-like of length n (NaN allowed).
+    - series: 2-D array-like of shape (n, number of series), one column per series (NaN allowed).
+    - max_lag: Largest lag scanned in either direction.
+    - min_periods: Minimum number of overlapping pairs; fewer gives NaN.
+
+    Returns a tuple (lags, matrix) with ``matrix`` of shape (number of series, 2 * max_lag + 1).
+    """
+    x = np.asarray(reference, dtype='float64')
+    y = np.asarray(series, dtype='float64')
+    if y.ndim == 1:
+        y = y[:, np.newaxis]
+    if y.shape[0] != x.shape[0]:
+        raise ValueError(f"The series have {y.shape[0]} observations but the reference has {x.shape[0]}.")
+    n = x.shape[0]
+    max_lag = min(int(max_lag), n - 1)
+    y = y.T
+
+    mask_x, mask_y = ~np.isnan(x), ~np.isnan(y)
+    # Pearson correlation is shift-invariant; centring keeps the sums small and well conditioned
+    x = np.where(mask_x, x - (x[mask_x].mean() if mask_x.any() else 0.0), 0.0)
+    y_means = np.where(mask_y, y, 0.0).sum(axis=1, keepdims=True) / np.maximum(mask_y.sum(axis=1, keepdims=True), 1)
+    y = np.where(mask_y, y - y_means, 0.0)
+    mx, my = mask_x.astype('float64'), mask_y.astype('float64')
+
+    size = 1 << int(np.ceil(np.log2(max(2 * n - 1, 1))))
+    count = np.rint(correlate(mx, my, size, max_lag))
+    sum_x = correlate(x, my, size, max_lag)
+    sum_y = correlate(mx, y, size, max_lag)
+    sum_xx = correlate(x * x, my, size, max_lag)
+    sum_yy = correlate(mx, y * y, size, max_lag)
+    sum_xy = correlate(x, y, size, max_lag)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = count * sum_xy - sum_x * sum_y
+        variance = (count * sum_xx - sum_x ** 2) * (count * sum_yy - sum_y ** 2)
+        matrix = covariance / np.sqrt(variance)
+    matrix[(count < max(min_periods, 2)) | ~(variance > 0)] = np.nan
+    return np.arange(-max_lag, max_lag + 1), np.clip(matrix, -1.0, 1.0)
+
+
+def best_lags(reference, series, max_lag=DEFAULT_MAX_LAG, min_periods=DEFAULT_MIN_PERIODS, names=None):
+    """
+    Find the lag with the strongest correlation (largest absolute value) for each series.
+
+    Parameters are those of ``lagged_cross_correlation``; ``names`` labels the
+    series (a DataFrame's columns are used by default).
+
+    Returns a DataFrame with one row per series: series, best_lag and
+    correlation (signed). Series without any valid lag get NaN.
+    """
+    lags, matrix = lagged_cross_correlation(reference, series, max_lag=max_lag, min_periods=min_periods)
+    if names is None:
+        names = list(series.columns) if isinstance(series, pd.DataFrame) else list(range(matrix.shape[0]))
+    valid = ~np.isnan(matrix).all(axis=1)
+    best = np.argmax(np.where(np.isnan(matrix), -np.inf, np.abs(matrix)), axis=1)
+    rows = np.arange(matrix.shape[0])
+    return pd.DataFrame({
+        'series': names,
+        'best_lag': pd.Series(lags[best], dtype='Int64').mask(~valid),
+        'correlation': np.where(valid, matrix[rows, best], np.nan),
+    })
+
+
+def scan_merged_data(db_path, table_name='merged_data', max_lag=DEFAULT_MAX_LAG, min_periods=DEFAULT_MIN_PERIODS):
+    """
+    Scan the lagged correlation of the gas price with every volume column of ``table_name``.
+
+    The total ``volume`` and any per-source ``volume_<name>`` columns (see
+    data_transform.ev_sources) are scanned in one batch. A positive best lag
+    means the gas price leads EV registrations by that many months.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            merged_df = pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY timestamp", conn)
+        finally:
+            conn.close()
+        columns = [column for column in merged_df.columns if column == 'volume' or column.startswith('volume_')]
+        result = best_lags(merged_df['price'], merged_df[columns], max_lag=max_lag, min_periods=min_periods)
+        logger.info(f"Scanned {len(columns)} volume series against the gas price over lags -{max_lag}..{max_lag}.")
+        return result
+    except Exception as e:
+        logger.error(f"Error scanning lagged correlations: {e}")
+        raise
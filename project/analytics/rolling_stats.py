@@ -0,0 +1,180 @@
+import math
+import logging
+from collections import deque
+
+import pandas as pd
+
+import data_transform.storage as storage
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+STATS_TABLE = 'rolling_stats'
+DEFAULT_WINDOW = 12
+STAT_COLUMNS = ['price_mean', 'price_std', 'price_zscore', 'volume_mean', 'volume_std', 'volume_zscore', 'price_volume_corr']
+
+
+def new_window(size):
+    """
+    Start an empty sliding window over (price, volume) pairs.
+
+    The state keeps Welford-style running means, sums of squared deviations
+    (m2) and the co-moment of the two series, so each push updates the
+    statistics in constant time instead of rescanning the window.
+    """
+    if size < 2:
+        raise ValueError("The rolling window needs at least 2 observations.")
+    return {'size': size, 'values': deque(), 'n': 0, 'mean_x': 0.0, 'mean_y': 0.0, 'm2_x': 0.0, 'm2_y': 0.0, 'c_xy': 0.0}
+
+
+def add_value(state, x, y):
+    """Add one observation to the running moments."""
+    state['n'] += 1
+    dx = x - state['mean_x']
+    state['mean_x'] += dx / state['n']
+    dy = y - state['mean_y']
+    state['mean_y'] += dy / state['n']
+    state['m2_x'] += dx * (x - state['mean_x'])
+    state['m2_y'] += dy * (y - state['mean_y'])
+    state['c_xy'] += dx * (y - state['mean_y'])
+
+
+def remove_value(state, x, y):
+    """Remove one observation from the running moments (the inverse of ``add_value``)."""
+    state['n'] -= 1
+    if state['n'] == 0:
+        state.update(mean_x=0.0, mean_y=0.0, m2_x=0.0, m2_y=0.0, c_xy=0.0)
+        return
+    dx = x - state['mean_x']
+    state['mean_x'] -= dx / state['n']
+    dy = y - state['mean_y']
+    state['mean_y'] -= dy / state['n']
+    state['m2_x'] -= dx * (x - state['mean_x'])
+    state['m2_y'] -= dy * (y - state['mean_y'])
+    state['c_xy'] -= dx * (y - state['mean_y'])
+
+
+def push(state, x, y):
+    """
+    Slide the window forward by one observation.
+
+    Returns the statistics of the full window ending at (x, y), or None while
+    fewer than ``size`` observations have been seen (like pandas' rolling
+    with the default ``min_periods``).
+    """
+    if len(state['values']) == state['size']:
+        remove_value(state, *state['values'].popleft())
+    state['values'].append((x, y))
+    add_value(state, x, y)
+    if state['n'] < state['size']:
+        return None
+    return window_stats(state, x, y)
+
+
+def window_stats(state, x, y):
+    """Mean, sample standard deviation and z-score of both series, and their correlation."""
+    n = state['n']
+    # Subtracting removed values can leave tiny negative residues instead of 0
+    var_x, var_y = max(state['m2_x'], 0.0) / (n - 1), max(state['m2_y'], 0.0) / (n - 1)
+    std_x, std_y = math.sqrt(var_x), math.sqrt(var_y)
+    denominator = math.sqrt(max(state['m2_x'], 0.0) * max(state['m2_y'], 0.0))
+    return {
+        'price_mean': state['mean_x'],
+        'price_std': std_x,
+        'price_zscore': (x - state['mean_x']) / std_x if std_x > 0 else None,
+        'volume_mean': state['mean_y'],
+        'volume_std': std_y,
+        'volume_zscore': (y - state['mean_y']) / std_y if std_y > 0 else None,
+        'price_volume_corr': state['c_xy'] / denominator if denominator > 0 else None,
+    }
+
+
+def create_stats_table(conn, stats_table):
+    """Create the rolling statistics table; inputs are kept so changed months can be detected."""
+    columns = ', '.join(f"{column} REAL" for column in STAT_COLUMNS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {stats_table} ("
+        f"timestamp TEXT PRIMARY KEY, window_size INTEGER NOT NULL, price REAL, volume REAL, {columns})"
+    )
+
+
+def first_changed_month(conn, table_name, stats_table, window):
+    """
+    Return the earliest timestamp whose statistics are missing or stale, or None if all are current.
+
+    A month is stale when its price or volume differs from the inputs stored
+    with its statistics, or when it was computed with another window size.
+    Statistics of months that left ``table_name`` count as changes too.
+    """
+    row = conn.execute(
+        f"""
+        SELECT MIN(timestamp) FROM (
+            SELECT m.timestamp FROM {table_name} m
+            LEFT JOIN {stats_table} r ON r.timestamp = m.timestamp
+            WHERE r.timestamp IS NULL OR r.window_size != ? OR r.price IS NOT m.price OR r.volume IS NOT m.volume
+            UNION ALL
+            SELECT r.timestamp FROM {stats_table} r
+            WHERE r.timestamp NOT IN (SELECT timestamp FROM {table_name})
+        )
+        """,
+        (window,),
+    ).fetchone()
+    return row[0]
+
+
+def update_rolling_stats(db_path, table_name='merged_data', window=DEFAULT_WINDOW, stats_table=STATS_TABLE):
+    """
+    Bring the rolling price/volume statistics table up to date with ``table_name``.
+
+    Only the months from the first new or changed month onwards are
+    recomputed: the window state is seeded from the ``window - 1`` months
+    before it and then streamed forward, so appending months costs O(window)
+    per new month instead of a pass over the full history.
+
+    Parameters:
+    - db_path: Path to the SQLite database holding ``table_name``.
+    - table_name: Table with timestamp, price and volume columns.
+    - window: Number of months in each rolling window.
+    - stats_table: Table the statistics are written to, next to ``table_name``.
+
+    Returns the number of months (re)computed.
+    """
+    try:
+        with storage.transaction(db_path) as conn:
+            create_stats_table(conn, stats_table)
+            start = first_changed_month(conn, table_name, stats_table, window)
+            if start is None:
+                logger.info(f"Rolling statistics in {stats_table} are up to date.")
+                return 0
+            conn.execute(f"DELETE FROM {stats_table} WHERE timestamp >= ? OR window_size != ?", (start, window))
+            seed = conn.execute(
+                f"SELECT price, volume FROM {table_name} WHERE timestamp < ? ORDER BY timestamp DESC LIMIT ?",
+                (start, window - 1),
+            ).fetchall()
+            state = new_window(window)
+            for price, volume in reversed(seed):
+                push(state, price, volume)
+
+            rows = []
+            for timestamp, price, volume in conn.execute(
+                f"SELECT timestamp, price, volume FROM {table_name} WHERE timestamp >= ? ORDER BY timestamp", (start,)
+            ):
+                stats = push(state, price, volume) or {}
+                rows.append((timestamp, window, price, volume, *(stats.get(column) for column in STAT_COLUMNS)))
+            placeholders = ', '.join('?' * (len(STAT_COLUMNS) + 4))
+            conn.executemany(f"INSERT INTO {stats_table} VALUES ({placeholders})", rows)
+        logger.info(f"Updated {len(rows)} months of rolling statistics from {start}.")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error updating rolling statistics: {e}")
+        raise
+
+
+def load_rolling_stats(db_path, stats_table=STATS_TABLE):
+    """Load the rolling statistics table as a DataFrame with datetime timestamps."""
+    conn = storage.get_connection(db_path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {stats_table} ORDER BY timestamp", conn, parse_dates=['timestamp'])
+    finally:
+        storage.release(conn)
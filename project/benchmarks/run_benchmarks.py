@@ -0,0 +1,258 @@
+"""
+Benchmark the ETL stages on synthetic data and flag regressions against a stored baseline.
+
+No baseline is committed, since timings depend on the machine. Create one
+on the machine that runs the comparison, then rerun to compare:
+
+    python project/benchmarks/run_benchmarks.py --save-baseline
+    python project/benchmarks/run_benchmarks.py
+
+Results are keyed '<benchmark>@<scale>'. The weekly gas series is capped at
+``synthetic.MAX_GAS_WEEKS`` rows, so the gas benchmarks are keyed by the row
+count they actually ran on and are measured once for all larger scales.
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+
+# Add the project directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import pandas as pd
+
+from instrumentation import new_report, measure
+from benchmarks import synthetic
+from data_transform.ev_sales_data import preprocess_ev_sales_data
+from data_transform.trasform_gas_data import transform_and_store_data
+from data_transform.pre_process import process_gas_data, process_ev_data, merge_data, save_to_db
+from analytics.basic_analysis import plot_separate_graphs_with_normalization_and_save
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SCALES = '10k,100k'
+COMPARED_METRICS = ('wall_seconds', 'tracemalloc_peak_bytes')
+# Timings below this are dominated by noise and never flagged
+MIN_SECONDS = 0.01
+# Benchmarks fed by the weekly gas series, which synthetic.gas_weekly caps at MAX_GAS_WEEKS rows
+GAS_BENCHMARKS = ('transform_and_store_data', 'process_gas_data')
+
+
+def prepare_inputs(rows, workdir, seed=0):
+    """
+    Return a getter for the benchmark inputs of one scale; nothing here is timed.
+
+    Each input is generated on its first request and reused afterwards, so a
+    run restricted with ``--only`` builds just the inputs its benchmarks read.
+    """
+    log_file = os.path.join(workdir, 'log.txt')
+    builders = {
+        'raw_ev': lambda: synthetic.ev_registrations(rows, seed=seed),
+        'raw_gas': lambda: synthetic.gas_weekly(rows, seed=seed),
+        'gas_prices': lambda: synthetic.gas_prices(rows, seed=seed),
+        'ev_sales': lambda: synthetic.ev_sales(rows, seed=seed),
+        'gas_monthly': lambda: process_gas_data(get('gas_prices').copy(), log_file),
+        'ev_monthly': lambda: process_ev_data(get('ev_sales').copy()),
+        'merged': lambda: merge_data(get('gas_monthly').copy(), get('ev_monthly').copy(), None, log_file),
+        'log_file': lambda: log_file,
+        'workdir': lambda: workdir,
+    }
+    built = {}
+
+    def get(name):
+        if name not in built:
+            built[name] = builders[name]()
+        return built[name]
+
+    return get
+
+
+def fresh_path(path):
+    """Remove ``path`` (file or directory) so a benchmark starts from scratch, and return it."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def plot_setup(inputs):
+    """Write merged_data for the plot benchmark into an empty output directory."""
+    db_path = os.path.join(inputs('workdir'), 'plot.db')
+    if not os.path.exists(db_path):
+        save_to_db(inputs('merged'), db_path)
+    output_dir = fresh_path(os.path.join(inputs('workdir'), 'plots'))
+    os.makedirs(output_dir)
+    return (db_path, 'merged_data', 1000, output_dir)
+
+
+def benchmark_cases(inputs):
+    """
+    Return (name, setup, func, rows) for every benchmarked function.
+
+    ``setup`` builds fresh arguments (copies of the inputs, empty output files)
+    outside the timed region; ``func(*setup())`` is what gets measured.
+    ``rows`` is a callable too, so skipped benchmarks never build their inputs.
+    """
+    workdir = inputs('workdir')
+    return [
+        ('preprocess_ev_sales_data', lambda: (inputs('raw_ev').copy(),), preprocess_ev_sales_data, lambda: len(inputs('raw_ev'))),
+        ('transform_and_store_data', lambda: (inputs('raw_gas').copy(), fresh_path(os.path.join(workdir, 'gas.db'))),
+         transform_and_store_data, lambda: len(inputs('raw_gas'))),
+        ('process_gas_data', lambda: (inputs('gas_prices').copy(), inputs('log_file')), process_gas_data, lambda: len(inputs('gas_prices'))),
+        ('process_ev_data', lambda: (inputs('ev_sales').copy(),), process_ev_data, lambda: len(inputs('ev_sales'))),
+        ('merge_data', lambda: (inputs('gas_monthly').copy(), inputs('ev_monthly').copy(), os.path.join(workdir, 'merged.csv'), inputs('log_file')),
+         merge_data, lambda: len(inputs('gas_monthly')) + len(inputs('ev_monthly'))),
+        ('save_to_db', lambda: (inputs('merged').copy(), fresh_path(os.path.join(workdir, 'merged.db'))), save_to_db, lambda: len(inputs('merged'))),
+        ('plot', lambda: plot_setup(inputs), plot_separate_graphs_with_normalization_and_save, lambda: len(inputs('merged'))),
+    ]
+
+
+def run_case(setup, func, repeat=3):
+    """
+    Time ``func`` ``repeat`` times and measure its memory once.
+
+    Timings are the best of the untraced runs; the tracemalloc peak comes from
+    one extra traced run so tracing overhead never inflates the timings.
+    """
+    report = new_report()
+    for _ in range(repeat):
+        args = setup()
+        with measure(report, 'timed'):
+            func(*args)
+    args = setup()
+    with measure(report, 'traced', trace_memory=True):
+        func(*args)
+    timed = [record for record in report['stages'] if record['name'] == 'timed']
+    traced = report['stages'][-1]
+    return {
+        'wall_seconds': min(record['wall_seconds'] for record in timed),
+        'cpu_seconds': min(record['cpu_seconds'] for record in timed),
+        'tracemalloc_peak_bytes': traced['tracemalloc_peak_bytes'],
+        'process_peak_rss_bytes': traced['process_peak_rss_bytes'],
+    }
+
+
+def run_benchmarks(scales, repeat=3, seed=0, workdir=None, only=None):
+    """
+    Run every benchmark at every scale.
+
+    Parameters:
+    - scales: Scale labels such as ['10k', '1m'].
+    - repeat: Timed runs per benchmark; the fastest is kept.
+    - seed: Seed of the synthetic generator.
+    - workdir: Scratch directory; a temporary one is used when omitted.
+    - only: Optional list of benchmark names to run.
+
+    Returns a dict keyed by '<benchmark>@<scale>'; gas benchmarks past
+    ``synthetic.MAX_GAS_WEEKS`` rows are keyed by that capped row count.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as scratch:
+        for label in scales:
+            rows = synthetic.parse_scale(label)
+            inputs = prepare_inputs(rows, scratch, seed=seed)
+            for name, setup, func, input_rows in benchmark_cases(inputs):
+                if only and name not in only:
+                    continue
+                capped = name in GAS_BENCHMARKS and rows > synthetic.MAX_GAS_WEEKS
+                case_label = synthetic.format_scale(synthetic.MAX_GAS_WEEKS) if capped else label
+                if f"{name}@{case_label}" in results:
+                    # The capped gas series was already measured at a smaller scale
+                    continue
+                result = run_case(setup, func, repeat=repeat)
+                result.update(rows=input_rows(), scale=case_label)
+                results[f"{name}@{case_label}"] = result
+                print(f"{name:<26} {case_label:>6} {result['wall_seconds']:>10.4f}s {result['tracemalloc_peak_bytes'] / 2**20:>10.1f} MiB")
+    return results
+
+
+def find_regressions(results, baseline, threshold=0.2):
+    """
+    Compare results with a baseline and describe every metric that got worse by more than ``threshold``.
+
+    Benchmarks missing from the baseline and timings below ``MIN_SECONDS`` are ignored.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            current, previous = result.get(metric), base.get(metric)
+            if current is None or not previous:
+                continue
+            if metric == 'wall_seconds' and current < MIN_SECONDS:
+                continue
+            if current > previous * (1 + threshold):
+                regressions.append(f"{key}: {metric} {previous:g} -> {current:g} (+{current / previous - 1:.0%})")
+    return regressions
+
+
+def load_baseline(path):
+    """Load the stored baseline results, or {} if there is none."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r') as baseline_file:
+        return json.load(baseline_file)['results']
+
+
+def save_results(results, path):
+    """Write results with the environment they were measured in."""
+    payload = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'w') as output_file:
+        json.dump(payload, output_file, indent=2, sort_keys=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic data.")
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help="Comma-separated row counts, e.g. 10k,1m,50m.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark; the fastest is kept.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help="Comma-separated benchmark names to run.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against.")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown/growth before flagging, e.g. 0.2 = 20%%.")
+    parser.add_argument('--output', help="Also write the results to this JSON file.")
+    parser.add_argument('--workdir', help="Directory for scratch files (defaults to the system temp dir).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    only = args.only.split(',') if args.only else None
+    results = run_benchmarks(args.scales.split(','), repeat=args.repeat, seed=args.seed, workdir=args.workdir, only=only)
+
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_results(baseline, args.baseline)
+        print(f"Baseline saved to {args.baseline}.")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"No baseline at {args.baseline}; store one with --save-baseline to flag regressions.")
+    regressions = find_regressions(results, baseline, threshold=args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
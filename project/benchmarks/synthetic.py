@@ -0,0 +1,92 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+GAS_DATE_COLUMN = 'Date'
+GAS_PRICE_COLUMN = 'Weekly U.S. All Grades All Formulations Retail Gasoline Prices  (Dollars per Gallon)'
+GAS_START = pd.Timestamp('1700-01-03')
+# Weekly rows (with gaps) that fit between GAS_START and the end of pandas' nanosecond range
+MAX_GAS_WEEKS = 25_000
+EV_START = pd.Timestamp('2010-01-01')
+EV_DAYS = 14 * 365
+
+
+def parse_scale(text):
+    """Parse a row count such as '10k', '2.5m' or '50M' into an int."""
+    text = str(text).strip().lower().replace('_', '')
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier != 1 else text
+    return int(float(number) * multiplier)
+
+
+def format_scale(rows):
+    """Format a row count as a scale label that ``parse_scale`` reads back, e.g. 25000 -> '25k'."""
+    for suffix, multiplier in (('m', 1_000_000), ('k', 1_000)):
+        if rows >= multiplier:
+            return f"{rows / multiplier:g}{suffix}"
+    return str(rows)
+
+
+def gas_weekly(rows, seed=0, gap_rate=0.01, missing_rate=0.01):
+    """
+    Generate a raw weekly gas price series shaped like the EIA workbook columns.
+
+    Roughly ``gap_rate`` of the weeks are skipped and ``missing_rate`` of the
+    prices are blank, so the gap repair and the quality checks have work to do.
+    Weekly timestamps run out of pandas' range past ``MAX_GAS_WEEKS`` rows, so
+    larger requests are capped there (the real series has under 2k rows); the
+    benchmarks label such runs with the capped row count.
+    """
+    if rows > MAX_GAS_WEEKS:
+        logger.info(f"Capping the weekly gas series at {MAX_GAS_WEEKS} rows (requested {rows}).")
+        rows = MAX_GAS_WEEKS
+    rng = np.random.default_rng(seed)
+    steps = np.where(rng.random(rows) < gap_rate, 14, 7)
+    steps[0] = 0
+    # Day arithmetic in datetime64[D]: a nanosecond timedelta cannot span more than ~292 years
+    timestamps = pd.Series(np.datetime64(GAS_START.date(), 'D') + np.cumsum(steps)).astype('datetime64[ns]')
+    prices = np.round(2.5 + np.cumsum(rng.normal(0, 0.02, rows)).clip(-2, 2), 3)
+    prices[rng.random(rows) < missing_rate] = np.nan
+    return pd.DataFrame({GAS_DATE_COLUMN: timestamps, GAS_PRICE_COLUMN: prices})
+
+
+def gas_prices(rows, seed=0):
+    """Generate the renamed (timestamp, price) gas frame that process_gas_data reads from SQLite."""
+    raw = gas_weekly(rows, seed=seed)
+    return pd.DataFrame({
+        'timestamp': raw[GAS_DATE_COLUMN].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'price': raw[GAS_PRICE_COLUMN],
+    })
+
+
+def day_labels(fmt):
+    """Format every day of the EV date range once, so rows can be labelled by indexing."""
+    return (EV_START + pd.to_timedelta(np.arange(EV_DAYS), unit='D')).strftime(fmt).to_numpy(dtype=object)
+
+
+def ev_registrations(rows, seed=0, vehicles=500, invalid_rate=0.005):
+    """
+    Generate raw EV registrations shaped like the atlasevhub CSV columns.
+
+    Dates are 'YYYY-MM-DD' strings between 2010 and 2023, as read from the CSV
+    with string dtypes; ``invalid_rate`` of them are unparseable. Vehicle names
+    follow a skewed popularity distribution over ``vehicles`` models.
+    """
+    rng = np.random.default_rng(seed)
+    dates = day_labels('%Y-%m-%d')[rng.integers(0, EV_DAYS, rows)]
+    dates[rng.random(rows) < invalid_rate] = 'N/A'
+    names = np.array([f"MAKE {i % 40} MODEL {i}" for i in range(vehicles)], dtype=object)
+    popularity = 1.0 / np.arange(1, vehicles + 1)
+    models = rng.choice(vehicles, size=rows, p=popularity / popularity.sum())
+    return pd.DataFrame({'Registration Valid Date': dates, 'Vehicle Name': names[models]})
+
+
+def ev_sales(rows, seed=0):
+    """Generate the (registration_date) frame that process_ev_data reads from SQLite."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'registration_date': day_labels('%Y-%m-%d %H:%M:%S')[rng.integers(0, EV_DAYS, rows)]})
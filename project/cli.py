@@ -0,0 +1,158 @@
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+
+# Only the standard library, toml and the stage cache are loaded up front; each
+# subcommand imports the heavy modules it needs through main's functions.
+import main as pipeline_main
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.toml')
+DATASETS = ('gas', 'ev')
+
+
+def cmd_fetch(config, paths, args):
+    """Download one or both sources, revalidating cached copies."""
+    settings = config['settings']
+    urls = {'gas': (settings['gas_data_url'], paths['gas_data']), 'ev': (settings['ev_sales_data_url'], paths['ev_sales_data'])}
+    for dataset in DATASETS if args.dataset == 'all' else (args.dataset,):
+        url, save_to = urls[dataset]
+        pipeline_main.fetch_and_log(url, save_to, stream=settings.get('stream_download', False),
+                                    use_cache=settings.get('download_cache', False))
+
+
+def cmd_ingest_gas(config, paths, args):
+    """Load the downloaded gas workbook into the gas database."""
+    settings = config['settings']
+    pipeline_main.configure_storage(settings)
+    pipeline_main.extract_process_gas_data(paths['gas_data'], paths['gas_db'], incremental=settings.get('incremental', False),
+                                           use_parse_cache=settings.get('gas_parse_cache', False))
+
+
+def cmd_ingest_ev(config, paths, args):
+    """Load the downloaded EV registrations CSV into the EV database."""
+    settings = config['settings']
+    pipeline_main.configure_storage(settings)
+    pipeline_main.extract_process_ev_data(paths['ev_sales_data'], paths['ev_db'], chunksize=settings.get('ev_chunksize'),
+                                          incremental=settings.get('incremental', False),
+                                          compact=settings.get('ev_compact_schema', False),
+                                          partitioned=settings.get('ev_partitioned', False),
+                                          cube=settings.get('ev_cube', False))
+
+
+def cmd_merge(config, paths, args):
+    """Rebuild merged_data, or only the months from --since onwards."""
+    pipeline_main.configure_storage(config['settings'])
+    since = None
+    if args.since:
+        import pandas as pd
+        since = pd.Timestamp(args.since)
+    pipeline_main.merge_for_analysis(config, paths, since=since)
+
+
+def cmd_plot(config, paths, args):
+    """Render the charts and update the rolling statistics from merged_data."""
+    pipeline_main.basic_analysis(paths['merged_db'], "merged_data", paths['data_dir'],
+                                 max_workers=config['settings'].get('plot_workers'),
+                                 rolling_window=config['settings'].get('rolling_window'))
+
+
+def cmd_correlate(config, paths, args):
+    """Print the lag at which the gas price best correlates with each volume series of merged_data."""
+    from analytics.cross_correlation import scan_merged_data
+    result = scan_merged_data(paths['merged_db'], max_lag=args.max_lag, min_periods=args.min_periods)
+    print(result.to_string(index=False))
+
+
+def cmd_run_all(config, paths, args):
+    """Run the whole pipeline."""
+    pipeline_main.pipeline(args.config)
+
+
+def read_watermarks(db_path):
+    """Return (table, high-water mark, updated at) rows from a store, or [] if it has none."""
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT table_name, high_water_mark, updated_at FROM etl_watermarks ORDER BY table_name").fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def cmd_status(config, paths, args):
+    """Print the state of every pipeline file, the load watermarks and the stage cache."""
+    from stage_cache import load_state
+
+    print("Files:")
+    for name in ('gas_data', 'ev_sales_data', 'gas_db', 'ev_db', 'merged_db', 'merged_csv'):
+        path = paths[name]
+        if os.path.exists(path):
+            stat = os.stat(path)
+            print(f"  {name:<14} {stat.st_size:>12,} bytes  {path}")
+        else:
+            print(f"  {name:<14} {'missing':>18}  {path}")
+
+    print("Watermarks:")
+    for db_path in sorted({paths['gas_db'], paths['ev_db']}):
+        for table, high_water_mark, updated_at in read_watermarks(db_path):
+            print(f"  {table:<16} {high_water_mark}  (updated {updated_at})")
+
+    if paths['stage_cache']:
+        state = load_state(paths['stage_cache'])
+        print("Stages:")
+        for name, key in sorted(state['stages'].items()):
+            print(f"  {name:<14} {key[:12]}")
+
+
+def cmd_serve(config, paths, args):
+    """Serve read-only JSON queries over the merged, EV and gas stores."""
+    import query_service
+    query_service.serve(paths, host=args.host, port=args.port)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the gas price / EV sales pipeline one stage at a time.")
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help="Path to config.toml.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch = subparsers.add_parser('fetch', help=cmd_fetch.__doc__)
+    fetch.add_argument('dataset', nargs='?', choices=DATASETS + ('all',), default='all')
+    fetch.set_defaults(func=cmd_fetch)
+    subparsers.add_parser('ingest-gas', help=cmd_ingest_gas.__doc__).set_defaults(func=cmd_ingest_gas)
+    subparsers.add_parser('ingest-ev', help=cmd_ingest_ev.__doc__).set_defaults(func=cmd_ingest_ev)
+    merge = subparsers.add_parser('merge', help=cmd_merge.__doc__)
+    merge.add_argument('--since', help="Recompute only the months from this date (YYYY-MM-DD) onwards.")
+    merge.set_defaults(func=cmd_merge)
+    subparsers.add_parser('plot', help=cmd_plot.__doc__).set_defaults(func=cmd_plot)
+    correlate = subparsers.add_parser('correlate', help=cmd_correlate.__doc__)
+    correlate.add_argument('--max-lag', type=int, default=24, help="Largest lead or lag scanned, in months.")
+    correlate.add_argument('--min-periods', type=int, default=3, help="Overlapping months required for a correlation.")
+    correlate.set_defaults(func=cmd_correlate)
+    subparsers.add_parser('run-all', help=cmd_run_all.__doc__).set_defaults(func=cmd_run_all)
+    subparsers.add_parser('status', help=cmd_status.__doc__).set_defaults(func=cmd_status)
+    serve = subparsers.add_parser('serve', help=cmd_serve.__doc__)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8050)
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        config = pipeline_main.load_config(args.config)
+        args.func(config, pipeline_main.resolve_paths(config), args)
+        return 0
+    except Exception as e:
+        logger.error(f"Command '{args.command}' failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,266 @@
 import os
+import json
+import hashlib
 import requests
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-def download_file(url, local_path):
-    """Download a file from a URL and save it to a local path."""
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 5
+CACHE_SUFFIX = '.meta.json'
+POOL_SIZE = 4
+
+
+def new_session(pool_size=POOL_SIZE):
+    """
+    Create a requests session that keeps up to ``pool_size`` connections per host.
+
+    Downloads running in parallel threads can share it, reusing pooled
+    connections instead of opening (and TLS-handshaking) one per request.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def cache_metadata_path(local_path):
+    """Return the path of the download cache sidecar for a local file."""
+    return f"{local_path}{CACHE_SUFFIX}"
+
+
+def load_cache_metadata(local_path):
+    """
+    Load the cached ETag, Last-Modified and content hash for a local file.
+
+    Returns an empty dict when the file or its sidecar is missing, so the next
+    request is sent unconditionally.
+    """
+    meta_path = cache_metadata_path(local_path)
+    if not (os.path.exists(local_path) and os.path.exists(meta_path)):
+        return {}
+    try:
+        with open(meta_path, 'r') as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable download cache {meta_path}: {e}")
+        return {}
+
+
+def save_cache_metadata(local_path, url, headers, sha256):
+    """Store the validators and content hash of a downloaded file next to it."""
+    metadata = {
+        'url': url,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'sha256': sha256,
+    }
+    with open(cache_metadata_path(local_path), 'w') as meta_file:
+        json.dump(metadata, meta_file, indent=2)
+
+
+def conditional_headers(metadata):
+    """Build If-None-Match / If-Modified-Since headers from cached metadata."""
+    headers = {}
+    if metadata.get('etag'):
+        headers['If-None-Match'] = metadata['etag']
+    if metadata.get('last_modified'):
+        headers['If-Modified-Since'] = metadata['last_modified']
+    return headers
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """Hash a file in chunks so large downloads are never fully loaded."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resume_validator(headers):
+    """Return the If-Range validator of a response: its strong ETag, else its Last-Modified, else None."""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def content_range_total(headers):
+    """Return the complete length named by a Content-Range header ('bytes a-b/total' or 'bytes */total'), or None."""
+    total = (headers.get('Content-Range') or '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def load_part_metadata(meta_path, url):
+    """Load the validator a partial download was started with; empty if it is missing or from another URL."""
     try:
-        response = requests.get(url, timeout=10)  # Add timeout for better error handling
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx, 5xx)
-        with open(local_path, 'wb') as file:
-            file.write(response.content)
+        with open(meta_path, 'r') as meta_file:
+            metadata = json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
+    return metadata if metadata.get('url') == url else {}
+
+
+def save_part_metadata(meta_path, url, headers):
+    """Remember the validators of the response a partial download is written from."""
+    metadata = {
+        'url': url,
+        'validator': resume_validator(headers),
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+    }
+    with open(meta_path, 'w') as meta_file:
+        json.dump(metadata, meta_file)
+
+
+def resumed_headers(headers, part):
+    """Return the ETag/Last-Modified of a resumed download, falling back to those its partial file was started with."""
+    return {
+        'ETag': headers.get('ETag') or part.get('etag'),
+        'Last-Modified': headers.get('Last-Modified') or part.get('last_modified'),
+    }
+
+
+def discard_partial(part_path):
+    """Delete a partial download and its metadata."""
+    for path in (part_path, f"{part_path}{CACHE_SUFFIX}"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def stream_download(url, local_path, chunk_size=CHUNK_SIZE, max_retries=MAX_RETRIES, timeout=10, headers=None, session=None):
+    """
+    Stream a file from a URL to disk in fixed-size chunks.
+
+    The body is written to ``<local_path>.part``. If the connection drops, the
+    download is resumed from the bytes already on disk with an HTTP Range
+    request. Once complete, the partial file is atomically renamed to
+    ``local_path``, so readers never see a half-written file.
+
+    A resume sends ``If-Range`` with the ETag (or Last-Modified) of the
+    response the partial file came from, so a resource that changed in the
+    meantime is downloaded again in full instead of being spliced onto the
+    old bytes. A partial file without such a validator, e.g. left by an older
+    version or a server that sends none, is discarded. A 416 reply only
+    completes the download when its Content-Range length matches the bytes
+    on disk.
+
+    Parameters:
+    - url: URL of the file to download.
+    - local_path: Path to save the downloaded file.
+    - chunk_size: Number of bytes written per chunk.
+    - max_retries: Number of times an interrupted download is resumed.
+    - timeout: Connect/read timeout in seconds for each request.
+    - headers: Extra request headers, e.g. conditional-GET validators.
+    - session: Optional requests session (see ``new_session``); None uses a fresh connection.
+
+    Returns the response headers (for a download resumed from an earlier
+    call, the validators of the resumed resource), or None if the server
+    answered 304 Not Modified.
+    """
+    part_path = f"{local_path}.part"
+    meta_path = f"{part_path}{CACHE_SUFFIX}"
+    attempt = 0
+    response_headers = {}
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part = load_part_metadata(meta_path, url) if offset else {}
+        validator = part.get('validator')
+        if offset and not validator:
+            logging.info(f"Discarding {part_path}: there is no validator to resume it against.")
+            discard_partial(part_path)
+            offset = 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers.update({'Range': f'bytes={offset}-', 'If-Range': validator})
+        try:
+            with (session or requests).get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304:
+                    # The cached file is current; a partial newer download is moot
+                    discard_partial(part_path)
+                    return None
+                if response.status_code == 416 and offset:
+                    if content_range_total(response.headers or {}) == offset:
+                        # The partial file already holds the whole body
+                        response_headers = response_headers or resumed_headers(response.headers or {}, part)
+                        break
+                    logging.warning(f"{part_path} does not match the size of {url}; downloading it again.")
+                    discard_partial(part_path)
+                    continue
+                response.raise_for_status()
+                # A 200 means the server ignored the Range header or the resource changed, so start over
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                if not offset or mode == 'wb':
+                    response_headers = dict(response.headers or {})
+                    save_part_metadata(meta_path, url, response_headers)
+                elif not response_headers:
+                    # Resuming a .part left by an earlier call: keep its validators for the cache
+                    response_headers = resumed_headers(response.headers or {}, part)
+                with open(part_path, mode) as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            file.write(chunk)
+            break
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            logging.warning(f"Download of {url} interrupted ({e}); resuming (attempt {attempt}/{max_retries}).")
+    os.replace(part_path, local_path)
+    discard_partial(part_path)
+    return response_headers
+
+
+def download_file(url, local_path, stream=False, chunk_size=CHUNK_SIZE, max_retries=MAX_RETRIES, use_cache=False, session=None):
+    """
+    Download a file from a URL and save it to a local path.
+
+    With ``stream=True`` the body is streamed to disk in chunks and resumed on
+    interruption (see ``stream_download``) instead of being held in memory.
+
+    With ``use_cache=True`` the ETag, Last-Modified and SHA-256 of the file are
+    kept in a ``.meta.json`` sidecar and sent back as If-None-Match /
+    If-Modified-Since on the next call. A 304 response leaves the local file
+    untouched.
+
+    With ``session`` the request goes through that session's connection pool.
+
+    Returns True if the local file content changed, False if it is unchanged.
+    """
+    try:
+        metadata = load_cache_metadata(local_path) if use_cache else {}
+        headers = conditional_headers(metadata)
+        if stream:
+            response_headers = stream_download(url, local_path, chunk_size=chunk_size,
+                                               max_retries=max_retries, headers=headers, session=session)
+        else:
+            response = (session or requests).get(url, headers=headers, timeout=10)  # Add timeout for better error handling
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx, 5xx)
+            if response.status_code == 304:
+                response_headers = None
+            else:
+                with open(local_path, 'wb') as file:
+                    file.write(response.content)
+                response_headers = dict(response.headers or {})
+
+        if response_headers is None:
+            logging.info(f"{url} not modified; keeping cached file {local_path}")
+            return False
         logging.info(f"File downloaded successfully and saved to {local_path}")
+
+        if not use_cache:
+            return True
+        sha256 = file_sha256(local_path)
+        save_cache_metadata(local_path, url, response_headers, sha256)
+        changed = sha256 != metadata.get('sha256')
+        if not changed:
+            logging.info(f"Content of {local_path} is unchanged (sha256 {sha256[:12]}).")
+        return changed
     except requests.exceptions.Timeout:
         logging.error(f"Error: The request to {url} timed out.")
         raise
@@ -26,11 +274,16 @@ def download_file(url, local_path):
         logging.error(f"An error occurred while downloading from {url}: {req_err}")
         raise
 
-def fetch_data_from_url(url, save_to):
-    """Fetch data from a URL and save it to a local file."""
+def fetch_data_from_url(url, save_to, stream=False, use_cache=False, session=None):
+    """
+    Fetch data from a URL and save it to a local file.
+
+    Returns True if the file content changed, False if the cached copy is still current.
+    """
     try:
-        download_file(url, save_to)
+        changed = download_file(url, save_to, stream=stream, use_cache=use_cache, session=session)
         logging.info("Data fetching and saving to file completed successfully.")
+        return changed
     except requests.exceptions.Timeout:
         logging.error(f"Failed to fetch data due to a timeout error.")
         raise
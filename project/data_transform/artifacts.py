@@ -0,0 +1,92 @@
+import os
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; CSV remains available without it
+    pa = None
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+ARTIFACT_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def require_pyarrow():
+    """Raise a helpful ImportError when pyarrow is not installed."""
+    if pa is None:
+        raise ImportError("Columnar artifacts require pyarrow. Install it with 'pip install pyarrow'.")
+
+
+def artifact_path(csv_path, fmt):
+    """Return the columnar sibling of a CSV output path, e.g. merged_data.csv -> merged_data.arrow."""
+    if fmt not in ARTIFACT_EXTENSIONS:
+        raise ValueError(f"Unknown artifact format '{fmt}'. Expected one of {list(ARTIFACT_EXTENSIONS)}.")
+    return os.path.splitext(csv_path)[0] + ARTIFACT_EXTENSIONS[fmt]
+
+
+def write_artifact(df, path, fmt=None):
+    """
+    Write a DataFrame as a typed columnar artifact.
+
+    Timestamps, floats and (nullable) integers keep their types, so reading the
+    artifact back needs no parsing. Arrow IPC files are written uncompressed so
+    they can be memory-mapped; Parquet files are compressed and smaller on disk.
+
+    Parameters:
+    - df: DataFrame to write.
+    - path: Destination path.
+    - fmt: 'arrow' or 'parquet'; inferred from the extension when omitted.
+    """
+    require_pyarrow()
+    fmt = fmt or infer_format(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    if fmt == 'arrow':
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    else:
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(df)} rows to {fmt} artifact {path}.")
+    return path
+
+
+def read_artifact(path, memory_map=True):
+    """
+    Read a columnar artifact back into pandas.
+
+    Arrow IPC files are memory-mapped, so the typed columns are read straight
+    from the page cache without any text parsing. Nullable pandas dtypes written
+    by ``write_artifact`` are restored from the stored pandas metadata.
+    """
+    require_pyarrow()
+    if infer_format(path) == 'arrow':
+        source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+        with source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    return pq.read_table(path, memory_map=memory_map).to_pandas()
+
+
+def infer_format(path):
+    """Map an artifact path's extension to 'arrow' or 'parquet'."""
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, fmt_extension in ARTIFACT_EXTENSIONS.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Cannot infer artifact format from '{path}'.")
+
+
+def export_frame(df, csv_path, artifact_format=None, csv_export=True):
+    """
+    Write an intermediate frame as CSV and/or a columnar artifact next to it.
+
+    Returns the artifact path, or None when no artifact format is configured.
+    """
+    if csv_export:
+        df.to_csv(csv_path, index=False)
+    if not artifact_format:
+        return None
+    return write_artifact(df, artifact_path(csv_path, artifact_format), artifact_format)
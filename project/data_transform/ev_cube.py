@@ -0,0 +1,170 @@
+import logging
+
+import pandas as pd
+
+import data_transform.storage as storage
+from data_transform.ev_schema import COMPACT, LEGACY, ev_layout, date_column, date_sql, date_param
+from data_transform.ev_partitions import object_type
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+CUBE_TABLE = 'ev_cube'
+# Cube dimension -> SQL expression per ev_sales layout ('e' is ev_sales, 'v' is vehicles)
+DIMENSIONS = {
+    'vehicle_name': {LEGACY: 'e.vehicle_name', COMPACT: 'v.vehicle_name'},
+}
+# Period label of a 'YYYY-MM' cube month per roll-up granularity
+ROLLUP_SQL = {
+    'month': "month",
+    'quarter': "substr(month, 1, 4) || '-Q' || ((CAST(substr(month, 6, 2) AS INTEGER) + 2) / 3)",
+    'year': "substr(month, 1, 4)",
+}
+
+
+def has_cube(conn, schema='main'):
+    """Return True if the EV database holds a materialized cube."""
+    return object_type(conn, CUBE_TABLE, schema) == 'table'
+
+
+def create_cube(conn):
+    """Create the month x dimensions cube with one registration count per cell."""
+    dimensions = ', '.join(f"{name} TEXT NOT NULL" for name in DIMENSIONS)
+    keys = ', '.join(['month', *DIMENSIONS])
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (month TEXT NOT NULL, {dimensions}, "
+        f"registrations INTEGER NOT NULL, PRIMARY KEY ({keys}))"
+    )
+    # Drill-downs filter on a dimension first, then on months
+    for name in DIMENSIONS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CUBE_TABLE}_{name}_month ON {CUBE_TABLE} ({name}, month)")
+
+
+def drop_cube(conn):
+    """Drop the cube; the EV readers then count ev_sales directly."""
+    conn.execute(f"DROP TABLE IF EXISTS {CUBE_TABLE}")
+
+
+def remove_ev_cube(db_path):
+    """
+    Drop the cube of an EV database whose registrations changed without it.
+
+    A load with ``ev_cube`` turned off does not maintain the cube, and the
+    readers would otherwise keep serving its stale counts.
+    """
+    with storage.transaction(db_path) as conn:
+        if has_cube(conn):
+            drop_cube(conn)
+            logger.info(f"Dropped the stale EV cube of {db_path}.")
+
+
+def update_ev_cube(db_path, since=None):
+    """
+    Materialize monthly registration counts per vehicle (and any other DIMENSIONS) from ev_sales.
+
+    With ``since`` only the months from ``since`` onwards are recounted: their
+    cells are deleted and re-aggregated from the registrations in those
+    months, which a range predicate on the indexed date column reads
+    directly. Without it the cube is rebuilt from every registration.
+
+    Returns the number of cube cells written.
+    """
+    try:
+        with storage.transaction(db_path) as conn:
+            layout = ev_layout(conn)
+            if layout is None:
+                logger.info("No ev_sales table; skipping the EV cube.")
+                return 0
+            if since is not None and not has_cube(conn):
+                since = None
+            create_cube(conn)
+            column = date_column(layout)
+            join = "JOIN vehicles v ON v.vehicle_id = e.vehicle_id" if layout == COMPACT else ''
+            dimensions = [f"{DIMENSIONS[name][layout]} AS {name}" for name in DIMENSIONS]
+            where, params = '', []
+            if since is not None:
+                month = pd.Timestamp(since).to_period('M').to_timestamp()
+                conn.execute(f"DELETE FROM {CUBE_TABLE} WHERE month >= ?", (month.strftime('%Y-%m'),))
+                where, params = f"WHERE e.{column} >= ?", [date_param(month, layout)]
+            else:
+                conn.execute(f"DELETE FROM {CUBE_TABLE}")
+            cells = conn.execute(
+                f"""
+                INSERT INTO {CUBE_TABLE} (month, {', '.join(DIMENSIONS)}, registrations)
+                SELECT strftime('%Y-%m', {date_sql(layout, alias='e')}) AS month, {', '.join(dimensions)}, COUNT(*)
+                FROM ev_sales e {join}
+                {where}
+                GROUP BY month, {', '.join(DIMENSIONS)}
+                """,
+                params,
+            ).rowcount
+        logger.info(f"Wrote {cells} EV cube cells{'' if since is None else f' from {month:%Y-%m}'}.")
+        return cells
+    except Exception as e:
+        logger.error(f"Error updating the EV cube: {e}")
+        raise
+
+
+def rollup_query(granularity='month', by=(), filters=None, from_month=None, to_month=None, measure='registrations'):
+    """
+    Build the SQL that rolls the cube up to ``granularity`` per ``by`` dimensions.
+
+    Parameters:
+    - granularity: 'month', 'quarter' or 'year'.
+    - by: Dimensions kept in the result (drill-down), e.g. ('vehicle_name',).
+    - filters: {dimension: value} restricting the cells, e.g. {'vehicle_name': 'TESLA MODEL 3'}.
+    - from_month, to_month: Inclusive 'YYYY-MM' bounds.
+    - measure: Name of the summed registrations column in the result.
+
+    Returns a tuple (sql, params).
+    """
+    if granularity not in ROLLUP_SQL:
+        raise ValueError(f"Unknown granularity '{granularity}'; use one of {sorted(ROLLUP_SQL)}.")
+    unknown = (set(by) | set(filters or {})) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions {sorted(unknown)}; the cube has {sorted(DIMENSIONS)}.")
+    conditions, params = [], []
+    for name, value in (filters or {}).items():
+        conditions.append(f"{name} = ?")
+        params.append(value)
+    if from_month:
+        conditions.append("month >= ?")
+        params.append(from_month)
+    if to_month:
+        conditions.append("month <= ?")
+        params.append(to_month)
+    groups = ', '.join(['period', *by])
+    sql = f"""
+    SELECT {ROLLUP_SQL[granularity]} AS period, {''.join(f'{name}, ' for name in by)}SUM(registrations) AS {measure}
+    FROM {CUBE_TABLE}
+    {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+    GROUP BY {groups}
+    ORDER BY {groups}
+    """
+    return sql, params
+
+
+def rollup(db_path, granularity='month', by=(), filters=None, from_month=None, to_month=None):
+    """
+    Roll the cube up to months, quarters or years, optionally drilled down by dimension.
+
+    Only cube cells are read, never the registration rows. See
+    ``rollup_query`` for the parameters. Returns a DataFrame with period, the
+    ``by`` dimensions and registrations.
+    """
+    sql, params = rollup_query(granularity, by=by, filters=filters, from_month=from_month, to_month=to_month)
+    conn = storage.get_connection(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        storage.release(conn)
+
+
+def cube_monthly(conn, from_yr, to_yr, since=None):
+    """Return monthly registration totals (month, volume) of a year window, read from the cube."""
+    from_month = f"{int(from_yr):04d}-01"
+    if since is not None:
+        from_month = max(from_month, pd.Timestamp(since).strftime('%Y-%m'))
+    sql, params = rollup_query('month', from_month=from_month, to_month=f"{int(to_yr):04d}-12", measure='volume')
+    return pd.read_sql_query(sql, conn, params=params).rename(columns={'period': 'month'})
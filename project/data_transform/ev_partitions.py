@@ -0,0 +1,204 @@
+import logging
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import data_transform.storage as storage
+from data_transform.ev_schema import (COMPACT, LEGACY, ev_layout, date_column, date_sql,
+                                      create_vehicles_table, create_compact_fact, insert_compact)
+from data_transform.watermark import clear_watermark
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+CATALOG_TABLE = 'ev_partitions'
+VIEW_NAME = 'ev_sales'
+
+
+def partition_table(year):
+    """Return the name of the table holding the registrations of ``year``."""
+    return f"ev_sales_{int(year)}"
+
+
+def object_type(conn, name, schema='main'):
+    """Return 'table', 'view' or None for ``name`` in ``schema``."""
+    row = conn.execute(f"SELECT type FROM {schema}.sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def is_partitioned(conn, schema='main'):
+    """Return True if ``schema`` holds a year-partitioned EV store (it has a partition catalog)."""
+    return object_type(conn, CATALOG_TABLE, schema) == 'table'
+
+
+def partition_years(conn, schema='main'):
+    """Return the catalogued partition years in ascending order ([] if the store is not partitioned)."""
+    if not is_partitioned(conn, schema):
+        return []
+    return [row[0] for row in conn.execute(f"SELECT year FROM {schema}.{CATALOG_TABLE} ORDER BY year")]
+
+
+def create_catalog(conn):
+    """Create the partition catalog: one row per year with its table, row count and date range."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+            year INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            min_date TEXT,
+            max_date TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def drop_ev_store(conn):
+    """Drop every EV store object: the partitions, their catalog, the ev_sales table or view, vehicles and the cube."""
+    for year in partition_years(conn):
+        conn.execute(f"DROP TABLE IF EXISTS {partition_table(year)}")
+    conn.execute(f"DROP TABLE IF EXISTS {CATALOG_TABLE}")
+    kind = object_type(conn, VIEW_NAME)
+    if kind:
+        conn.execute(f"DROP {kind.upper()} {VIEW_NAME}")
+    conn.execute("DROP TABLE IF EXISTS vehicles")
+    # The month x vehicle cube aggregates the dropped rows (see data_transform.ev_cube)
+    conn.execute("DROP TABLE IF EXISTS ev_cube")
+
+
+def open_partitioned_store(conn, schema, incremental=False, compact=False):
+    """
+    Prepare a year-partitioned load and return its state for ``write_partitioned_rows``.
+
+    Years before the latest catalogued year are treated as immutable: in
+    incremental mode their rows are skipped, while the latest year and any
+    newer years are rewritten from the incoming data. A full load, or an
+    incremental load into an unpartitioned store or one in the other layout,
+    drops the existing store first.
+
+    Parameters:
+    - conn: Connection inside an open transaction.
+    - schema: DataFrame whose columns define the legacy partition tables.
+    - incremental: Keep the closed years instead of rebuilding every partition.
+    - compact: Use the dictionary-encoded layout (see data_transform.ev_schema).
+    """
+    wanted = COMPACT if compact else LEGACY
+    if incremental and not is_partitioned(conn) and ev_layout(conn) is not None:
+        logger.warning("ev_sales is not partitioned yet; rebuilding it as year partitions.")
+        incremental = False
+    elif incremental and ev_layout(conn) not in (None, wanted):
+        logger.warning(f"ev_sales partitions use the {ev_layout(conn)} layout; rebuilding them in the {wanted} layout.")
+        incremental = False
+    years = partition_years(conn) if incremental else []
+    if not incremental:
+        drop_ev_store(conn)
+        clear_watermark(conn, 'ev_sales')
+    create_catalog(conn)
+    if compact:
+        create_vehicles_table(conn)
+    return {
+        'layout': wanted,
+        'schema': schema,
+        'frozen_before': years[-1] if years else None,
+        'opened': set(),
+        'known': {},
+    }
+
+
+def write_partitioned_rows(conn, state, df):
+    """
+    Append preprocessed rows to their year partitions.
+
+    A partition is emptied the first time it receives rows during a load, so
+    rewritten years hold exactly the incoming rows. Rows of frozen years are
+    dropped. Returns the rows that were written.
+    """
+    if state['frozen_before'] is not None:
+        df = df[df['registration_date'].dt.year >= state['frozen_before']]
+    for year, rows in df.groupby(df['registration_date'].dt.year, sort=True):
+        table = partition_table(year)
+        if year not in state['opened']:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            if state['layout'] == COMPACT:
+                create_compact_fact(conn, table)
+            else:
+                storage.create_table(conn, table, state['schema'])
+            state['opened'].add(year)
+        rows = rows[['registration_date', 'vehicle_name']]
+        if state['layout'] == COMPACT:
+            insert_compact(conn, rows, state['known'], table=table)
+        else:
+            storage.insert_frame(conn, table, rows)
+    return df
+
+
+def finish_partitioned_store(conn, state):
+    """
+    Index the rewritten partitions, refresh their catalog rows and rebuild the ev_sales view.
+
+    The ``ev_sales`` view is the UNION ALL of every partition, so readers that
+    do not prune (row counts, cubes, full scans) keep working unchanged.
+    """
+    layout = state['layout']
+    column, date_expr = date_column(layout), date_sql(layout)
+    updated_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    for year in sorted(state['opened']):
+        table = partition_table(year)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+        row_count, min_date, max_date = conn.execute(
+            f"SELECT COUNT(*), MIN({date_expr}), MAX({date_expr}) FROM {table}"
+        ).fetchone()
+        conn.execute(
+            f"""
+            INSERT INTO {CATALOG_TABLE} (year, table_name, row_count, min_date, max_date, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(year) DO UPDATE SET
+                table_name = excluded.table_name,
+                row_count = excluded.row_count,
+                min_date = excluded.min_date,
+                max_date = excluded.max_date,
+                updated_at = excluded.updated_at
+            """,
+            (int(year), table, row_count, min_date, max_date, updated_at),
+        )
+    if object_type(conn, VIEW_NAME) == 'view':
+        conn.execute(f"DROP VIEW {VIEW_NAME}")
+    conn.execute(f"CREATE VIEW {VIEW_NAME} AS {union_sql(partition_years(conn), layout)}")
+    if state['opened']:
+        logger.info(f"Rewrote EV partitions {sorted(int(year) for year in state['opened'])}.")
+    else:
+        logger.info("No EV partitions needed rewriting.")
+
+
+def union_sql(years, layout, schema=None):
+    """Return a SELECT over the given partitions, or an empty SELECT with the layout's columns."""
+    prefix = f"{schema}." if schema else ''
+    columns = 'registration_day, vehicle_id' if layout == COMPACT else 'registration_date, vehicle_name'
+    if not years:
+        return f"SELECT {', '.join(f'NULL AS {name}' for name in columns.split(', '))} WHERE 0"
+    return ' UNION ALL '.join(f"SELECT {columns} FROM {prefix}{partition_table(year)}" for year in years)
+
+
+def partitions_for_window(conn, from_yr, to_yr, since=None, schema='main'):
+    """Return the catalogued years inside [from_yr, to_yr], from the year of ``since`` onwards if given."""
+    first = int(from_yr) if since is None else max(int(from_yr), pd.Timestamp(since).year)
+    return [year for year in partition_years(conn, schema) if first <= year <= int(to_yr)]
+
+
+def ev_source_sql(conn, from_yr, to_yr, since=None, schema='main'):
+    """
+    Return the FROM expression EV queries for a year window should read.
+
+    For a partitioned store only the partitions overlapping the window are
+    unioned, so a narrow window never touches the other years; an
+    unpartitioned store is read from its ev_sales table.
+    """
+    if not is_partitioned(conn, schema):
+        return f"{schema}.ev_sales"
+    years = partitions_for_window(conn, from_yr, to_yr, since=since, schema=schema)
+    logger.info(f"Reading EV partitions {years} for {from_yr}-{to_yr}.")
+    if len(years) == 1:
+        return f"{schema}.{partition_table(years[0])}"
+    return f"({union_sql(years, ev_layout(conn, schema), schema=schema)})"
@@ -1,15 +1,33 @@
 import os
 import pandas as pd
-import sqlite3
 import logging
+import data_transform.storage as storage
+from data_transform.watermark import read_watermark, write_watermark, clear_watermark, rows_after_watermark, overlap_start, stored_key_counts, drop_stored_rows
+from data_transform.ev_schema import COMPACT, LEGACY, ev_layout, date_column, date_sql, create_compact_tables, insert_compact, read_ev_sales
+from data_transform.ev_cube import drop_cube, remove_ev_cube, update_ev_cube
+from data_transform.ev_partitions import is_partitioned, drop_ev_store, open_partitioned_store, write_partitioned_rows, finish_partitioned_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+REQUIRED_COLUMNS = ['Registration Valid Date', 'Vehicle Name']
+# Both columns are read as plain strings; dates are parsed in preprocess_ev_sales_data
+CSV_DTYPES = {'Registration Valid Date': str, 'Vehicle Name': str}
+DEFAULT_CHUNKSIZE = 100_000
+# Identifies a registration when the watermark day is reloaded
+EV_KEY = ['registration_date', 'vehicle_name']
 
-def preprocess_ev_sales_data(df):
+
+def preprocess_ev_sales_data(df, compact=False):
+    """
+    Rename and clean the raw registration columns.
+
+    With ``compact=True`` ``vehicle_name`` is returned as a categorical, the
+    in-memory counterpart of the compact ``vehicles`` table layout (see
+    data_transform.ev_schema); otherwise it stays a plain string column.
+    """
     logging.info("Starting data preprocessing.")
-    required_columns = ['Registration Valid Date', 'Vehicle Name']
+    required_columns = REQUIRED_COLUMNS
     if not all(col in df.columns for col in required_columns):
         raise ValueError(f"The expected columns {required_columns} are missing from the CSV file.")
 
@@ -19,36 +37,224 @@ def preprocess_ev_sales_data(df):
     })
     df['registration_date'] = pd.to_datetime(df['registration_date'], errors='coerce')
     df = df.dropna()
+    if compact:
+        df['vehicle_name'] = df['vehicle_name'].astype('category')
     logging.info("Data preprocessing completed successfully.")
     return df
 
 
-def save_to_sqlite(df, db_path):
-    logging.info("Saving data to SQLite database.")
+def ensure_db_directory(db_path):
     dir_path = os.path.dirname(db_path)
-    if not os.path.exists(dir_path):
+    if dir_path and not os.path.exists(dir_path):
         try:
             os.makedirs(dir_path)
         except OSError as e:
             logging.error(f"Failed to create directory {dir_path}: {e}")
             raise
 
+
+def open_ev_table(conn, schema, incremental=False, compact=False):
+    """
+    Create ev_sales in the requested layout and return the watermark new rows are filtered with.
+
+    An incremental load into a table stored in the other layout, or into a
+    year-partitioned store, falls back to a full rebuild, since they cannot
+    share a table.
+
+    Parameters:
+    - conn: Connection inside an open transaction.
+    - schema: DataFrame whose columns define the legacy table.
+    - incremental: Keep the existing rows and return their high-water mark.
+    - compact: Use the dictionary-encoded layout (see data_transform.ev_schema).
+
+    Returns a tuple (watermark, layout).
+    """
+    if is_partitioned(conn):
+        logging.warning("ev_sales is year-partitioned; rebuilding it as a single table.")
+        drop_ev_store(conn)
+        incremental = False
+    layout = ev_layout(conn)
+    wanted = COMPACT if compact else LEGACY
+    if incremental and layout not in (None, wanted):
+        logging.warning(f"ev_sales uses the {layout} layout; rebuilding it in the {wanted} layout.")
+        incremental = False
+    watermark = read_watermark(conn, 'ev_sales', date_sql(layout)) if incremental else None
+    if not incremental:
+        drop_cube(conn)
+        clear_watermark(conn, 'ev_sales')
+    if compact:
+        create_compact_tables(conn, replace=not incremental)
+    else:
+        if not incremental:
+            conn.execute("DROP TABLE IF EXISTS vehicles")
+        storage.create_table(conn, 'ev_sales', schema, replace=not incremental)
+    return watermark, wanted
+
+
+def stored_ev_keys(conn, watermark):
+    """Count the stored registrations from the watermark's day on per ``EV_KEY`` (see data_transform.watermark.drop_stored_rows)."""
+    return stored_key_counts(read_ev_sales(conn, since=overlap_start(watermark)), EV_KEY)
+
+
+def insert_ev_rows(conn, df, compact=False, known=None):
+    """Append preprocessed rows to ev_sales in the given layout. Returns the row count."""
+    if compact:
+        return insert_compact(conn, df[['registration_date', 'vehicle_name']], {} if known is None else known)
+    return storage.insert_frame(conn, 'ev_sales', df)
+
+
+def save_to_partitions(df, db_path, incremental=False, compact=False):
+    """
+    Store preprocessed EV registrations in year partitions (see data_transform.ev_partitions).
+
+    With ``incremental=True`` the years before the latest stored year are kept
+    as they are and only the latest and newer years are rewritten from ``df``;
+    otherwise every partition is rebuilt.
+
+    Returns the earliest registration date written, or None if nothing was written.
+    """
+    logging.info("Saving data to year-partitioned SQLite tables.")
+    ensure_db_directory(db_path)
+
     try:
-        with sqlite3.connect(db_path) as conn:
-            df.to_sql('ev_sales', conn, if_exists='replace', index=False)
+        with storage.transaction(db_path) as conn:
+            state = open_partitioned_store(conn, df[['registration_date', 'vehicle_name']], incremental=incremental, compact=compact)
+            written = write_partitioned_rows(conn, state, df)
+            finish_partitioned_store(conn, state)
+            if written.empty:
+                logging.info("No EV partitions to rewrite.")
+                return None
+            write_watermark(conn, 'ev_sales', 'registration_date', written['registration_date'].max())
         logging.info(f"Data saved to SQLite database at {db_path}")
+        return written['registration_date'].min()
     except Exception as e:
         logging.error(f"Error saving data to SQLite database: {e}")
         raise
 
 
-def fetch_and_preprocess_ev_sales(csv_file_path, db_path):
+def save_to_sqlite(df, db_path, incremental=False, compact=False):
+    """
+    Store preprocessed EV registrations in the ev_sales table.
+
+    With ``incremental=True`` only registrations not already stored from the
+    table's high-water mark day on are appended; otherwise the table is replaced. The
+    watermark is updated in both modes. With ``compact=True`` the rows are
+    stored dictionary-encoded (see data_transform.ev_schema).
+
+    Returns the earliest registration date written, or None if nothing was new.
+    """
+    logging.info("Saving data to SQLite database.")
+    ensure_db_directory(db_path)
+
+    try:
+        with storage.transaction(db_path) as conn:
+            watermark, layout = open_ev_table(conn, df, incremental=incremental, compact=compact)
+            if watermark is not None:
+                df = rows_after_watermark(df, 'registration_date', watermark)
+                df, _ = drop_stored_rows(df, EV_KEY, stored_ev_keys(conn, watermark))
+                if df.empty:
+                    logging.info("No new EV registrations to store.")
+                    return None
+            insert_ev_rows(conn, df, compact=compact)
+            if df.empty:
+                return None
+            write_watermark(conn, 'ev_sales', 'registration_date', df['registration_date'].max())
+        storage.create_indexes(db_path, 'ev_sales', [date_column(layout)])
+        logging.info(f"Data saved to SQLite database at {db_path}")
+        return df['registration_date'].min()
+    except Exception as e:
+        logging.error(f"Error saving data to SQLite database: {e}")
+        raise
+
+
+def ingest_ev_sales_chunked(csv_file_path, db_path, chunksize=DEFAULT_CHUNKSIZE, incremental=False, compact=False, partitioned=False):
+    """
+    Stream the EV registrations CSV into the ev_sales table chunk by chunk.
+
+    Only the two required columns are read, with explicit string dtypes. Each
+    chunk is preprocessed as it arrives and appended inside a single
+    transaction, so peak memory depends on ``chunksize`` rather than on the
+    size of the file and a failed load leaves the previous table intact.
+
+    Parameters:
+    - csv_file_path: Path to the raw EV registrations CSV.
+    - db_path: Path to the SQLite database file.
+    - chunksize: Number of CSV rows processed per chunk.
+    - incremental: Append only rows newer than the high-water mark instead of replacing the table.
+    - compact: Store the dictionary-encoded layout (see data_transform.ev_schema).
+    - partitioned: Store one table per registration year (see data_transform.ev_partitions);
+      ``incremental`` then rewrites only the latest and newer years.
+
+    Returns the earliest registration date stored, or None if no rows were stored.
+    """
+    header = pd.read_csv(csv_file_path, nrows=0)
+    if not all(col in header.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(f"The expected columns {REQUIRED_COLUMNS} are missing from the CSV file.")
+
+    ensure_db_directory(db_path)
+    dtypes = dict(CSV_DTYPES, **{'Vehicle Name': 'category'}) if compact else CSV_DTYPES
+    reader = pd.read_csv(csv_file_path, usecols=REQUIRED_COLUMNS, dtype=dtypes, chunksize=chunksize)
+    total_rows = 0
+    earliest = latest = None
+    known_vehicles = {}
+    schema = pd.DataFrame({'registration_date': pd.Series(dtype='datetime64[ns]'), 'vehicle_name': pd.Series(dtype=str)})
+    with storage.transaction(db_path) as conn:
+        if partitioned:
+            state = open_partitioned_store(conn, schema, incremental=incremental, compact=compact)
+            watermark, layout = None, state['layout']
+        else:
+            watermark, layout = open_ev_table(conn, schema, incremental=incremental, compact=compact)
+        stored = stored_ev_keys(conn, watermark) if watermark is not None else None
+        for chunk in reader:
+            processed = rows_after_watermark(preprocess_ev_sales_data(chunk, compact=compact), 'registration_date', watermark)
+            if stored is not None:
+                processed, stored = drop_stored_rows(processed, EV_KEY, stored)
+            if partitioned:
+                processed = write_partitioned_rows(conn, state, processed)
+                total_rows += len(processed)
+            elif not processed.empty:
+                total_rows += insert_ev_rows(conn, processed[['registration_date', 'vehicle_name']], compact=compact, known=known_vehicles)
+            if processed.empty:
+                continue
+            chunk_min, chunk_max = processed['registration_date'].min(), processed['registration_date'].max()
+            earliest = chunk_min if earliest is None else min(earliest, chunk_min)
+            latest = chunk_max if latest is None else max(latest, chunk_max)
+        if partitioned:
+            finish_partitioned_store(conn, state)
+        if latest is not None:
+            write_watermark(conn, 'ev_sales', 'registration_date', latest)
+    if not partitioned:
+        storage.create_indexes(db_path, 'ev_sales', [date_column(layout)])
+    logging.info(f"Stored {total_rows} EV registrations in {db_path} in chunks of {chunksize}.")
+    return earliest
+
+
+def fetch_and_preprocess_ev_sales(csv_file_path, db_path, chunksize=None, incremental=False, compact=False, partitioned=False, cube=False):
+    """
+    Load the EV registrations CSV into the EV database.
+
+    With ``cube=True`` the month x vehicle aggregate cube (see
+    data_transform.ev_cube) is maintained as well: in incremental mode only
+    the months from the earliest new registration are recounted. Without it
+    an existing cube is dropped, since it no longer matches ev_sales.
+
+    Returns the earliest registration date stored, or None if nothing was stored.
+    """
     try:
         logging.info(f"Reading data from CSV file: {csv_file_path}")
-        df = pd.read_csv(csv_file_path)
-        processed_df = preprocess_ev_sales_data(df)
-        save_to_sqlite(processed_df, db_path)
+        if chunksize:
+            earliest = ingest_ev_sales_chunked(csv_file_path, db_path, chunksize=chunksize, incremental=incremental, compact=compact, partitioned=partitioned)
+        else:
+            df = pd.read_csv(csv_file_path)
+            processed_df = preprocess_ev_sales_data(df, compact=compact)
+            store = save_to_partitions if partitioned else save_to_sqlite
+            earliest = store(processed_df, db_path, incremental=incremental, compact=compact)
+        if not cube:
+            remove_ev_cube(db_path)
+        elif not (incremental and earliest is None):
+            update_ev_cube(db_path, since=earliest if incremental else None)
         logging.info("Data fetching, preprocessing, and saving to database completed successfully.")
+        return earliest
     except Exception as e:
         logging.error(f"Error in the fetch_and_preprocess_ev_sales pipeline: {e}")
         raise
@@ -0,0 +1,148 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+import data_transform.storage as storage
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LEGACY = 'legacy'
+COMPACT = 'compact'
+
+# SQL expression that turns a compact day number back into 'YYYY-MM-DD' text
+DAY_TO_DATE_SQL = "date({column} * 86400, 'unixepoch')"
+
+
+def ev_layout(conn, schema='main'):
+    """
+    Return the layout of the ev_sales table: 'compact', 'legacy', or None if it does not exist.
+
+    The compact layout stores ``registration_day`` (days since 1970-01-01) and a
+    ``vehicle_id`` into the ``vehicles`` table; the legacy layout stores
+    ``registration_date`` text and the ``vehicle_name`` string on every row.
+    A year-partitioned store reports the layout of its ev_sales view.
+    """
+    columns = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(ev_sales)")]
+    if not columns:
+        return None
+    return COMPACT if 'registration_day' in columns else LEGACY
+
+
+def date_column(layout):
+    """Return the column that range predicates on ev_sales should filter."""
+    return 'registration_day' if layout == COMPACT else 'registration_date'
+
+
+def date_sql(layout, alias=None):
+    """Return an SQL expression yielding the registration date as text for either layout."""
+    column = f"{alias}.{date_column(layout)}" if alias else date_column(layout)
+    return DAY_TO_DATE_SQL.format(column=column) if layout == COMPACT else column
+
+
+def date_param(value, layout):
+    """Convert a date bound into the parameter matching ``date_column(layout)``."""
+    if layout == COMPACT:
+        return int(to_day_numbers(pd.Series([pd.Timestamp(value)])).iloc[0])
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def to_day_numbers(dates):
+    """Convert datetimes into int32 day numbers (days since 1970-01-01)."""
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype('int64')
+    return pd.Series(days.astype('int32'), index=dates.index)
+
+
+def from_day_numbers(days):
+    """Convert day numbers back into datetime64 values."""
+    return pd.to_datetime(pd.Series(days, dtype='int64'), unit='D')
+
+
+def create_compact_tables(conn, replace=False):
+    """Create the vehicles dimension and the compact ev_sales fact table."""
+    if replace:
+        conn.execute("DROP TABLE IF EXISTS ev_sales")
+        conn.execute("DROP TABLE IF EXISTS vehicles")
+    create_vehicles_table(conn)
+    create_compact_fact(conn, 'ev_sales')
+
+
+def create_vehicles_table(conn):
+    """Create the vehicles dimension table if it does not exist."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS vehicles (vehicle_id INTEGER PRIMARY KEY, vehicle_name TEXT NOT NULL UNIQUE)"
+    )
+
+
+def create_compact_fact(conn, table):
+    """Create a compact (registration_day, vehicle_id) fact table, e.g. ev_sales or a year partition."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        "registration_day INTEGER NOT NULL, "
+        "vehicle_id INTEGER NOT NULL REFERENCES vehicles (vehicle_id))"
+    )
+
+
+def vehicle_ids(conn, names, known):
+    """
+    Return the vehicle_id of every name in ``names``, adding unseen names to ``vehicles``.
+
+    ``known`` maps names to ids and is updated in place, so a chunked load only
+    queries the dimension table for names it has not met yet.
+    """
+    missing = [name for name in names if name not in known]
+    if missing:
+        conn.executemany("INSERT OR IGNORE INTO vehicles (vehicle_name) VALUES (?)", [(name,) for name in missing])
+        placeholders = ', '.join('?' for _ in missing)
+        known.update(
+            (name, vehicle_id) for vehicle_id, name in
+            conn.execute(f"SELECT vehicle_id, vehicle_name FROM vehicles WHERE vehicle_name IN ({placeholders})", missing)
+        )
+    return np.array([known[name] for name in names], dtype='int32')
+
+
+def encode_ev_rows(conn, df, known):
+    """
+    Encode preprocessed registrations into the compact (registration_day, vehicle_id) layout.
+
+    Vehicle names are dictionary-encoded through their categorical codes, so
+    the dimension lookup runs once per distinct name instead of once per row.
+    """
+    names = df['vehicle_name'].astype('category').cat.remove_unused_categories()
+    ids = vehicle_ids(conn, list(names.cat.categories), known)
+    return pd.DataFrame({
+        'registration_day': to_day_numbers(df['registration_date']),
+        'vehicle_id': ids[names.cat.codes.to_numpy()],
+    })
+
+
+def insert_compact(conn, df, known, table='ev_sales'):
+    """Dictionary-encode ``df`` and append it to a compact fact table. Returns the row count."""
+    return storage.insert_frame(conn, table, encode_ev_rows(conn, df, known))
+
+
+def read_ev_sales(conn, since=None):
+    """
+    Load ev_sales into pandas from either layout.
+
+    With ``since`` only registrations on or after that date are loaded.
+
+    Returns ``registration_date`` as datetime64 and ``vehicle_name`` as a
+    categorical, so each distinct name is held once in memory.
+    """
+    layout = ev_layout(conn)
+    where, params = ("", ()) if since is None else (f" WHERE {date_column(layout)} >= ?", (date_param(since, layout),))
+    if layout == COMPACT:
+        facts = pd.read_sql_query("SELECT registration_day, vehicle_id FROM ev_sales" + where, conn, params=params)
+        vehicles = pd.read_sql_query("SELECT vehicle_id, vehicle_name FROM vehicles ORDER BY vehicle_id", conn)
+        codes = np.searchsorted(vehicles['vehicle_id'].to_numpy(), facts['vehicle_id'].to_numpy())
+        return pd.DataFrame({
+            'registration_date': from_day_numbers(facts['registration_day']),
+            'vehicle_name': pd.Categorical.from_codes(codes, categories=vehicles['vehicle_name']),
+        })
+    df = pd.read_sql_query("SELECT registration_date, vehicle_name FROM ev_sales" + where, conn, params=params)
+    df['registration_date'] = pd.to_datetime(df['registration_date'])
+    df['vehicle_name'] = df['vehicle_name'].astype('category')
+    return df
@@ -0,0 +1,134 @@
+import os
+import re
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_transform.ev_sales_data import REQUIRED_COLUMNS, preprocess_ev_sales_data
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Canonical column -> column of the atlasevhub registration CSVs
+DEFAULT_COLUMNS = {'registration_date': 'Registration Valid Date', 'vehicle_name': 'Vehicle Name'}
+SOURCE_NAME = re.compile(r'^[a-z][a-z0-9_]*$')
+
+
+def volume_column(name):
+    """Return the merged_data column holding the monthly volume of source ``name``."""
+    return f"volume_{name}"
+
+
+def load_sources(config, data_dir):
+    """
+    Read the ``[[ev_sources]]`` tables of the config.
+
+    Each source has a ``name`` (lowercase identifier, used in the
+    ``volume_<name>`` column), an optional ``url`` to fetch, an optional
+    ``file`` (default ``raw_ev_sales_<name>.csv`` in ``data_dir``) and an
+    optional ``columns`` table mapping ``registration_date`` and
+    ``vehicle_name`` to the source's own CSV headers.
+
+    Returns a list of source dicts, empty when no sources are configured.
+    """
+    sources = []
+    for entry in config.get('ev_sources', []):
+        name = entry['name']
+        if not SOURCE_NAME.match(name):
+            raise ValueError(f"EV source name '{name}' must be a lowercase identifier.")
+        if any(source['name'] == name for source in sources):
+            raise ValueError(f"EV source '{name}' is configured twice.")
+        sources.append({
+            'name': name,
+            'url': entry.get('url'),
+            'path': os.path.join(data_dir, entry.get('file', f"raw_ev_sales_{name}.csv")),
+            'columns': dict(DEFAULT_COLUMNS, **entry.get('columns', {})),
+        })
+    return sources
+
+
+def monthly_volume(csv_path, columns, from_yr, to_yr, chunksize=None):
+    """
+    Count the registrations of one source CSV per month within [from_yr, to_yr].
+
+    The source's columns are renamed to the atlasevhub headers so the shared
+    ``preprocess_ev_sales_data`` cleaning applies; with ``chunksize`` the file
+    is counted chunk by chunk.
+    """
+    renames = {columns['registration_date']: REQUIRED_COLUMNS[0], columns['vehicle_name']: REQUIRED_COLUMNS[1]}
+    reader = pd.read_csv(csv_path, usecols=list(renames), dtype=str, chunksize=chunksize)
+    counts = []
+    for chunk in ([reader] if chunksize is None else reader):
+        df = preprocess_ev_sales_data(chunk.rename(columns=renames))
+        years = df['registration_date'].dt.year
+        df = df[(years >= int(from_yr)) & (years <= int(to_yr))]
+        counts.append(df['registration_date'].dt.to_period('M').dt.to_timestamp('M').value_counts())
+    volume = pd.concat(counts).groupby(level=0).sum() if counts else pd.Series(dtype='int64')
+    return volume.rename_axis('timestamp').sort_index().reset_index(name='volume').astype({'volume': 'int64'})
+
+
+def process_source(source, from_yr, to_yr, stream=False, use_cache=False, chunksize=None):
+    """
+    Fetch, preprocess and aggregate one source; runs in a worker process.
+
+    Returns (name, monthly volume frame).
+    """
+    if source['url']:
+        from data_process.fetch_data import fetch_data_from_url
+        fetch_data_from_url(source['url'], source['path'], stream=stream, use_cache=use_cache)
+    monthly = monthly_volume(source['path'], source['columns'], from_yr, to_yr, chunksize=chunksize)
+    logger.info(f"EV source '{source['name']}': {int(monthly['volume'].sum())} registrations in {len(monthly)} months.")
+    return source['name'], monthly
+
+
+def fan_out_sources(sources, from_yr, to_yr, max_workers=None, stream=False, use_cache=False, chunksize=None):
+    """
+    Process every source in its own worker process.
+
+    The sources run concurrently, so the wall time is that of the slowest
+    source rather than the sum; only the small monthly frames are sent back.
+
+    Parameters:
+    - sources: Source dicts from ``load_sources``.
+    - from_yr, to_yr: Year window of the monthly counts.
+    - max_workers: Upper bound on worker processes (defaults to one per source).
+    - stream, use_cache: Download options (see data_process.fetch_data).
+    - chunksize: Read each CSV in chunks of this many rows.
+
+    Returns a dict mapping source name to its monthly volume frame.
+    """
+    workers = min(len(sources), max_workers or len(sources))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_source, source, from_yr, to_yr, stream=stream, use_cache=use_cache, chunksize=chunksize): source['name']
+            for source in sources
+        }
+        for future, name in futures.items():
+            try:
+                results[name] = future.result()[1]
+            except Exception as e:
+                logger.error(f"Error processing EV source '{name}': {e}")
+                raise
+    return results
+
+
+def reduce_source_volumes(volumes):
+    """
+    Combine per-source monthly volumes into one frame.
+
+    Returns the columns timestamp, volume (the total over all sources) and
+    one ``volume_<name>`` column per source; a month missing from a source
+    counts as zero registrations there.
+    """
+    columns = [volume_column(name) for name in volumes]
+    if not volumes:
+        return pd.DataFrame(columns=['timestamp', 'volume'])
+    wide = pd.concat(
+        [monthly.set_index('timestamp')['volume'].rename(volume_column(name)) for name, monthly in volumes.items()],
+        axis=1,
+    ).sort_index().fillna(0).astype('int64')
+    wide.insert(0, 'volume', wide[columns].sum(axis=1))
+    return wide.rename_axis('timestamp').reset_index()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import logging
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+EXPECTED_GAP_DAYS = 7
+GAP_STRATEGIES = ('neighbour_mean', 'linear', 'ffill', 'calendar')
+
+
+def find_gaps(timestamps, expected_days=EXPECTED_GAP_DAYS):
+    """
+    Flag rows whose distance to the previous row is not ``expected_days``.
+
+    The first row is never flagged. A missing timestamp counts as a gap, the
+    same way the original row-by-row check treated a NaN difference.
+
+    Parameters:
+    - timestamps: Sorted datetime Series.
+    - expected_days: Expected spacing between consecutive rows.
+
+    Returns a boolean NumPy array aligned positionally with ``timestamps``.
+    """
+    week_diff = timestamps.diff().dt.days.to_numpy(dtype=float)
+    gaps = week_diff != expected_days
+    if len(gaps):
+        gaps[0] = False
+    return gaps
+
+
+def neighbour_mean(prices, gaps):
+    """
+    Replace each gap with the mean of its previous (already repaired) value and its next value.
+
+    This is the vectorized form of the original loop, which walked the series
+    in order and wrote ``(price[i - 1] + price[i + 1]) / 2``. Because the left
+    neighbour is the repaired value, consecutive gaps form the recurrence
+    ``y[i] = 0.5 * y[i - 1] + 0.5 * price[i + 1]``, which is an exponentially
+    weighted mean with ``alpha=0.5`` seeded by the last good value before the run.
+    A gap in the final row copies its repaired left neighbour.
+
+    Parameters:
+    - prices: 1-D float array sorted by time.
+    - gaps: Boolean array from ``find_gaps``.
+
+    Returns a new float array.
+    """
+    prices = np.asarray(prices, dtype=float)
+    gaps = np.asarray(gaps, dtype=bool)
+    n = len(prices)
+    repaired = prices.copy()
+    if n < 2 or not gaps.any():
+        return repaired
+
+    # Handle the last row separately: it has no right neighbour
+    last_is_gap = gaps[-1]
+    body_gaps = gaps.copy()
+    body_gaps[-1] = False
+
+    if body_gaps.any():
+        # Each run of gaps, together with the good row just before it, forms one group
+        run_start = body_gaps & ~np.r_[False, body_gaps[:-1]]
+        seed = np.r_[run_start[1:], False]
+        in_group = body_gaps | seed
+        group_ids = np.cumsum(seed)[in_group]
+
+        next_prices = np.r_[prices[1:], np.nan]
+        values = np.where(body_gaps, next_prices, prices)[in_group]
+
+        # A NaN anywhere in the recurrence makes the rest of that run NaN
+        is_nan = pd.Series(np.isnan(values))
+        poisoned = is_nan.groupby(group_ids).cummax().to_numpy()
+
+        # Group ids increase with position, so the grouped result keeps positional order
+        smoothed = (
+            pd.Series(np.nan_to_num(values))
+            .groupby(group_ids)
+            .ewm(alpha=0.5, adjust=False)
+            .mean()
+            .to_numpy()
+        )
+        smoothed[poisoned] = np.nan
+        repaired[in_group] = np.where(body_gaps[in_group], smoothed, repaired[in_group])
+
+    if last_is_gap:
+        repaired[-1] = repaired[-2]
+    return repaired
+
+
+def repair_gaps(gas_df, strategy='neighbour_mean', expected_days=EXPECTED_GAP_DAYS):
+    """
+    Repair the prices of rows that break the weekly spacing of the gas series.
+
+    Strategies:
+    - neighbour_mean: Mean of the repaired previous price and the next price (the original behaviour).
+    - linear: Drop the price at each gap and interpolate it linearly in time.
+    - ffill: Carry the previous price forward over each gap.
+    - calendar: Reindex onto a regular ``expected_days`` calendar starting at the
+      first timestamp and interpolate the prices in time. Off-calendar rows are dropped.
+
+    Parameters:
+    - gas_df: DataFrame with 'timestamp' (datetime) and 'price' columns, sorted by timestamp.
+    - strategy: One of GAP_STRATEGIES.
+    - expected_days: Expected spacing between consecutive rows.
+
+    Returns a new DataFrame with a positional index.
+    """
+    if strategy not in GAP_STRATEGIES:
+        raise ValueError(f"Unknown gap repair strategy '{strategy}'. Expected one of {GAP_STRATEGIES}.")
+
+    gas_df = gas_df.reset_index(drop=True)
+    gaps = find_gaps(gas_df['timestamp'], expected_days)
+    logger.info(f"Repairing {int(gaps.sum())} gap(s) with strategy '{strategy}'.")
+
+    if strategy == 'neighbour_mean':
+        gas_df['price'] = neighbour_mean(gas_df['price'].to_numpy(dtype=float), gaps)
+    elif strategy == 'linear':
+        prices = gas_df['price'].astype(float).mask(gaps)
+        prices.index = pd.DatetimeIndex(gas_df['timestamp'])
+        gas_df['price'] = prices.interpolate(method='time', limit_direction='both').to_numpy()
+    elif strategy == 'ffill':
+        gas_df['price'] = gas_df['price'].astype(float).mask(gaps).ffill()
+    else:
+        prices = gas_df.dropna(subset=['timestamp']).set_index('timestamp')['price'].astype(float)
+        prices = prices[~prices.index.duplicated(keep='last')]
+        calendar = pd.date_range(prices.index.min(), prices.index.max(), freq=f'{expected_days}D')
+        prices = prices.reindex(prices.index.union(calendar)).interpolate(method='time', limit_direction='both')
+        gas_df = prices.reindex(calendar).rename_axis('timestamp').reset_index(name='price')
+    return gas_df
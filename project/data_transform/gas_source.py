@@ -0,0 +1,141 @@
+import os
+import glob
+import hashlib
+import logging
+
+import pandas as pd
+
+from data_transform.artifacts import pa, write_artifact, read_artifact
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+GAS_SHEET = 'Data 1'
+HEADER_ROWS = 2
+CHUNK_SIZE = 1024 * 1024
+
+
+def workbook_digest(file_path):
+    """Return the SHA-256 of the workbook file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_path(file_path, digest, cache_dir=None):
+    """
+    Return the path of the parsed-frame sidecar for a workbook.
+
+    The sidecar name embeds the workbook hash, so a new download never matches
+    a stale cache. Arrow IPC is used when pyarrow is installed, pickle otherwise.
+    """
+    extension = '.arrow' if pa is not None else '.pkl'
+    return f"{sidecar_base(file_path, cache_dir)}.{digest[:16]}.parsed{extension}"
+
+
+def sidecar_base(file_path, cache_dir=None):
+    """Return the sidecar path prefix shared by every cached parse of a workbook."""
+    return os.path.join(cache_dir, os.path.basename(file_path)) if cache_dir else file_path
+
+
+def xls_cell_value(cell, datemode):
+    """Convert an xlrd cell to a Python value: date cells to datetimes, empty cells to None."""
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate_as_datetime(cell.value, datemode)
+    return cell.value
+
+
+def read_xls_rows(file_path, sheet_name):
+    """
+    Yield the first two cells of every row of an ``.xls`` sheet from the header row on.
+
+    The workbook is opened with xlrd's ``on_demand`` so only ``sheet_name`` is
+    parsed; BIFF stores a sheet as one record stream, so that sheet itself is
+    loaded whole, but no DataFrame of its other columns is ever built.
+    """
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_name(sheet_name)
+        for rowx in range(HEADER_ROWS, sheet.nrows):
+            values = [xls_cell_value(cell, workbook.datemode) for cell in sheet.row_slice(rowx, 0, 2)]
+            yield tuple(values + [None] * (2 - len(values)))
+    finally:
+        workbook.release_resources()
+
+
+def read_xlsx_rows(file_path, sheet_name):
+    """Yield the first two cells of every row of an ``.xlsx``/``.xlsm`` sheet from the header row on, streamed by openpyxl."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from workbook[sheet_name].iter_rows(min_row=HEADER_ROWS + 1, max_col=2, values_only=True)
+    finally:
+        workbook.close()
+
+
+def stream_gas_columns(file_path, sheet_name=GAS_SHEET):
+    """
+    Read only the Date and price columns of the EIA gas sheet.
+
+    ``.xlsx``/``.xlsm`` workbooks are streamed row by row with openpyxl in
+    read-only mode, and legacy ``.xls`` workbooks (the format EIA publishes)
+    are read cell by cell with xlrd, opening only the gas sheet. Either way
+    the rest of the sheet is never materialised as a frame. Other formats go
+    through ``pd.read_excel`` limited to the first two columns.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        rows = read_xlsx_rows(file_path, sheet_name)
+    elif extension == '.xls':
+        rows = read_xls_rows(file_path, sheet_name)
+    else:
+        return pd.read_excel(file_path, sheet_name=sheet_name, skiprows=HEADER_ROWS, usecols=[0, 1])
+    header = next(rows)
+    df = pd.DataFrame(list(rows), columns=list(header))
+    df = df.dropna(how='all')
+    df[header[0]] = pd.to_datetime(df[header[0]], errors='coerce')
+    return df
+
+
+def read_gas_workbook(file_path, use_cache=True, cache_dir=None):
+    """
+    Load the gas price columns of the EIA workbook, using a parsed sidecar when possible.
+
+    The first run streams the two columns out of the workbook and saves them as
+    a compact binary sidecar keyed by the workbook's SHA-256; later runs with an
+    identical workbook load the sidecar instead of parsing Excel again. Older
+    sidecars of the same workbook are removed. The returned frame keeps the
+    sheet's column names, so it can be passed unchanged to
+    ``transform_and_store_data``.
+
+    Parameters:
+    - file_path: Path to the downloaded workbook.
+    - use_cache: Read and write the sidecar cache.
+    - cache_dir: Directory for sidecars; defaults to the workbook's directory.
+    """
+    if not use_cache:
+        return stream_gas_columns(file_path)
+
+    cache_path = sidecar_path(file_path, workbook_digest(file_path), cache_dir)
+    if os.path.exists(cache_path):
+        logging.info(f"Loading parsed gas data from cache {cache_path}")
+        return read_artifact(cache_path) if cache_path.endswith('.arrow') else pd.read_pickle(cache_path)
+
+    df = stream_gas_columns(file_path)
+    for stale_path in glob.glob(glob.escape(sidecar_base(file_path, cache_dir)) + '.*.parsed.*'):
+        os.remove(stale_path)
+    if cache_path.endswith('.arrow'):
+        write_artifact(df, cache_path, 'arrow')
+    else:
+        df.to_pickle(cache_path)
+    logging.info(f"Parsed gas workbook {file_path} and cached it at {cache_path}")
+    return df
@@ -1,34 +1,59 @@
+import os
 import pandas as pd
 import sqlite3
 import logging
+from data_transform.gap_repair import repair_gaps
+import data_transform.storage as storage
+from data_transform.ev_schema import ev_layout, date_column, date_sql, date_param, from_day_numbers
+from data_transform.ev_partitions import ev_source_sql
+from data_transform.ev_cube import has_cube, cube_monthly
+from data_transform.artifacts import export_frame, artifact_path, write_artifact
+from data_transform.quality_report import (format_timestamps, write_log_lines, rewrite_log_window, gap_issues, missing_issues,
+                                           read_issues, write_quality_report, GAP_LOG_PREFIX, MISSING_LOG_PREFIX)
 
 # Configure logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-def process_gas_data(gas_df, log_file):
+def process_gas_data(gas_df, log_file, gap_strategy='neighbour_mean', report_path=None, since=None, rows_before=0):
+    """
+    Repair the weekly gas prices and average them per month, logging the weekly gaps.
+
+    With ``since`` (a partial-window merge) only the gaps from the month of
+    ``since`` onwards are rewritten in the log and the quality report; the
+    earlier entries are kept, and ``rows_before`` counts the gas rows before
+    that month so the report's totals still cover the full history.
+    """
     try:
         gas_df['timestamp'] = pd.to_datetime(gas_df['timestamp'])
-        gas_df = gas_df.sort_values(by='timestamp')
+        gas_df = gas_df.sort_values(by='timestamp').reset_index(drop=True)
 
         # Check weekly consistency and normalize disruptions
         gas_df['week_diff'] = gas_df['timestamp'].diff().dt.days
-        inconsistent_rows = gas_df[(gas_df['week_diff'] != 7) & (gas_df['week_diff'].notnull())]
+        inconsistent_rows = gap_issues(gas_df)
+        total_rows = len(gas_df)
+        if since is not None:
+            start = month_start(since)
+            inconsistent_rows = inconsistent_rows[inconsistent_rows['timestamp'] >= start].reset_index(drop=True)
+            total_rows = rows_before + int((gas_df['timestamp'] >= start).sum())
 
-        with open(log_file, 'w') as log:
-            for _, row in inconsistent_rows.iterrows():
-                log.write(f"Inconsistency found: {row['timestamp']} - {row['price']}\n")
+        lines = (GAP_LOG_PREFIX + format_timestamps(inconsistent_rows['timestamp'])
+                 + " - " + inconsistent_rows['price'].astype(str))
+        if since is None:
+            write_log_lines(lines, log_file, mode='w')
+            if report_path:
+                write_quality_report('weekly_gap', inconsistent_rows, total_rows, report_path)
+        else:
+            rewrite_log_window(lines, log_file, GAP_LOG_PREFIX, start)
+            if report_path:
+                kept = read_issues('weekly_gap', report_path, start)
+                issues = inconsistent_rows if kept.empty else pd.concat([kept, inconsistent_rows], ignore_index=True)
+                write_quality_report('weekly_gap', issues, total_rows, report_path, replace=True)
 
         # Normalize disruptions
-        for i in range(1, len(gas_df)):
-            if gas_df.iloc[i]['week_diff'] != 7:
-                if i + 1 < len(gas_df):
-                    gas_df.at[i, 'price'] = (gas_df.iloc[i - 1]['price'] + gas_df.iloc[i + 1]['price']) / 2
-                elif i - 1 >= 0:
-                    gas_df.at[i, 'price'] = gas_df.iloc[i - 1]['price']
-
-        # Drop helper columns and group by month
-        gas_df.drop(columns=['week_diff'], inplace=True)
+        gas_df = repair_gaps(gas_df.drop(columns=['week_diff']), strategy=gap_strategy)
+
+        # Group by month
         gas_df['timestamp'] = gas_df['timestamp'].dt.to_period('M').dt.to_timestamp('M')
         gas_monthly = gas_df.groupby('timestamp')['price'].mean().reset_index()
 
@@ -40,7 +65,12 @@ def process_gas_data(gas_df, log_file):
 
 def process_ev_data(ev_df):
     try:
-        ev_df['timestamp'] = pd.to_datetime(ev_df['registration_date']).dt.to_period('M').dt.to_timestamp('M')
+        # Compact ev_sales rows carry day numbers instead of date text (see data_transform.ev_schema)
+        if 'registration_day' in ev_df.columns:
+            registration_date = from_day_numbers(ev_df['registration_day'])
+        else:
+            registration_date = pd.to_datetime(ev_df['registration_date'])
+        ev_df['timestamp'] = registration_date.dt.to_period('M').dt.to_timestamp('M')
         ev_monthly = ev_df.groupby('timestamp').size().reset_index(name='volume')
         logger.info("Processed EV data successfully.")
         return ev_monthly
@@ -48,77 +78,271 @@ def process_ev_data(ev_df):
         logger.error(f"Error processing EV data: {e}")
         return pd.DataFrame()
 
-def merge_data(gas_monthly, ev_monthly, merged_output_csv_path, log_file):
+def to_nullable(merged_df):
+    """
+    Cast price to Float64 and volume to Int64, the nullable dtypes used through the merge path.
+
+    Per-source ``volume_<name>`` columns (see data_transform.ev_sources) are
+    cast like volume. Legacy 'NIL' placeholders (e.g. from an older merged CSV)
+    are read as missing values.
+    """
+    merged_df = merged_df.copy()
+    merged_df['price'] = pd.to_numeric(merged_df['price'], errors='coerce').astype('Float64')
+    for column in volume_columns(merged_df):
+        merged_df[column] = pd.to_numeric(merged_df[column], errors='coerce').astype('Int64')
+    return merged_df
+
+def volume_columns(merged_df):
+    """Return volume and any per-source volume_<name> columns of a merged frame."""
+    return [column for column in merged_df.columns if column == 'volume' or column.startswith('volume_')]
+
+def log_missing_months(merged_df, log_file, report_path=None, since=None, rows_before=0):
+    """
+    Log (and report) the outer-joined months where the gas price or the EV volume is missing.
+
+    With ``since`` ``merged_df`` holds only the months from the month of
+    ``since`` onwards; just those entries are rewritten in the log and the
+    report, and ``rows_before`` counts the merged_data months before them
+    (see ``process_gas_data``).
+    """
+    missing = merged_df['price'].isna() | merged_df['volume'].isna()
+    mismatched = merged_df[missing]
+    lines = (MISSING_LOG_PREFIX + format_timestamps(mismatched['timestamp'])
+             + ": Gas - " + mismatched['price'].astype('string').fillna('NIL')
+             + ", EV - " + mismatched['volume'].astype('string').fillna('NIL'))
+    if since is None:
+        if report_path:
+            write_quality_report('missing_month', missing_issues(merged_df, missing), len(merged_df), report_path, append=True)
+        write_log_lines(lines, log_file, mode='a')
+        return
+
+    start = month_start(since)
+    if report_path:
+        kept = read_issues('missing_month', report_path, start)
+        issues = missing_issues(merged_df, missing)
+        issues = issues if kept.empty else pd.concat([kept, issues], ignore_index=True)
+        # merged_data holds the complete months before the window; the incomplete ones are the kept issues
+        write_quality_report('missing_month', issues, rows_before + len(kept) + len(merged_df), report_path, replace=True)
+    rewrite_log_window(lines, log_file, MISSING_LOG_PREFIX, start)
+
+def merge_data(gas_monthly, ev_monthly, merged_output_csv_path, log_file, report_path=None, since=None, rows_before=0):
     try:
-        merged_df = pd.merge(gas_monthly, ev_monthly, on='timestamp', how='outer')
-        merged_df['price'].fillna('NIL', inplace=True)
-        merged_df['volume'].fillna('NIL', inplace=True)
+        merged_df = to_nullable(pd.merge(gas_monthly, ev_monthly, on='timestamp', how='outer'))
 
         # Log mismatched rows
-        with open(log_file, 'a') as log:
-            for _, row in merged_df.iterrows():
-                if row['price'] == 'NIL' or row['volume'] == 'NIL':
-                    log.write(f"Missing data for {row['timestamp']}: Gas - {row['price']}, EV - {row['volume']}\n")
+        log_missing_months(merged_df, log_file, report_path=report_path, since=since, rows_before=rows_before)
 
         # Remove rows where both values are missing
-        merged_df = merged_df[(merged_df['price'] != 'NIL') | (merged_df['volume'] != 'NIL')]
+        merged_df = merged_df[merged_df['price'].notna() | merged_df['volume'].notna()]
 
         # Save merged data
-        merged_df.to_csv(merged_output_csv_path, index=False)
-        logger.info(f"Merged data saved to {merged_output_csv_path}.")
+        if merged_output_csv_path:
+            merged_df.to_csv(merged_output_csv_path, index=False)
+            logger.info(f"Merged data saved to {merged_output_csv_path}.")
         return merged_df
     except Exception as e:
         logger.error(f"Error merging data: {e}")
         return pd.DataFrame()
 
-def save_to_db(merged_df, db_path):
+def upsert_merged_data(validated_df, db_path):
+    """Insert or update merged months keyed on timestamp."""
+    with storage.transaction(db_path) as conn:
+        storage.create_table(conn, 'merged_data', validated_df)
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_merged_data_timestamp_key ON merged_data (timestamp)")
+        storage.insert_frame(
+            conn, 'merged_data', validated_df,
+            on_conflict="ON CONFLICT(timestamp) DO UPDATE SET price = excluded.price, volume = excluded.volume"
+        )
+
+def save_to_db(merged_df, db_path, incremental=False):
     try:
-        validated_df = merged_df[(merged_df['price'] != 'NIL') & (merged_df['volume'] != 'NIL')]
+        merged_df = to_nullable(merged_df)
+        validated_df = merged_df[merged_df['price'].notna() & merged_df['volume'].notna()].copy()
 
         # Ensure correct data types
         validated_df['timestamp'] = pd.to_datetime(validated_df['timestamp'])
-        validated_df['price'] = validated_df['price'].astype(float)
-        validated_df['volume'] = validated_df['volume'].astype(int)
+        validated_df['price'] = validated_df['price'].astype('float64')
+        for column in volume_columns(validated_df):
+            validated_df[column] = validated_df[column].astype('int64')
 
         # Save to SQLite database
-        conn = sqlite3.connect(db_path)
-        validated_df.to_sql('merged_data', conn, if_exists='replace', index=False)
-        conn.close()
+        if incremental:
+            upsert_merged_data(validated_df, db_path)
+        else:
+            storage.write_frame(db_path, 'merged_data', validated_df)
         logger.info(f"Merged data saved to SQLite database at {db_path}.")
     except Exception as e:
         logger.error(f"Error saving data to SQLite: {e}")
 
-def fetch_and_process_data(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, db_path):
+def year_window(from_yr, to_yr):
+    """Return the half-open ['from_yr-01-01', 'to_yr+1-01-01') bounds used by sargable range predicates."""
+    return f"{int(from_yr):04d}-01-01", f"{int(to_yr) + 1:04d}-01-01"
+
+def count_before(db_path, table, start, from_yr=None, to_yr=None):
+    """
+    Count the rows of ``table`` dated before ``start`` (within the year window when given).
+
+    Partial-window merges use it for the quality report's totals (see
+    ``process_gas_data``). Returns 0 if the database or table does not exist.
+    """
+    if not os.path.exists(db_path):
+        return 0
+    conditions, params = ["timestamp < ?"], [month_start(start).strftime('%Y-%m-%d')]
+    if from_yr is not None:
+        conditions.append("strftime('%Y', timestamp) BETWEEN ? AND ?")
+        params.extend([str(from_yr), str(to_yr)])
+    conn = sqlite3.connect(db_path)
     try:
-        # Fetch and process gasoline data
-        gas_conn = sqlite3.connect(gas_db_path)
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        if not exists:
+            return 0
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def ensure_index(conn, table, column):
+    """Create an index on table(column) if it does not exist yet."""
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+    conn.commit()
+
+def month_start(timestamp):
+    """Return the first day of the month containing ``timestamp``."""
+    return pd.Timestamp(timestamp).to_period('M').to_timestamp()
+
+def month_labels_to_timestamps(months):
+    """Convert 'YYYY-MM' labels into the month-end timestamps used by process_ev_data."""
+    return pd.to_datetime(months, format='%Y-%m').dt.to_period('M').dt.to_timestamp('M')
+
+def load_gas_window(gas_db_path, from_yr, to_yr, pushdown=False, since=None):
+    """
+    Load the gasoline prices of a year window.
+
+    With ``pushdown=True`` the timestamp column is indexed and filtered with a
+    range predicate that can use the index, instead of ``strftime`` on every row.
+    With ``since`` only the months from ``since`` onwards are loaded, plus the
+    week before them and the row preceding that week, so the first gap can
+    still be detected and repaired from its neighbour.
+    """
+    params = []
+    if pushdown:
+        conditions = ["timestamp >= ?", "timestamp < ?"]
+        params.extend(year_window(from_yr, to_yr))
+    else:
+        conditions = [f"strftime('%Y', timestamp) BETWEEN '{from_yr}' AND '{to_yr}'"]
+    if since is not None:
+        lookback = (month_start(since) - pd.Timedelta(days=7)).strftime('%Y-%m-%d')
+        conditions.append("timestamp >= COALESCE((SELECT MAX(timestamp) FROM gasoline_prices WHERE timestamp < ?), ?)")
+        params.extend([lookback, lookback])
+
+    gas_conn = sqlite3.connect(gas_db_path)
+    try:
+        if pushdown:
+            ensure_index(gas_conn, 'gasoline_prices', 'timestamp')
         gas_query = f"""
         SELECT timestamp, price FROM gasoline_prices
-        WHERE strftime('%Y', timestamp) BETWEEN '{from_yr}' AND '{to_yr}'
+        WHERE {' AND '.join(conditions)}
         """
-        gas_df = pd.read_sql_query(gas_query, gas_conn)
+        return pd.read_sql_query(gas_query, gas_conn, params=params)
+    finally:
         gas_conn.close()
-        gas_monthly = process_gas_data(gas_df, log_file)
-        gas_monthly.to_csv(gas_output_csv_path, index=False)
-        logger.info(f"Gas data saved to {gas_output_csv_path}.")
 
-        # Fetch and process EV data
-        ev_conn = sqlite3.connect(ev_db_path)
+def load_ev_monthly(ev_db_path, from_yr, to_yr, pushdown=False, since=None):
+    """
+    Load monthly EV registration counts for a year window.
+
+    With ``pushdown=True`` SQLite filters on an indexed range and groups by
+    month itself, so pandas only receives one row per month instead of one
+    row per registration. With ``since`` only the months from ``since`` onwards
+    are loaded. Both the legacy and the compact ev_sales layouts are read; a
+    year-partitioned store only reads the partitions inside the window. When
+    the EV ingest maintains the month x vehicle cube (see data_transform.ev_cube),
+    the pushdown path sums its cells instead of counting registrations.
+    """
+    ev_conn = sqlite3.connect(ev_db_path)
+    try:
+        if pushdown and has_cube(ev_conn):
+            ev_monthly = cube_monthly(ev_conn, from_yr, to_yr, since=since)
+            ev_monthly.insert(0, 'timestamp', month_labels_to_timestamps(ev_monthly.pop('month')))
+            logger.info("Loaded monthly EV volumes from the EV cube.")
+            return ev_monthly.astype({'volume': 'int64'})
+        layout = ev_layout(ev_conn)
+        source = ev_source_sql(ev_conn, from_yr, to_yr, since=since)
+        column, date_expr = date_column(layout), date_sql(layout)
+        params = []
+        if pushdown:
+            conditions = [f"{column} >= ?", f"{column} < ?"]
+            params.extend(date_param(bound, layout) for bound in year_window(from_yr, to_yr))
+        else:
+            conditions = [f"strftime('%Y', {date_expr}) BETWEEN '{from_yr}' AND '{to_yr}'"]
+        if since is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(date_param(month_start(since), layout))
+
+        if pushdown:
+            if source == 'main.ev_sales':
+                ensure_index(ev_conn, 'ev_sales', column)
+            ev_query = f"""
+            SELECT strftime('%Y-%m', {date_expr}) AS month, COUNT(*) AS volume
+            FROM {source}
+            WHERE {' AND '.join(conditions)}
+            GROUP BY month
+            ORDER BY month
+            """
+            ev_monthly = pd.read_sql_query(ev_query, ev_conn, params=params)
+            ev_monthly = ev_monthly.dropna(subset=['month'])
+            ev_monthly.insert(0, 'timestamp', month_labels_to_timestamps(ev_monthly.pop('month')))
+            logger.info("Aggregated EV data in SQLite successfully.")
+            return ev_monthly.astype({'volume': 'int64'})
         ev_query = f"""
-        SELECT registration_date FROM ev_sales
-        WHERE strftime('%Y', registration_date) BETWEEN '{from_yr}' AND '{to_yr}'
+        SELECT {column} FROM {source}
+        WHERE {' AND '.join(conditions)}
         """
-        ev_df = pd.read_sql_query(ev_query, ev_conn)
+        ev_df = pd.read_sql_query(ev_query, ev_conn, params=params)
+    finally:
         ev_conn.close()
-        ev_monthly = process_ev_data(ev_df)
-        ev_monthly.to_csv(ev_output_csv_path, index=False)
+    return process_ev_data(ev_df)
+
+def fetch_and_process_data(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, db_path, report_path=None, pushdown=False, since=None, artifact_format=None, csv_export=True, ev_monthly=None):
+    """
+    Build merged_data from the gas and EV stores.
+
+    With ``since`` (the earliest timestamp added by an incremental ingest), only
+    the months from ``since`` onwards are recomputed and upserted into
+    merged_data; the CSV outputs then cover those months only, while the log
+    and the quality report keep their earlier entries (see ``process_gas_data``).
+
+    With ``artifact_format`` ('arrow' or 'parquet') the gas, EV and merged frames
+    are also written as typed columnar artifacts next to their CSV paths (see
+    data_transform.artifacts); ``csv_export=False`` then skips the CSV files.
+
+    ``ev_monthly`` replaces the counts loaded from ``ev_db_path``, e.g. the
+    per-source volumes of data_transform.ev_sources.reduce_source_volumes.
+    """
+    try:
+        # Fetch and process gasoline data
+        gas_df = load_gas_window(gas_db_path, from_yr, to_yr, pushdown=pushdown, since=since)
+        gas_rows_before = count_before(gas_db_path, 'gasoline_prices', since, from_yr, to_yr) if since is not None else 0
+        gas_monthly = process_gas_data(gas_df, log_file, report_path=report_path, since=since, rows_before=gas_rows_before)
+        if since is not None:
+            gas_monthly = gas_monthly[gas_monthly['timestamp'] >= month_start(since)]
+        export_frame(gas_monthly, gas_output_csv_path, artifact_format, csv_export)
+        logger.info(f"Gas data saved to {gas_output_csv_path}.")
+
+        # Fetch and process EV data
+        if ev_monthly is None:
+            ev_monthly = load_ev_monthly(ev_db_path, from_yr, to_yr, pushdown=pushdown, since=since)
+        export_frame(ev_monthly, ev_output_csv_path, artifact_format, csv_export)
         logger.info(f"EV data saved to {ev_output_csv_path}.")
 
         # Merge processed data
-        merged_df = merge_data(gas_monthly, ev_monthly, merged_output_csv_path, log_file)
+        merged_rows_before = count_before(db_path, 'merged_data', since) if since is not None else 0
+        merged_df = merge_data(gas_monthly, ev_monthly, merged_output_csv_path if csv_export else None, log_file,
+                               report_path=report_path, since=since, rows_before=merged_rows_before)
+        if artifact_format:
+            write_artifact(merged_df, artifact_path(merged_output_csv_path, artifact_format), artifact_format)
 
         # Save merged data to SQLite database
-        save_to_db(merged_df, db_path)
+        save_to_db(merged_df, db_path, incremental=since is not None)
     except Exception as e:
         logger.error(f"Error fetching and processing data: {e}")
 
@@ -0,0 +1,226 @@
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+ISSUES_TABLE = 'quality_issues'
+SUMMARY_TABLE = 'quality_summary'
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+ISSUE_COLUMNS = ['check', 'timestamp', 'price', 'volume', 'week_diff']
+GAP_LOG_PREFIX = 'Inconsistency found: '
+MISSING_LOG_PREFIX = 'Missing data for '
+# Sections of the text log, in the order a full merge writes them
+LOG_PREFIXES = (GAP_LOG_PREFIX, MISSING_LOG_PREFIX)
+ISSUE_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def format_timestamps(timestamps):
+    """Format a datetime Series the way ``str(pd.Timestamp)`` does for whole seconds."""
+    return pd.to_datetime(timestamps).dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def write_log_lines(lines, log_file, mode='w'):
+    """
+    Write a Series of pre-formatted log lines to a text file in a single call.
+
+    Parameters:
+    - lines: Series of strings, one per log line (without the newline).
+    - log_file: Path to the text log.
+    - mode: 'w' to overwrite the log, 'a' to append to it.
+    """
+    with open(log_file, mode) as log:
+        if len(lines):
+            log.write('\n'.join(lines) + '\n')
+
+
+def rewrite_log_window(lines, log_file, prefix, start):
+    """
+    Replace the lines of one log section from ``start`` onwards, keeping the rest of the log.
+
+    Used by partial-window merges, so the log ends up as a full merge of the
+    same data would write it: the sections of ``LOG_PREFIXES`` in order, each
+    sorted by the timestamp that follows its prefix.
+
+    Parameters:
+    - lines: Series of the section's new log lines, all at or after ``start``.
+    - log_file: Path to the text log.
+    - prefix: The section's entry in ``LOG_PREFIXES``.
+    - start: Timestamp where the recomputed window begins.
+    """
+    sections = {section: [] for section in LOG_PREFIXES}
+    other = []
+    if os.path.exists(log_file):
+        with open(log_file) as log:
+            for line in log.read().splitlines():
+                section = next((section for section in LOG_PREFIXES if line.startswith(section)), None)
+                (sections[section] if section else other).append(line)
+    kept = [line for line in sections[prefix] if pd.Timestamp(line[len(prefix):len(prefix) + 19]) < start]
+    sections[prefix] = kept + list(lines)
+    write_log_lines([line for section in LOG_PREFIXES for line in sections[section]] + other, log_file, mode='w')
+
+
+def gap_issues(gas_df):
+    """
+    Collect gas rows that break the weekly spacing.
+
+    Parameters:
+    - gas_df: Sorted gas DataFrame with 'timestamp', 'price' and 'week_diff' columns.
+
+    Returns a DataFrame with one row per inconsistency.
+    """
+    mask = gas_df['week_diff'].ne(7) & gas_df['week_diff'].notna()
+    issues = gas_df.loc[mask, ['timestamp', 'price', 'week_diff']]
+    return issues.assign(check='weekly_gap').reset_index(drop=True)
+
+
+def missing_issues(merged_df, missing_mask):
+    """
+    Collect merged months where the gas price or the EV volume is missing.
+
+    Parameters:
+    - merged_df: Outer-joined monthly DataFrame with 'timestamp', 'price' and 'volume'.
+    - missing_mask: Boolean Series marking the rows with a missing value.
+
+    Returns a DataFrame with one row per mismatched month.
+    """
+    issues = merged_df.loc[missing_mask, ['timestamp', 'price', 'volume']]
+    return issues.assign(check='missing_month').reset_index(drop=True)
+
+
+def summarize_issues(check, issues, total_rows):
+    """Build the summary record for one check."""
+    summary = {
+        'check': check,
+        'total_rows': int(total_rows),
+        'issue_count': int(len(issues)),
+        'issue_ratio': float(len(issues) / total_rows) if total_rows else 0.0,
+        'first_timestamp': None,
+        'last_timestamp': None,
+        'min_gap_days': None,
+        'max_gap_days': None,
+        'mean_gap_days': None,
+    }
+    if len(issues):
+        timestamps = pd.to_datetime(issues['timestamp'])
+        summary['first_timestamp'] = timestamps.min().isoformat()
+        summary['last_timestamp'] = timestamps.max().isoformat()
+    if 'week_diff' in issues and len(issues):
+        summary['min_gap_days'] = float(issues['week_diff'].min())
+        summary['max_gap_days'] = float(issues['week_diff'].max())
+        summary['mean_gap_days'] = float(issues['week_diff'].mean())
+    return summary
+
+
+def issue_records(issues):
+    """Convert an issues DataFrame into a fixed set of typed columns (missing values become null)."""
+    records = issues.reindex(columns=ISSUE_COLUMNS)
+    records['timestamp'] = pd.to_datetime(records['timestamp']).dt.strftime(ISSUE_TIMESTAMP_FORMAT)
+    for column in records.columns.drop(['timestamp', 'check']):
+        records[column] = pd.to_numeric(records[column], errors='coerce')
+    return records
+
+
+def is_sqlite_report(report_path):
+    """Return True if ``report_path`` names a SQLite report rather than JSON Lines."""
+    return report_path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def report_line_check(line):
+    """Return the check a JSON Lines report line belongs to (issue or summary line)."""
+    record = json.loads(line)
+    return record['summary']['check'] if 'summary' in record else record.get('check')
+
+
+def read_issues(check, report_path, before):
+    """
+    Return the stored issues of ``check`` dated before ``before``, e.g. to keep them around a partial-window merge.
+
+    Returns a DataFrame with the ``ISSUE_COLUMNS`` (empty if nothing is stored).
+    """
+    empty = pd.DataFrame(columns=ISSUE_COLUMNS)
+    if not os.path.exists(report_path):
+        return empty
+    if is_sqlite_report(report_path):
+        conn = sqlite3.connect(report_path)
+        try:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (ISSUES_TABLE,)).fetchone()
+            if not exists:
+                return empty
+            issues = pd.read_sql_query(
+                f"SELECT * FROM {ISSUES_TABLE} WHERE \"check\" = ? AND timestamp < ?", conn,
+                params=(check, pd.Timestamp(before).strftime(ISSUE_TIMESTAMP_FORMAT)),
+            )
+        finally:
+            conn.close()
+    else:
+        with open(report_path) as report:
+            records = [json.loads(line) for line in report if line.strip()]
+        # Summary lines nest their check under 'summary', so only issue lines match
+        records = [record for record in records if record.get('check') == check]
+        issues = pd.DataFrame(records, columns=ISSUE_COLUMNS) if records else empty
+    issues = issues.reindex(columns=ISSUE_COLUMNS)
+    issues['timestamp'] = pd.to_datetime(issues['timestamp'])
+    return issues[issues['timestamp'] < before].reset_index(drop=True)
+
+
+def write_quality_report(check, issues, total_rows, report_path, append=False, replace=False):
+    """
+    Write the issues and summary of one data-quality check in a single pass.
+
+    The format follows the extension of ``report_path``: '.db', '.sqlite' or
+    '.sqlite3' write the ``quality_issues`` and ``quality_summary`` tables
+    (replacing earlier rows of the same check); anything else is written as
+    JSON Lines, one issue per line followed by a summary line.
+
+    Parameters:
+    - check: Name of the check, e.g. 'weekly_gap' or 'missing_month'.
+    - issues: DataFrame from ``gap_issues`` or ``missing_issues``.
+    - total_rows: Number of rows the check looked at.
+    - report_path: Path to the JSON Lines file or SQLite database.
+    - append: For JSON Lines, append instead of overwriting the file.
+    - replace: For JSON Lines, replace only the lines of ``check`` in an existing
+      file and keep the other checks (a partial-window merge, see ``read_issues``).
+
+    Returns the summary dict.
+    """
+    summary = summarize_issues(check, issues, total_rows)
+    summary['generated_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    records = issue_records(issues)
+
+    if is_sqlite_report(report_path):
+        conn = sqlite3.connect(report_path)
+        try:
+            with conn:
+                for table in (ISSUES_TABLE, SUMMARY_TABLE):
+                    exists = conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+                    ).fetchone()
+                    if exists:
+                        conn.execute(f"DELETE FROM {table} WHERE \"check\" = ?", (check,))
+            records.to_sql(ISSUES_TABLE, conn, if_exists='append', index=False)
+            pd.DataFrame([summary]).to_sql(SUMMARY_TABLE, conn, if_exists='append', index=False)
+        finally:
+            conn.close()
+    else:
+        lines = records.to_json(orient='records', lines=True) if len(records) else ''
+        group = (lines if lines.endswith('\n') or not lines else lines + '\n') + json.dumps({'summary': summary}) + '\n'
+        if replace and os.path.exists(report_path):
+            with open(report_path) as report:
+                existing = [line for line in report if line.strip()]
+            owned = [i for i, line in enumerate(existing) if report_line_check(line) == check]
+            position = owned[0] if owned else len(existing)
+            others = [line for line in existing if report_line_check(line) != check]
+            group = ''.join(others[:position]) + group + ''.join(others[position:])
+            append = False
+        with open(report_path, 'a' if append and os.path.exists(report_path) else 'w') as report:
+            report.write(group)
+
+    logger.info(f"Quality check '{check}': {summary['issue_count']} of {summary['total_rows']} rows flagged; report written to {report_path}.")
+    return summary
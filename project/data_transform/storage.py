@@ -0,0 +1,307 @@
+import os
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+BATCH_SIZE = 50_000
+
+# Connection settings shared by every writer; change them with configure()
+SETTINGS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'pool': True,
+    'bulk_load': False,
+    'batch_size': BATCH_SIZE,
+}
+
+pool = {}
+pool_lock = threading.Lock()
+# Idle read-only connections per database, shared by every thread (see read_connection)
+read_pools = {}
+READ_POOL_SIZE = 8
+
+
+def configure(**settings):
+    """
+    Update the shared SQLite settings.
+
+    Keys:
+    - journal_mode: e.g. 'WAL', 'DELETE' or None to keep the database default.
+    - synchronous: 'OFF', 'NORMAL', 'FULL' or None to keep the default.
+    - pool: Reuse one connection per database and process on the main thread.
+    - bulk_load: Relax durability (synchronous=OFF) while a load transaction runs.
+    - batch_size: Rows per executemany call.
+    """
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise KeyError(f"Unknown storage settings: {sorted(unknown)}")
+    SETTINGS.update(settings)
+    close_all()
+
+
+def open_connection(db_path):
+    """Open a new autocommit connection and apply the journal_mode/synchronous PRAGMAs."""
+    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    if SETTINGS['journal_mode']:
+        conn.execute(f"PRAGMA journal_mode={SETTINGS['journal_mode']}")
+    if SETTINGS['synchronous']:
+        conn.execute(f"PRAGMA synchronous={SETTINGS['synchronous']}")
+    return conn
+
+
+def get_connection(db_path):
+    """
+    Return a connection to ``db_path`` in autocommit mode with the configured PRAGMAs applied.
+
+    With pooling enabled the main thread reuses one connection per (database,
+    process); a pooled connection whose file was deleted or replaced is
+    reopened. Worker threads (run_stages, the concurrent fetch and the query
+    service) get a new connection that ``release`` closes, since a connection
+    pooled per short-lived thread would stay open, holding its WAL read lock,
+    until the process exits. Callers manage transactions explicitly, normally
+    through ``transaction``.
+    """
+    if not SETTINGS['pool'] or threading.current_thread() is not threading.main_thread():
+        return open_connection(db_path)
+
+    path = os.path.abspath(db_path)
+    key = (path, os.getpid())
+    inode = os.stat(path).st_ino if os.path.exists(path) else None
+    with pool_lock:
+        entry = pool.get(key)
+        if entry and entry[1] == inode and inode is not None:
+            return entry[0]
+        if entry:
+            entry[0].close()
+        conn = open_connection(db_path)
+        pool[key] = (conn, os.stat(path).st_ino)
+        return conn
+
+
+def release(conn):
+    """Give a connection back: pooled connections stay open, others are closed."""
+    with pool_lock:
+        pooled = any(entry[0] is conn for entry in pool.values())
+    if not pooled:
+        conn.close()
+
+
+def close_all():
+    """Close every pooled connection, including idle read-only ones."""
+    with pool_lock:
+        idle = [conn for conn, _ in pool.values()]
+        idle += [conn for entries in read_pools.values() for conn, _ in entries]
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        pool.clear()
+        read_pools.clear()
+
+
+def open_read_connection(db_path):
+    """Open a read-only connection that can be shared across threads (one at a time)."""
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+
+
+@contextmanager
+def read_connection(db_path):
+    """
+    Borrow a read-only connection to ``db_path`` from the shared read pool.
+
+    Read-only connections never take the write lock, so with WAL they neither
+    block nor wait for the pipeline's writer. Up to ``READ_POOL_SIZE`` idle
+    connections per database are kept for reuse by any thread; connections to
+    a file that was deleted or replaced are discarded.
+    """
+    path = os.path.abspath(db_path)
+    inode = os.stat(path).st_ino
+    conn = None
+    with pool_lock:
+        idle = read_pools.setdefault(path, [])
+        while idle and conn is None:
+            candidate, candidate_inode = idle.pop()
+            if candidate_inode == inode:
+                conn = candidate
+            else:
+                candidate.close()
+    if conn is None:
+        conn = open_read_connection(path)
+    try:
+        yield conn
+    finally:
+        with pool_lock:
+            idle = read_pools.setdefault(path, [])
+            if len(idle) < READ_POOL_SIZE:
+                idle.append((conn, inode))
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+atexit.register(close_all)
+
+
+def attach_databases(conn, db_path, attach):
+    """
+    ATTACH the databases in ``attach`` ({alias: path}) to ``conn``.
+
+    Paths that point at ``db_path`` itself are skipped, so callers can pass the
+    same mapping whether the stores live in one file or several. Returns the
+    aliases that were attached.
+    """
+    attached = []
+    for alias, path in (attach or {}).items():
+        if os.path.abspath(path) == os.path.abspath(db_path):
+            continue
+        conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+        attached.append(alias)
+    return attached
+
+
+@contextmanager
+def transaction(db_path, attach=None):
+    """
+    Open an explicit write transaction on ``db_path`` and yield its connection.
+
+    The transaction commits on success and rolls back on error. In bulk-load
+    mode durability is relaxed for the duration of the transaction and
+    restored afterwards. ``attach`` maps schema aliases to other database
+    files that are attached for the duration of the transaction (see
+    ``attach_databases``).
+    """
+    conn = get_connection(db_path)
+    bulk_load = SETTINGS['bulk_load']
+    attached = []
+    try:
+        attached = attach_databases(conn, db_path, attach)
+        if bulk_load:
+            conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        if bulk_load:
+            conn.execute(f"PRAGMA synchronous={SETTINGS['synchronous'] or 'FULL'}")
+        for alias in attached:
+            conn.execute(f"DETACH DATABASE {alias}")
+        release(conn)
+
+
+def sqlite_type(dtype):
+    """Map a pandas dtype to the SQLite column type pandas' to_sql would use."""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def create_table(conn, table, df, replace=False, primary_key=None):
+    """Create ``table`` with columns typed after ``df``, dropping it first when ``replace`` is set."""
+    if replace:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    columns = [f'"{column}" {sqlite_type(dtype)}' for column, dtype in df.dtypes.items()]
+    if primary_key:
+        columns.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+
+
+def frame_rows(df):
+    """
+    Convert a DataFrame into a list of DB-API row tuples.
+
+    Datetimes become 'YYYY-MM-DD HH:MM:SS' text like pandas' to_sql writes them,
+    and missing values of any dtype become None.
+    """
+    columns = []
+    for column, dtype in df.dtypes.items():
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            values = values.dt.strftime(TIMESTAMP_FORMAT)
+        values = values.astype(object).where(values.notna(), None)
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def insert_frame(conn, table, df, on_conflict=None):
+    """
+    Insert ``df`` into ``table`` with batched executemany calls.
+
+    Must run inside a transaction (see ``transaction``) so the whole load is
+    committed with a single sync.
+
+    Parameters:
+    - conn: Connection from ``transaction``.
+    - table: Target table; it must already exist.
+    - df: Rows to insert; column names must match the table.
+    - on_conflict: Optional conflict clause, e.g. 'ON CONFLICT(timestamp) DO UPDATE SET ...'.
+
+    Returns the number of rows inserted.
+    """
+    if df.empty:
+        return 0
+    column_list = ', '.join(f'"{column}"' for column in df.columns)
+    placeholders = ', '.join('?' for _ in df.columns)
+    statement = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+    if on_conflict:
+        statement = f"{statement} {on_conflict}"
+    batch_size = SETTINGS['batch_size']
+    for start in range(0, len(df), batch_size):
+        conn.executemany(statement, frame_rows(df.iloc[start:start + batch_size]))
+    return len(df)
+
+
+def create_indexes(db_path, table, columns, unique=False):
+    """Build indexes on ``table`` after a load, one per column (or column tuple)."""
+    conn = get_connection(db_path)
+    try:
+        for column in columns:
+            column_names = column if isinstance(column, (list, tuple)) else [column]
+            index_name = f"idx_{table}_{'_'.join(column_names)}{'_key' if unique else ''}"
+            conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name} "
+                f"ON {table} ({', '.join(column_names)})"
+            )
+    finally:
+        release(conn)
+
+
+def write_frame(db_path, table, df, if_exists='replace', indexes=()):
+    """
+    Write a DataFrame to ``table`` through the shared high-throughput path.
+
+    The table is (re)created, the rows are inserted with batched executemany in
+    one explicit transaction, and the indexes are built after the load.
+
+    Parameters:
+    - db_path: Path to the SQLite database file.
+    - table: Target table.
+    - df: Rows to write.
+    - if_exists: 'replace' to drop and recreate the table, 'append' to add to it.
+    - indexes: Columns to index once the rows are in.
+    """
+    with transaction(db_path) as conn:
+        create_table(conn, table, df, replace=if_exists == 'replace')
+        rows = insert_frame(conn, table, df)
+    create_indexes(db_path, table, indexes)
+    logger.info(f"Wrote {rows} rows to {table} in {db_path}.")
+    return rows
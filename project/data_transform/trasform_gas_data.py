@@ -1,13 +1,14 @@
 import os
 import pandas as pd
-import sqlite3
 import logging
+import data_transform.storage as storage
+from data_transform.watermark import read_watermark, write_watermark, clear_watermark, rows_after_watermark, table_exists, overlap_start, stored_key_counts, drop_stored_rows
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def transform_and_store_data(df, db_path, strict=True):
+def transform_and_store_data(df, db_path, strict=True, incremental=False):
     """
     Transforms gasoline data and stores it in an SQLite database.
 
@@ -15,6 +16,10 @@ def transform_and_store_data(df, db_path, strict=True):
     - df: pandas DataFrame containing the raw gasoline data.
     - db_path: Relative path to the SQLite database file.
     - strict: If True, raises exceptions for invalid data types or missing directories.
+    - incremental: If True, only rows not already stored from the table's high-water mark
+      day on are appended instead of replacing the table.
+
+    Returns the earliest timestamp written, or None if there was nothing new to store.
     """
     try:
         logging.info("Starting transformation of gasoline data.")
@@ -58,12 +63,29 @@ def transform_and_store_data(df, db_path, strict=True):
             raise PermissionError(f"No write permissions for directory: {dir_path}")
 
         # Save to SQLite
-        conn = sqlite3.connect(db_path)
-        try:
-            df.to_sql('gasoline_prices', conn, if_exists='replace', index=False)
-            logging.info(f"Data successfully saved to SQLite database at {db_path}")
-        finally:
-            conn.close()
+        with storage.transaction(db_path) as conn:
+            if incremental:
+                watermark = read_watermark(conn, 'gasoline_prices', 'timestamp')
+                df = rows_after_watermark(df, 'timestamp', watermark)
+                if watermark is not None and table_exists(conn, 'gasoline_prices'):
+                    stored = pd.read_sql_query(
+                        "SELECT timestamp FROM gasoline_prices WHERE timestamp >= ?", conn,
+                        params=(overlap_start(watermark).strftime('%Y-%m-%d %H:%M:%S'),),
+                    )
+                    df, _ = drop_stored_rows(df, ['timestamp'], stored_key_counts(stored, ['timestamp']))
+                if df.empty:
+                    logging.info("No new gasoline prices to store.")
+                    return None
+            else:
+                clear_watermark(conn, 'gasoline_prices')
+            storage.create_table(conn, 'gasoline_prices', df, replace=not incremental)
+            storage.insert_frame(conn, 'gasoline_prices', df)
+            if df.empty:
+                return None
+            write_watermark(conn, 'gasoline_prices', 'timestamp', df['timestamp'].max())
+        storage.create_indexes(db_path, 'gasoline_prices', ['timestamp'])
+        logging.info(f"Data successfully saved to SQLite database at {db_path}")
+        return pd.Timestamp(df['timestamp'].min())
     except (FileNotFoundError, PermissionError, ValueError, KeyError) as e:
         logging.error(f"Error during transformation: {e}")
         raise
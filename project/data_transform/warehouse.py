@@ -0,0 +1,143 @@
+import os
+import logging
+
+import pandas as pd
+
+import data_transform.storage as storage
+from data_transform.artifacts import export_frame
+from data_transform.ev_schema import ev_layout, date_column, date_sql, date_param
+from data_transform.ev_partitions import ev_source_sql
+from data_transform.pre_process import (
+    process_gas_data, load_gas_window, log_missing_months, to_nullable, month_start, year_window, count_before
+)
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+GAS_MONTHLY_TABLE = 'gas_monthly'
+MERGED_MONTHS_TABLE = 'merged_months'
+EV_SCHEMA = 'ev'
+
+# Month-end label in the 'YYYY-MM-DD HH:MM:SS' layout the pandas path writes
+MONTH_END_SQL = "date({month} || '-01', '+1 month', '-1 day') || ' 00:00:00'"
+
+
+def merged_months_query(ev_table, from_yr, to_yr, since=None, layout=None):
+    """
+    Build the SQL that outer-joins monthly gas prices with monthly EV counts.
+
+    SQLite before 3.39 has no FULL OUTER JOIN, so the months of both sides are
+    collected with a UNION and each side is LEFT JOINed onto them. EV
+    registrations are filtered with an index-friendly range predicate and
+    counted per month inside SQLite; ``layout`` selects the legacy or compact
+    ev_sales columns. ``ev_table`` may be a table or a parenthesised UNION ALL
+    of year partitions (see ``ev_source_sql``).
+    """
+    column = date_column(layout)
+    params = [date_param(bound, layout) for bound in year_window(from_yr, to_yr)]
+    since_filter = ''
+    if since is not None:
+        since_filter = f'AND {column} >= ?'
+        params.append(date_param(month_start(since), layout))
+    query = f"""
+    WITH ev_monthly AS (
+        SELECT strftime('%Y-%m', {date_sql(layout)}) AS month, COUNT(*) AS volume
+        FROM {ev_table}
+        WHERE {column} >= ? AND {column} < ? {since_filter}
+        GROUP BY month
+    ),
+    gas AS (
+        SELECT strftime('%Y-%m', timestamp) AS month, price FROM {GAS_MONTHLY_TABLE}
+    ),
+    months AS (
+        SELECT month FROM gas UNION SELECT month FROM ev_monthly
+    )
+    SELECT {MONTH_END_SQL.format(month='months.month')} AS timestamp, gas.price AS price, ev_monthly.volume AS volume
+    FROM months
+    LEFT JOIN gas ON gas.month = months.month
+    LEFT JOIN ev_monthly ON ev_monthly.month = months.month
+    WHERE months.month IS NOT NULL
+    ORDER BY timestamp
+    """
+    return query, params
+
+
+def materialize_merged_data(conn, incremental=False):
+    """Fill merged_data from the validated rows of merged_months with one INSERT ... SELECT."""
+    schema = pd.DataFrame({
+        'timestamp': pd.Series(dtype='datetime64[ns]'),
+        'price': pd.Series(dtype='float64'),
+        'volume': pd.Series(dtype='int64'),
+    })
+    storage.create_table(conn, 'merged_data', schema, replace=not incremental)
+    select = f"""
+    INSERT INTO merged_data (timestamp, price, volume)
+    SELECT timestamp, price, volume FROM {MERGED_MONTHS_TABLE}
+    WHERE price IS NOT NULL AND volume IS NOT NULL
+    """
+    if incremental:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_merged_data_timestamp_key ON merged_data (timestamp)")
+        # The WHERE clause is kept so SQLite parses ON CONFLICT as an upsert clause
+        select += " ON CONFLICT(timestamp) DO UPDATE SET price = excluded.price, volume = excluded.volume"
+    return conn.execute(select).rowcount
+
+
+def build_warehouse(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, db_path, report_path=None, since=None, artifact_format=None, csv_export=True):
+    """
+    Build merged_data inside the warehouse database instead of in pandas.
+
+    Gap repair of the weekly gas prices stays in pandas (see
+    ``process_gas_data``); the repaired monthly prices are written to the
+    ``gas_monthly`` table of ``db_path``. The EV database is ATTACHed (or used
+    directly when it is the same file as ``db_path``), and the monthly EV
+    aggregation, the gas/EV outer join into ``merged_months`` and the validated
+    ``merged_data`` rows are all produced by SQL in one transaction, so the
+    registration rows never travel through pandas.
+
+    With ``since`` only the months from ``since`` onwards are rebuilt and
+    upserted into merged_data, as in ``fetch_and_process_data``. The monthly
+    CSV/columnar exports are read back from ``merged_months``.
+
+    Parameters are the same as for ``fetch_and_process_data``; ``db_path`` is
+    the warehouse database.
+    """
+    try:
+        gas_df = load_gas_window(gas_db_path, from_yr, to_yr, pushdown=True, since=since)
+        gas_rows_before = count_before(gas_db_path, 'gasoline_prices', since, from_yr, to_yr) if since is not None else 0
+        gas_monthly = process_gas_data(gas_df, log_file, report_path=report_path, since=since, rows_before=gas_rows_before)
+        if since is not None:
+            gas_monthly = gas_monthly[gas_monthly['timestamp'] >= month_start(since)]
+        export_frame(gas_monthly, gas_output_csv_path, artifact_format, csv_export)
+
+        attach = {EV_SCHEMA: ev_db_path}
+        ev_schema = 'main' if os.path.abspath(ev_db_path) == os.path.abspath(db_path) else EV_SCHEMA
+        with storage.transaction(db_path, attach=attach) as conn:
+            ev_table = ev_source_sql(conn, from_yr, to_yr, since=since, schema=ev_schema)
+            query, params = merged_months_query(ev_table, from_yr, to_yr, since=since,
+                                                layout=ev_layout(conn, ev_schema))
+            storage.create_table(conn, GAS_MONTHLY_TABLE, gas_monthly, replace=True)
+            storage.insert_frame(conn, GAS_MONTHLY_TABLE, gas_monthly)
+            conn.execute(f"DROP TABLE IF EXISTS {MERGED_MONTHS_TABLE}")
+            conn.execute(f"CREATE TABLE {MERGED_MONTHS_TABLE} AS {query}", params)
+            rows = materialize_merged_data(conn, incremental=since is not None)
+        logger.info(f"Materialized {rows} merged months in warehouse {db_path}.")
+
+        # Only one row per month comes back for logging and exports
+        conn = storage.get_connection(db_path)
+        try:
+            merged_df = pd.read_sql_query(f"SELECT * FROM {MERGED_MONTHS_TABLE}", conn, parse_dates=['timestamp'])
+        finally:
+            storage.release(conn)
+        merged_df = to_nullable(merged_df)
+        # The upsert only touched months from ``since`` on, so the earlier count is unaffected
+        merged_rows_before = count_before(db_path, 'merged_data', since) if since is not None else 0
+        log_missing_months(merged_df, log_file, report_path=report_path, since=since, rows_before=merged_rows_before)
+
+        ev_monthly = merged_df.loc[merged_df['volume'].notna(), ['timestamp', 'volume']].astype({'volume': 'int64'})
+        export_frame(ev_monthly.reset_index(drop=True), ev_output_csv_path, artifact_format, csv_export)
+        export_frame(merged_df, merged_output_csv_path, artifact_format, csv_export)
+        return merged_df
+    except Exception as e:
+        logger.error(f"Error building warehouse tables: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,166 @@
+import logging
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+WATERMARK_TABLE = 'etl_watermarks'
+# SHA-256 of the source file each store last ingested successfully
+SOURCES_TABLE = 'etl_sources'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def table_exists(conn, table):
+    """Return True if ``table`` exists in the connected database."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+
+def read_watermark(conn, table, column):
+    """
+    Return the high-water mark of ``table`` as a Timestamp, or None if nothing was loaded yet.
+
+    The mark recorded in ``etl_watermarks`` is used when present; otherwise it
+    falls back to ``MAX(column)`` so tables loaded before watermarks existed
+    can switch to incremental mode without a full reload.
+    """
+    if table_exists(conn, WATERMARK_TABLE):
+        row = conn.execute(
+            f"SELECT high_water_mark FROM {WATERMARK_TABLE} WHERE table_name = ?", (table,)
+        ).fetchone()
+        if row and row[0] is not None:
+            return pd.Timestamp(row[0])
+    if table_exists(conn, table):
+        row = conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()
+        if row and row[0] is not None:
+            return pd.Timestamp(row[0])
+    return None
+
+
+def write_watermark(conn, table, column, value):
+    """Record ``value`` as the high-water mark of ``table``. The caller commits."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            column_name TEXT NOT NULL,
+            high_water_mark TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO {WATERMARK_TABLE} (table_name, column_name, high_water_mark, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(table_name) DO UPDATE SET
+            column_name = excluded.column_name,
+            high_water_mark = excluded.high_water_mark,
+            updated_at = excluded.updated_at
+        """,
+        (table, column, pd.Timestamp(value).strftime(TIMESTAMP_FORMAT),
+         datetime.now(timezone.utc).isoformat(timespec='seconds'))
+    )
+
+
+def clear_watermark(conn, table):
+    """
+    Forget the high-water mark of ``table``. The caller commits.
+
+    Called when ``table`` is rebuilt: a mark left over from the replaced rows
+    would make the next incremental load skip older rows that were never
+    stored, e.g. after a rebuild from an empty input.
+    """
+    if table_exists(conn, WATERMARK_TABLE):
+        conn.execute(f"DELETE FROM {WATERMARK_TABLE} WHERE table_name = ?", (table,))
+
+
+def overlap_start(watermark):
+    """
+    Return the start of the watermark's day, from which incremental loads re-read rows.
+
+    Source dates are day-granular, so rows for the watermark's own day can
+    still arrive after it was loaded; that day is read again and matched
+    against the stored rows (see ``drop_stored_rows``).
+    """
+    return None if watermark is None else pd.Timestamp(watermark).normalize()
+
+
+def rows_after_watermark(df, column, watermark):
+    """
+    Keep only the rows of ``df`` from the watermark's day onwards.
+
+    The watermark's day itself is kept (see ``overlap_start``); pass the
+    result through ``drop_stored_rows`` to skip the rows already loaded.
+    """
+    if watermark is None:
+        return df
+    new_rows = df[pd.to_datetime(df[column]) >= overlap_start(watermark)]
+    logger.info(f"{len(new_rows)} of {len(df)} rows are on or after the watermark day {overlap_start(watermark):%Y-%m-%d}.")
+    return new_rows
+
+
+def key_index(df, key):
+    """Index ``df`` by its ``key`` columns, with categoricals as plain strings so stored and incoming keys compare equal."""
+    columns = [df[column].astype(str) if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column] for column in key]
+    return pd.MultiIndex.from_arrays(columns) if len(key) > 1 else pd.Index(columns[0])
+
+
+def stored_key_counts(stored, key):
+    """Count the stored rows of the overlap window per ``key`` (see ``drop_stored_rows``)."""
+    return key_index(stored, key).value_counts()
+
+
+def drop_stored_rows(df, key, stored_counts):
+    """
+    Drop the rows of ``df`` that are already stored, matching ``key`` as a multiset.
+
+    For each key, as many incoming rows as ``stored_counts`` holds are
+    treated as loaded; any beyond that, e.g. a second registration of the
+    same model on the same day that arrived late, are new. The counts are
+    used up as rows match, so the returned counts can be passed with the
+    next chunk of the same load.
+
+    Returns a tuple (new rows, remaining stored_counts).
+    """
+    if df.empty or stored_counts.empty:
+        return df, stored_counts
+    keys = key_index(df, key)
+    frame = keys.to_frame(index=False)
+    seen = frame.groupby(list(frame.columns), sort=False).cumcount().to_numpy()
+    new_rows = df[seen >= stored_counts.reindex(keys, fill_value=0).to_numpy()]
+    remaining = (stored_counts - keys.value_counts().reindex(stored_counts.index, fill_value=0)).clip(lower=0)
+    if len(new_rows) < len(df):
+        logger.info(f"{len(df) - len(new_rows)} rows from the watermark day on are already stored.")
+    return new_rows, remaining[remaining > 0]
+
+
+def read_source_digest(conn, source):
+    """Return the SHA-256 of the file last ingested from ``source``, or None if none is recorded."""
+    if not table_exists(conn, SOURCES_TABLE):
+        return None
+    row = conn.execute(f"SELECT sha256 FROM {SOURCES_TABLE} WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+
+def write_source_digest(conn, source, sha256):
+    """Record ``sha256`` as the content last ingested from ``source``. The caller commits."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} (
+            source TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            ingested_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO {SOURCES_TABLE} (source, sha256, ingested_at) VALUES (?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET sha256 = excluded.sha256, ingested_at = excluded.ingested_at
+        """,
+        (source, sha256, datetime.now(timezone.utc).isoformat(timespec='seconds'))
+    )
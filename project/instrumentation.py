@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then omitted
+    resource = None
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Stages being measured right now, and the tracemalloc session they share
+active_stages = {}
+tracing = {'stages': 0, 'owned': False}
+stages_lock = threading.Lock()
+
+
+def new_report():
+    """Start an empty run report."""
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'started': time.perf_counter(),
+        'stages': [],
+    }
+
+
+def peak_rss_bytes():
+    """Return the process' peak resident set size in bytes, or None where it is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def io_counters():
+    """Return (bytes read, bytes written) by this process so far, or (None, None) without /proc."""
+    try:
+        with open('/proc/self/io', 'r') as io_file:
+            counters = dict(line.split(': ') for line in io_file.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def file_bytes(paths):
+    """Total size of the existing files in ``paths``."""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+
+def count_rows(db_path, table):
+    """Return COUNT(*) of ``table`` in ``db_path``, or None if the database or table is missing."""
+    if not db_path or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def enter_stage(record, trace_memory):
+    """
+    Register a measured stage as running and, with ``trace_memory``, join the shared tracemalloc session.
+
+    Stages that run at the same time (see main.fetch_and_ingest_concurrently
+    and stage_cache.run_stages) list each other under ``overlapped_with``.
+    tracemalloc has one process-wide peak, so the session is started by the
+    first traced stage and stopped by the last one, and the peak is only
+    reset when no other traced stage is running.
+    """
+    with stages_lock:
+        for other in active_stages.values():
+            other.setdefault('overlapped_with', []).append(record['name'])
+            record.setdefault('overlapped_with', []).append(other['name'])
+        active_stages[id(record)] = record
+        if trace_memory:
+            if tracing['stages'] == 0:
+                tracing['owned'] = not tracemalloc.is_tracing()
+                if tracing['owned']:
+                    tracemalloc.start()
+                else:
+                    tracemalloc.reset_peak()
+            tracing['stages'] += 1
+
+
+def leave_stage(record, trace_memory):
+    """Unregister a stage, recording the tracemalloc peak of the shared session when it was traced."""
+    with stages_lock:
+        active_stages.pop(id(record), None)
+        if trace_memory:
+            record['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracing['stages'] -= 1
+            if tracing['stages'] == 0 and tracing['owned']:
+                tracemalloc.stop()
+
+
+def evaluate(counter):
+    """Call a row counter, treating failures as 'unknown'."""
+    if counter is None:
+        return None
+    try:
+        return counter()
+    except Exception as e:
+        logger.warning(f"Could not count rows: {e}")
+        return None
+
+
+@contextmanager
+def measure(report, name, files_in=(), files_out=(), rows_in=None, rows_out=None, trace_memory=False, profile_dir=None):
+    """
+    Measure one stage and append its record to ``report['stages']``.
+
+    Parameters:
+    - report: Run report from ``new_report``.
+    - name: Stage name.
+    - files_in: Files the stage reads; their total size is recorded as bytes_read.
+    - files_out: Files the stage writes; their total size afterwards is recorded as bytes_written.
+    - rows_in: Optional callable returning the number of input rows, evaluated before the stage.
+    - rows_out: Optional callable returning the number of output rows, evaluated after the stage.
+    - trace_memory: Record the tracemalloc peak of Python allocations (slows the stage down).
+    - profile_dir: Directory for a cProfile dump named ``<name>.prof``; None disables profiling.
+
+    The record is appended even when the stage raises, with status 'failed'.
+
+    Peak RSS is a process-wide high-water mark: ``process_peak_rss_bytes`` is
+    its value when the stage ends and ``peak_rss_growth_bytes`` how much the
+    stage (and any stage running next to it) raised it. CPU time, I/O counters
+    and the tracemalloc peak are per process too, so for stages listed under
+    ``overlapped_with`` they include the overlapping stages' work.
+    """
+    record = {'name': name, 'status': 'ran', 'rows_in': evaluate(rows_in), 'bytes_read': file_bytes(files_in)}
+    enter_stage(record, trace_memory)
+    rss_before = peak_rss_bytes()
+    profiler = cProfile.Profile() if profile_dir else None
+    io_read, io_written = io_counters()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        if profiler:
+            profiler.enable()
+        yield record
+    except BaseException as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        record['wall_seconds'] = round(time.perf_counter() - wall, 6)
+        record['cpu_seconds'] = round(time.process_time() - cpu, 6)
+        leave_stage(record, trace_memory)
+        record['process_peak_rss_bytes'] = peak_rss_bytes()
+        if rss_before is not None:
+            record['peak_rss_growth_bytes'] = record['process_peak_rss_bytes'] - rss_before
+        io_read_after, io_written_after = io_counters()
+        if io_read is not None and io_read_after is not None:
+            record['io_read_bytes'] = io_read_after - io_read
+            record['io_write_bytes'] = io_written_after - io_written
+        record['bytes_written'] = file_bytes(files_out)
+        if record['status'] == 'ran':
+            record['rows_out'] = evaluate(rows_out)
+        if profiler:
+            os.makedirs(profile_dir, exist_ok=True)
+            record['profile'] = os.path.join(profile_dir, f"{name}.prof")
+            profiler.dump_stats(record['profile'])
+        report['stages'].append(record)
+        logger.info(f"Stage '{name}' {record['status']} in {record['wall_seconds']:.3f}s wall / {record['cpu_seconds']:.3f}s CPU.")
+
+
+def instrument(report, name, func, **options):
+    """Wrap ``func`` so each call is measured into ``report`` (see ``measure`` for the options)."""
+    def run(*args, **kwargs):
+        with measure(report, name, **options):
+            return func(*args, **kwargs)
+    return run
+
+
+def record_skipped(report, names):
+    """Add records for stages that were skipped (e.g. served from the stage cache)."""
+    for name in names:
+        report['stages'].append({'name': name, 'status': 'skipped'})
+
+
+def write_report(report, report_path):
+    """Finish the run report and write it as JSON atomically."""
+    output = {key: value for key, value in report.items() if key != 'started'}
+    output['finished_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    output['wall_seconds'] = round(time.perf_counter() - report['started'], 6)
+    output['peak_rss_bytes'] = peak_rss_bytes()
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, 'w') as report_file:
+        json.dump(output, report_file, indent=2)
+    os.replace(tmp_path, report_path)
+    logger.info(f"Run report written to {report_path}.")
+    return output
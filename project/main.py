@@ -1,18 +1,18 @@
 import os
 import toml
 import logging
-from data_process.fetch_data import fetch_data_from_url
-import pandas as pd
-import data_transform.ev_sales_data as esd
-import data_transform.trasform_gas_data as tgd
-from data_transform.pre_process import fetch_and_process_data
-from analytics.basic_analysis import plot_separate_graphs_with_normalization_and_save
+from stage_cache import stage, run_stages
+from instrumentation import new_report, measure, instrument, record_skipped, write_report, count_rows
+# requests, pandas, matplotlib and the transform modules are imported inside
+# the functions that use them, so single-stage CLI runs (see cli.py) start fast.
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-def load_config(config_path='project/config.toml'):
+DEFAULT_CONFIG_PATH = 'project/config.toml'
+
+def load_config(config_path=DEFAULT_CONFIG_PATH):
     try:
         config = toml.load(config_path)
         return config
@@ -20,28 +20,38 @@ def load_config(config_path='project/config.toml'):
         logger.error(f"Error loading config file: {e}")
         raise
 
-def fetch_and_log(url, save_to):
+def fetch_and_log(url, save_to, stream=False, use_cache=False, session=None):
+    from data_process.fetch_data import fetch_data_from_url
     try:
-        fetch_data_from_url(url, save_to)
-        logger.info(f"Data fetched successfully from {url} to {save_to}.")
+        changed = fetch_data_from_url(url, save_to, stream=stream, use_cache=use_cache, session=session)
+        if changed:
+            logger.info(f"Data fetched successfully from {url} to {save_to}.")
+        else:
+            logger.info(f"Source {url} unchanged; reusing {save_to}.")
+        return changed
     except Exception as e:
         logger.error(f"Error fetching data from {url}: {e}")
         raise
 
-def extract_process_gas_data(file_path, db_path):
+def extract_process_gas_data(file_path, db_path, incremental=False, use_parse_cache=False):
+    import data_transform.trasform_gas_data as tgd
+    from data_transform.gas_source import read_gas_workbook
     try:
-        df = pd.read_excel(file_path, sheet_name='Data 1', skiprows=2)
-        tgd.transform_and_store_data(df, db_path)
+        df = read_gas_workbook(file_path, use_cache=use_parse_cache)
+        earliest = tgd.transform_and_store_data(df, db_path, incremental=incremental)
         logger.info(f"Gasoline data transformed and stored successfully in {db_path}.")
+        return earliest
     except Exception as e:
         logger.error(f"Error processing gasoline data from {file_path}: {e}")
         raise
 
-def extract_process_ev_data(file_path, db_path):
+def extract_process_ev_data(file_path, db_path, chunksize=None, incremental=False, compact=False, partitioned=False, cube=False):
+    import data_transform.ev_sales_data as esd
     try:
         logger.info("Starting EV data preprocessing.")
-        esd.fetch_and_preprocess_ev_sales(file_path, db_path)
+        earliest = esd.fetch_and_preprocess_ev_sales(file_path, db_path, chunksize=chunksize, incremental=incremental, compact=compact, partitioned=partitioned, cube=cube)
         logger.info(f"EV data transformed and stored successfully in {db_path}.")
+        return earliest
     except Exception as e:
         logger.error(f"Error processing EV data from {file_path}: {e}")
         raise
@@ -49,58 +59,390 @@ def extract_process_ev_data(file_path, db_path):
 def get_absolute_path(base_dir, relative_path):
     return os.path.abspath(os.path.join(base_dir, relative_path))
 
-def pre_process_data_for_analysis(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, sep_log_file, merged_db_path):
+def pre_process_data_for_analysis(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, sep_log_file, merged_db_path, report_path=None, pushdown=False, since=None, artifact_format=None, csv_export=True, warehouse=False):
     try:
-        fetch_and_process_data(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, merged_db_path)
+        if warehouse:
+            from data_transform.warehouse import build_warehouse
+            build_warehouse(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, merged_db_path, report_path=report_path, since=since, artifact_format=artifact_format, csv_export=csv_export)
+        else:
+            from data_transform.pre_process import fetch_and_process_data
+            fetch_and_process_data(from_yr, to_yr, gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, merged_db_path, report_path=report_path, pushdown=pushdown, since=since, artifact_format=artifact_format, csv_export=csv_export)
         logger.info(f"Preprocessing data for analysis completed successfully.")
     except Exception as e:
         logger.error(f"Error in preprocessing data for analysis: {e}")
         raise
 
-def basic_analysis(db_path, table_name, output_dir):
+def basic_analysis(db_path, table_name, output_dir, max_workers=None, rolling_window=None):
+    from analytics.basic_analysis import plot_separate_graphs_with_normalization_and_save
     try:
-        plot_separate_graphs_with_normalization_and_save(db_path, table_name, volume_scale_factor=1000, output_dir=output_dir)
+        plot_separate_graphs_with_normalization_and_save(db_path, table_name, volume_scale_factor=1000, output_dir=output_dir, max_workers=max_workers)
+        if rolling_window:
+            from analytics.rolling_stats import update_rolling_stats
+            update_rolling_stats(db_path, table_name, window=rolling_window)
         logger.info(f"Basic analysis completed. Outputs saved to {output_dir}.")
     except Exception as e:
         logger.error(f"Error in performing basic analysis: {e}")
         raise
 
-def pipeline():
+def resolve_paths(config):
+    """Resolve every file the pipeline reads or writes from the [settings] table."""
+    settings = config['settings']
+    data_dir = get_absolute_path(os.path.dirname(__file__), settings['data_dir'])
+    report_file = settings.get('quality_report_file')
+    stage_cache_file = settings.get('stage_cache_file')
+    run_report_file = settings.get('run_report_file')
+    # A warehouse_db_file keeps the gas, EV and merged tables in one SQLite file
+    warehouse_db_file = settings.get('warehouse_db_file')
+    db_file = lambda key: os.path.join(data_dir, warehouse_db_file or settings[key])
+    return {
+        'data_dir': data_dir,
+        'gas_data': os.path.join(data_dir, settings['gas_data_file']),
+        'ev_sales_data': os.path.join(data_dir, settings['ev_sales_data_file']),
+        'gas_db': db_file('gas_db_file'),
+        'ev_db': db_file('ev_sales_db_file'),
+        'gas_csv': os.path.join(data_dir, settings['gas_output_csv_file']),
+        'ev_csv': os.path.join(data_dir, settings['ev_output_csv_file']),
+        'merged_csv': os.path.join(data_dir, settings['merged_output_csv_file']),
+        'log_file': os.path.join(data_dir, settings['log_file']),
+        'sep_log_file': os.path.join(data_dir, settings['sep_log_file']),
+        'merged_db': db_file('merged_db_file'),
+        'report': os.path.join(data_dir, report_file) if report_file else None,
+        'stage_cache': os.path.join(data_dir, stage_cache_file) if stage_cache_file else None,
+        'run_report': os.path.join(data_dir, run_report_file) if run_report_file else None,
+        'profile_dir': os.path.join(data_dir, 'profiles') if settings.get('profile_stages') else None,
+        'plots': [os.path.join(data_dir, 'gasoline_prices.png'), os.path.join(data_dir, 'normalized_ev_volume.png')],
+    }
+
+def stage_metrics(paths, settings):
+    """Files and row counters recorded for each stage in the run report (see instrumentation.measure)."""
+    common = {'trace_memory': settings.get('trace_memory', False), 'profile_dir': paths['profile_dir']}
+    gas_rows = lambda: count_rows(paths['gas_db'], 'gasoline_prices')
+    ev_rows = lambda: count_rows(paths['ev_db'], 'ev_sales')
+    merged_rows = lambda: count_rows(paths['merged_db'], 'merged_data')
+    return {
+        'fetch_gas': dict(common, files_out=[paths['gas_data']]),
+        'fetch_ev': dict(common, files_out=[paths['ev_sales_data']]),
+        'ingest_gas': dict(common, files_in=[paths['gas_data']], files_out=[paths['gas_db']], rows_out=gas_rows),
+        'ingest_ev': dict(common, files_in=[paths['ev_sales_data']], files_out=[paths['ev_db']], rows_out=ev_rows),
+        'merge': dict(common, files_in=[paths['gas_db'], paths['ev_db']], files_out=[paths['merged_db'], paths['merged_csv']],
+                      rows_in=lambda: (gas_rows() or 0) + (ev_rows() or 0), rows_out=merged_rows),
+        'plot': dict(common, files_in=[paths['merged_db']], files_out=paths['plots'], rows_in=merged_rows),
+    }
+
+def configure_storage(settings):
+    """Apply the sqlite_* settings to the shared SQLite writer layer."""
+    import data_transform.storage as storage
+    storage.configure(
+        journal_mode=settings.get('sqlite_journal_mode', 'WAL'),
+        synchronous=settings.get('sqlite_synchronous', 'NORMAL'),
+        bulk_load=settings.get('sqlite_bulk_load', False),
+        batch_size=settings.get('sqlite_batch_size', storage.BATCH_SIZE),
+    )
+
+def configured_ev_sources(config, paths):
+    """Return the [[ev_sources]] of the config (see data_transform.ev_sources), or [] for the single EV source."""
+    if not config.get('ev_sources'):
+        return []
+    from data_transform.ev_sources import load_sources
+    return load_sources(config, paths['data_dir'])
+
+def merge_ev_sources(config, paths, sources):
+    """
+    Fetch, preprocess and aggregate every EV source in its own worker process,
+    then merge the per-source monthly volumes with the gas prices.
+
+    merged_data gets the total ``volume`` plus one ``volume_<name>`` column per
+    source. The monthly counts are recomputed for the whole window each run.
+    """
+    from data_transform.ev_sources import fan_out_sources, reduce_source_volumes
+    from data_transform.pre_process import fetch_and_process_data
+    settings = config['settings']
+    from_yr, to_yr = str(settings.get('from_yr', '2010')), str(settings.get('to_yr', '2023'))
     try:
-        # Load configuration
-        config = load_config()
-        data_dir = get_absolute_path(os.path.dirname(__file__), config['settings']['data_dir'])
+        volumes = fan_out_sources(sources, from_yr, to_yr, max_workers=settings.get('ev_source_workers'),
+                                  stream=settings.get('stream_download', False), use_cache=settings.get('download_cache', False),
+                                  chunksize=settings.get('ev_chunksize'))
+        fetch_and_process_data(from_yr, to_yr, paths['gas_db'], None, paths['gas_csv'], paths['ev_csv'], paths['merged_csv'], paths['log_file'], paths['merged_db'], report_path=paths['report'], pushdown=settings.get('sql_pushdown', False), artifact_format=settings.get('artifact_format'), csv_export=settings.get('csv_export', True), ev_monthly=reduce_source_volumes(volumes))
+        logger.info(f"Merged {len(sources)} EV sources with the gasoline prices.")
+    except Exception as e:
+        logger.error(f"Error merging EV sources: {e}")
+        raise
 
-        # Fetch data
-        gas_data_save_to = os.path.join(data_dir, config['settings']['gas_data_file'])
-        fetch_and_log(config['settings']['gas_data_url'], gas_data_save_to)
+def merge_for_analysis(config, paths, since=None):
+    """Run the merge step with the options from the [settings] table."""
+    sources = configured_ev_sources(config, paths)
+    if sources:
+        merge_ev_sources(config, paths, sources)
+        return
+    settings = config['settings']
+    from_yr, to_yr = str(settings.get('from_yr', '2010')), str(settings.get('to_yr', '2023'))
+    pre_process_data_for_analysis(from_yr, to_yr, paths['gas_db'], paths['ev_db'], paths['gas_csv'], paths['ev_csv'], paths['merged_csv'], paths['log_file'], paths['sep_log_file'], paths['merged_db'], report_path=paths['report'], pushdown=settings.get('sql_pushdown', False), since=since, artifact_format=settings.get('artifact_format'), csv_export=settings.get('csv_export', True), warehouse=settings.get('warehouse', False))
 
-        ev_sales_save_to = os.path.join(data_dir, config['settings']['ev_sales_data_file'])
-        fetch_and_log(config['settings']['ev_sales_data_url'], ev_sales_save_to)
+def staged_pipeline(config, paths, run_report=None):
+    """
+    Run the pipeline as a DAG of cached stages (see stage_cache.run_stages).
 
-        # Process gas and EV data
-        gas_db_path = os.path.join(data_dir, config['settings']['gas_db_file'])
-        extract_process_gas_data(gas_data_save_to, gas_db_path)
+    Each stage is keyed by the content of its input files and its parameters,
+    so unchanged stages are skipped and a change to e.g. the year range only
+    reruns the merge and plot stages. The merge is always a full rebuild here;
+    incremental mode still limits the ingest stages to new rows.
 
-        ev_db_path = os.path.join(data_dir, config['settings']['ev_sales_db_file'])
-        extract_process_ev_data(ev_sales_save_to, ev_db_path)
+    With ``run_report`` every stage that runs is measured into it (see
+    instrumentation.measure) and cached stages are recorded as skipped.
 
-        # Preprocess and merge data
-        gas_output_csv_path = os.path.join(data_dir, config['settings']['gas_output_csv_file'])
-        ev_output_csv_path = os.path.join(data_dir, config['settings']['ev_output_csv_file'])
-        merged_output_csv_path = os.path.join(data_dir, config['settings']['merged_output_csv_file'])
-        log_file = os.path.join(data_dir, config['settings']['log_file'])
-        sep_log_file = os.path.join(data_dir, config['settings']['sep_log_file'])
-        merged_db_path = os.path.join(data_dir, config['settings']['merged_db_file'])
+    With ``concurrent_fetch`` up to ``stage_workers`` independent stages run
+    at the same time and both downloads share one pooled HTTP session, so
+    e.g. ingest_gas starts as soon as fetch_gas is done while fetch_ev is
+    still downloading.
+    """
+    settings = config['settings']
+    from_yr, to_yr = str(settings.get('from_yr', '2010')), str(settings.get('to_yr', '2023'))
+    stream = settings.get('stream_download', False)
+    use_cache = settings.get('download_cache', False)
+    incremental = settings.get('incremental', False)
+    chunksize = settings.get('ev_chunksize')
+    use_parse_cache = settings.get('gas_parse_cache', False)
+    pushdown = settings.get('sql_pushdown', False)
+    artifact_format = settings.get('artifact_format')
+    csv_export = settings.get('csv_export', True)
+    warehouse = settings.get('warehouse', False)
+    compact = settings.get('ev_compact_schema', False)
+    partitioned = settings.get('ev_partitioned', False)
+    cube = settings.get('ev_cube', False)
+    concurrent = settings.get('concurrent_fetch', False)
+    if incremental:
+        logger.warning("With stage_cache_file the merge is always rebuilt in full; incremental only limits the ingest stages.")
+    session = None
+    if concurrent:
+        from data_process.fetch_data import new_session
+        session = new_session(pool_size=settings.get('fetch_workers', 2))
+
+    stages = [
+        stage('fetch_gas', lambda: fetch_and_log(settings['gas_data_url'], paths['gas_data'], stream=stream, use_cache=use_cache, session=session),
+              outputs=[paths['gas_data']], params={'url': settings['gas_data_url']}, always_run=True),
+        stage('fetch_ev', lambda: fetch_and_log(settings['ev_sales_data_url'], paths['ev_sales_data'], stream=stream, use_cache=use_cache, session=session),
+              outputs=[paths['ev_sales_data']], params={'url': settings['ev_sales_data_url']}, always_run=True),
+        stage('ingest_gas', lambda: extract_process_gas_data(paths['gas_data'], paths['gas_db'], incremental=incremental, use_parse_cache=use_parse_cache),
+              inputs=[paths['gas_data']], outputs=[paths['gas_db']],
+              params={'incremental': incremental}, deps=['fetch_gas']),
+        stage('ingest_ev', lambda: extract_process_ev_data(paths['ev_sales_data'], paths['ev_db'], chunksize=chunksize, incremental=incremental, compact=compact, partitioned=partitioned, cube=cube),
+              inputs=[paths['ev_sales_data']], outputs=[paths['ev_db']],
+              params={'chunksize': chunksize, 'incremental': incremental, 'compact': compact, 'partitioned': partitioned, 'cube': cube}, deps=['fetch_ev']),
+        stage('merge', lambda: merge_for_analysis(config, paths),
+              inputs=[paths['gas_db'], paths['ev_db']], outputs=[paths['merged_db']],
+              params={'from_yr': from_yr, 'to_yr': to_yr, 'pushdown': pushdown, 'artifact_format': artifact_format, 'csv_export': csv_export, 'warehouse': warehouse},
+              deps=['ingest_gas', 'ingest_ev']),
+        stage('plot', lambda: basic_analysis(paths['merged_db'], "merged_data", paths['data_dir'], max_workers=settings.get('plot_workers'), rolling_window=settings.get('rolling_window')),
+              inputs=[paths['merged_db']], outputs=paths['plots'],
+              params={'volume_scale_factor': 1000, 'rolling_window': settings.get('rolling_window')}, deps=['merge']),
+    ]
+    if configured_ev_sources(config, paths):
+        # The EV sources are fetched and aggregated by the merge stage's worker processes
+        stages = [stage_spec for stage_spec in stages if stage_spec['name'] not in ('fetch_ev', 'ingest_ev')]
+        merge_stage = next(stage_spec for stage_spec in stages if stage_spec['name'] == 'merge')
+        merge_stage.update(inputs=[paths['gas_db']], deps=['ingest_gas'], always_run=True)
+    if run_report is not None:
+        metrics = stage_metrics(paths, settings)
+        for stage_spec in stages:
+            stage_spec['func'] = instrument(run_report, stage_spec['name'], stage_spec['func'], **metrics[stage_spec['name']])
+    try:
+        results = run_stages(stages, paths['stage_cache'], max_workers=settings.get('stage_workers', 4) if concurrent else 1)
+    finally:
+        if session is not None:
+            session.close()
+    if run_report is not None:
+        record_skipped(run_report, [name for name, status in results.items() if status == 'skipped'])
+    return results
+
+def source_digest(settings, file_path):
+    """SHA-256 of a downloaded source (from its download cache sidecar when that is kept current), or None if it is missing."""
+    from data_process.fetch_data import load_cache_metadata, file_sha256
+    if not os.path.exists(file_path):
+        return None
+    cached = load_cache_metadata(file_path).get('sha256') if settings.get('download_cache', False) else None
+    return cached or file_sha256(file_path)
+
+def ingest_digest(sha256, params):
+    """Hash a source's SHA-256 together with the ingest settings that shape what is stored from it."""
+    import json
+    import hashlib
+    payload = {'source': sha256, 'params': params}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def ingested_digest(db_path, source):
+    """Return the SHA-256 of the file ``db_path`` last ingested from ``source``, or None."""
+    if not os.path.exists(db_path):
+        return None
+    import data_transform.storage as storage
+    from data_transform.watermark import read_source_digest
+    conn = storage.get_connection(db_path)
+    try:
+        return read_source_digest(conn, source)
+    finally:
+        storage.release(conn)
+
+def record_ingested(db_path, source, sha256):
+    """Record ``sha256`` as the content ``db_path`` last ingested from ``source``."""
+    import data_transform.storage as storage
+    from data_transform.watermark import write_source_digest
+    with storage.transaction(db_path) as conn:
+        write_source_digest(conn, source, sha256)
+
+def ingest_step(name, file_path, db_path, ingest, params, settings, measure_stage, run_report):
+    """
+    Run ``ingest`` unless ``db_path`` already holds the current content of ``file_path``.
+
+    The comparison is against the digest recorded after the last successful
+    ingest rather than the download's "changed" flag, so a file that was
+    downloaded but failed to load is ingested again on the next run even if
+    the server then answers 304 Not Modified. The digest covers ``params``
+    too (see ingest_digest), so e.g. switching the EV storage layout reruns
+    the ingest for an unchanged file, as stage_cache.stage_key does.
 
-        pre_process_data_for_analysis('2010', '2023', gas_db_path, ev_db_path, gas_output_csv_path, ev_output_csv_path, merged_output_csv_path, log_file, sep_log_file, merged_db_path)
+    Returns the ingest's earliest new timestamp, or None when it was skipped.
+    """
+    sha256 = source_digest(settings, file_path)
+    if sha256 is not None:
+        sha256 = ingest_digest(sha256, params)
+    if sha256 is not None and ingested_digest(db_path, name) == sha256:
+        logger.info(f"{file_path} is already ingested; keeping {db_path}.")
+        record_skipped(run_report, [f'ingest_{name}'])
+        return None
+    with measure_stage(f'ingest_{name}'):
+        earliest = ingest()
+    if sha256 is not None:
+        record_ingested(db_path, name, sha256)
+    return earliest
+
+def ingest_gas_step(settings, paths, measure_stage, run_report):
+    """Ingest the gas workbook unless its content is already stored; returns its earliest new timestamp or None."""
+    params = {'incremental': settings.get('incremental', False), 'use_parse_cache': settings.get('gas_parse_cache', False)}
+    ingest = lambda: extract_process_gas_data(paths['gas_data'], paths['gas_db'], **params)
+    return ingest_step('gas', paths['gas_data'], paths['gas_db'], ingest, params, settings, measure_stage, run_report)
+
+def ingest_ev_step(settings, paths, measure_stage, run_report):
+    """Ingest the EV registrations unless their content is already stored; returns their earliest new timestamp or None."""
+    params = {
+        'chunksize': settings.get('ev_chunksize'), 'incremental': settings.get('incremental', False),
+        'compact': settings.get('ev_compact_schema', False), 'partitioned': settings.get('ev_partitioned', False), 'cube': settings.get('ev_cube', False),
+    }
+    ingest = lambda: extract_process_ev_data(paths['ev_sales_data'], paths['ev_db'], **params)
+    return ingest_step('ev', paths['ev_sales_data'], paths['ev_db'], ingest, params, settings, measure_stage, run_report)
+
+def fetch_and_ingest_concurrently(settings, paths, measure_stage, run_report, sources=()):
+    """
+    Download the gas and EV sources at the same time and ingest each one as soon as it lands.
+
+    The downloads run on ``fetch_workers`` threads over one pooled HTTP
+    session; a finished download is handed to one of ``ingest_workers``
+    threads, so e.g. the gas workbook is parsed while the EV CSV is still
+    downloading. Gas and EV ingests share one SQLite file in warehouse mode,
+    so there they run one at a time. With ``sources`` (see
+    configured_ev_sources) only the gas data is fetched here.
+
+    The stage records in the run report overlap in time and list each other
+    under ``overlapped_with``: their CPU, I/O, peak RSS and tracemalloc
+    figures are per process, so they include the concurrent stages' work
+    (see instrumentation.measure).
+
+    Returns the earliest new timestamps reported by the ingests (None for
+    skipped ones).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from data_process.fetch_data import new_session
+    stream = settings.get('stream_download', False)
+    use_cache = settings.get('download_cache', False)
+    jobs = [('fetch_gas', settings['gas_data_url'], paths['gas_data'], ingest_gas_step)]
+    if sources:
+        record_skipped(run_report, ['fetch_ev', 'ingest_ev'])
+    else:
+        jobs.append(('fetch_ev', settings['ev_sales_data_url'], paths['ev_sales_data'], ingest_ev_step))
+    fetch_workers = min(len(jobs), settings.get('fetch_workers', len(jobs)))
+    ingest_workers = 1 if paths['gas_db'] == paths['ev_db'] else min(len(jobs), settings.get('ingest_workers', len(jobs)))
+
+    session = new_session(pool_size=fetch_workers)
+    try:
+        # The fetch pool is shut down first, so no download hands off to a closed ingest pool
+        with ThreadPoolExecutor(max_workers=ingest_workers, thread_name_prefix='ingest') as ingesters, \
+                ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='fetch') as fetchers:
+            def fetch_then_ingest(name, url, save_to, ingest):
+                with measure_stage(name):
+                    fetch_and_log(url, save_to, stream=stream, use_cache=use_cache, session=session)
+                return ingesters.submit(ingest, settings, paths, measure_stage, run_report)
+
+            fetches = [fetchers.submit(fetch_then_ingest, *job) for job in jobs]
+            ingests = [future.result() for future in fetches]
+            return [future.result() for future in ingests]
+    except Exception as e:
+        logger.error(f"Error fetching and ingesting sources concurrently: {e}")
+        raise
+    finally:
+        session.close()
+
+def pipeline(config_path=DEFAULT_CONFIG_PATH):
+    run_report, paths = new_report(), None
+    try:
+        # Load configuration
+        config = load_config(config_path)
+        paths = resolve_paths(config)
+        configure_storage(config['settings'])
+
+        if paths['stage_cache']:
+            staged_pipeline(config, paths, run_report=run_report)
+            logger.info("Pipeline executed successfully.")
+            return
+
+        metrics = stage_metrics(paths, config['settings'])
+        measure_stage = lambda name: measure(run_report, name, **metrics[name])
+
+        # Fetch and ingest gas and EV data, skipping sources whose content is already stored.
+        # In incremental mode each store reports the earliest timestamp it added.
+        settings = config['settings']
+        sources = configured_ev_sources(config, paths)
+        if settings.get('concurrent_fetch', False):
+            new_since = fetch_and_ingest_concurrently(settings, paths, measure_stage, run_report, sources=sources)
+        else:
+            stream = settings.get('stream_download', False)
+            use_cache = settings.get('download_cache', False)
+            with measure_stage('fetch_gas'):
+                fetch_and_log(settings['gas_data_url'], paths['gas_data'], stream=stream, use_cache=use_cache)
+            if sources:
+                # Each EV source is fetched and aggregated in its own worker during the merge
+                record_skipped(run_report, ['fetch_ev'])
+            else:
+                with measure_stage('fetch_ev'):
+                    fetch_and_log(settings['ev_sales_data_url'], paths['ev_sales_data'], stream=stream, use_cache=use_cache)
+            new_since = [ingest_gas_step(settings, paths, measure_stage, run_report)]
+            if sources:
+                record_skipped(run_report, ['ingest_ev'])
+            else:
+                new_since.append(ingest_ev_step(settings, paths, measure_stage, run_report))
+        new_since = [ts for ts in new_since if ts is not None]
+
+        # Preprocess and merge data
+        merged_db_path = paths['merged_db']
+        if settings.get('incremental', False) and os.path.exists(merged_db_path) and not sources:
+            if new_since:
+                # Recompute and upsert only the months touched by the new rows
+                with measure_stage('merge'):
+                    merge_for_analysis(config, paths, since=min(new_since))
+            else:
+                logger.info("No new gasoline or EV rows; merged data is up to date.")
+                record_skipped(run_report, ['merge'])
+        else:
+            with measure_stage('merge'):
+                merge_for_analysis(config, paths)
 
         # Perform basic analysis
-        basic_analysis(merged_db_path, "merged_data", data_dir)
+        with measure_stage('plot'):
+            basic_analysis(merged_db_path, "merged_data", paths['data_dir'], max_workers=settings.get('plot_workers'), rolling_window=settings.get('rolling_window'))
 
         logger.info("Pipeline executed successfully.")
     except Exception as e:
         logger.error(f"Pipeline execution failed: {e}")
+    finally:
+        if paths and paths['run_report']:
+            write_report(run_report, paths['run_report'])
 
 def main():
     pipeline()
@@ -0,0 +1,287 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pandas as pd
+
+import data_transform.storage as storage
+from data_transform.ev_schema import ev_layout, date_column, date_sql, date_param
+from data_transform.ev_partitions import ev_source_sql
+from data_transform.ev_cube import has_cube, rollup_query
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+CACHE_SIZE = 256
+
+# SQL that maps a date expression to its period label per granularity
+PERIOD_SQL = {
+    'month': "strftime('%Y-%m', {date})",
+    'quarter': "strftime('%Y', {date}) || '-Q' || ((CAST(strftime('%m', {date}) AS INTEGER) + 2) / 3)",
+    'year': "strftime('%Y', {date})",
+}
+
+response_cache = OrderedDict()
+cache_lock = threading.Lock()
+
+
+def store_version(db_path):
+    """
+    Return a token that changes whenever ``db_path`` is written.
+
+    WAL commits only touch the -wal file until the next checkpoint, so its
+    size and mtime are part of the token too.
+    """
+    version = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def cached_response(key, version, build):
+    """
+    Return (etag, body) for ``key`` from the LRU cache, calling ``build`` on a miss.
+
+    Entries are tagged with the store version they were built from, so a
+    write by the pipeline invalidates them on the next request.
+    """
+    with cache_lock:
+        entry = response_cache.get(key)
+        if entry and entry[0] == version:
+            response_cache.move_to_end(key)
+            return entry[1], entry[2]
+    body = json.dumps(build(), separators=(',', ':')).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    with cache_lock:
+        response_cache[key] = (version, etag, body)
+        response_cache.move_to_end(key)
+        while len(response_cache) > CACHE_SIZE:
+            response_cache.popitem(last=False)
+    return etag, body
+
+
+def query_param(query, name, default=None):
+    """Return the last value of a query string parameter."""
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def date_window(query):
+    """
+    Parse the ``from``/``to`` parameters ('YYYY-MM' or 'YYYY-MM-DD', both inclusive).
+
+    Returns half-open ('YYYY-MM-DD', 'YYYY-MM-DD') bounds covering whole
+    months; a missing bound is None.
+    """
+    try:
+        start, end = query_param(query, 'from'), query_param(query, 'to')
+        lower = pd.Period(start, 'M').start_time.strftime('%Y-%m-%d') if start else None
+        upper = (pd.Period(end, 'M') + 1).start_time.strftime('%Y-%m-%d') if end else None
+    except ValueError as e:
+        raise ValueError(f"Invalid date range: {e}")
+    return lower, upper
+
+
+def period_sql(query, date_expr):
+    """Return the period label expression for the requested granularity (default 'month')."""
+    granularity = query_param(query, 'granularity', 'month')
+    if granularity not in PERIOD_SQL:
+        raise ValueError(f"Unknown granularity '{granularity}'; use one of {sorted(PERIOD_SQL)}.")
+    return PERIOD_SQL[granularity].format(date=date_expr)
+
+
+def range_conditions(column, lower, upper, convert=lambda value: value):
+    """Build index-friendly range predicates and their parameters."""
+    conditions, params = [], []
+    if lower:
+        conditions.append(f"{column} >= ?")
+        params.append(convert(lower))
+    if upper:
+        conditions.append(f"{column} < ?")
+        params.append(convert(upper))
+    return ' AND '.join(conditions) or '1', params
+
+
+def fetch_rows(conn, sql, params):
+    """Run a query and return its rows as a list of dicts."""
+    cursor = conn.execute(sql, params)
+    columns = [description[0] for description in cursor.description]
+    return {'columns': columns, 'rows': [dict(zip(columns, row)) for row in cursor.fetchall()]}
+
+
+def merged_series(conn, query):
+    """Price (averaged) and every volume column (summed) of merged_data per period."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(merged_data)")]
+    if not columns:
+        raise LookupError("merged_data does not exist yet.")
+    volumes = [column for column in columns if column == 'volume' or column.startswith('volume_')]
+    lower, upper = date_window(query)
+    where, params = range_conditions('timestamp', lower, upper)
+    aggregates = ', '.join(['AVG(price) AS price'] + [f'SUM("{column}") AS "{column}"' for column in volumes])
+    return fetch_rows(conn, f"""
+        SELECT {period_sql(query, 'timestamp')} AS period, {aggregates}
+        FROM merged_data WHERE {where}
+        GROUP BY period ORDER BY period
+    """, params)
+
+
+def ev_series(conn, query):
+    """
+    EV registration counts per period.
+
+    When the EV store has a month x vehicle cube the counts are rolled up from
+    its cells, and ``vehicle`` (filter) and ``by=vehicle_name`` (breakdown)
+    drill down into it; otherwise the (possibly partitioned) registrations are
+    counted directly.
+    """
+    if has_cube(conn):
+        return cube_series(conn, query)
+    if query_param(query, 'vehicle') or query_param(query, 'by'):
+        raise ValueError("Vehicle drill-downs need the EV cube (set ev_cube = true).")
+    layout = ev_layout(conn)
+    if layout is None:
+        raise LookupError("ev_sales does not exist yet.")
+    lower, upper = date_window(query)
+    # Partition pruning needs a year window; open bounds fall back to the full store
+    from_yr = lower[:4] if lower else '0001'
+    to_yr = str((pd.Timestamp(upper) - pd.Timedelta(days=1)).year) if upper else '9999'
+    source = ev_source_sql(conn, from_yr, to_yr)
+    where, params = range_conditions(date_column(layout), lower, upper, convert=lambda value: date_param(value, layout))
+    return fetch_rows(conn, f"""
+        SELECT {period_sql(query, date_sql(layout))} AS period, COUNT(*) AS volume
+        FROM {source} WHERE {where}
+        GROUP BY period ORDER BY period
+    """, params)
+
+
+def cube_series(conn, query):
+    """Roll the EV cube up to the requested granularity, filtered and broken down by vehicle."""
+    lower, upper = date_window(query)
+    to_month = (pd.Timestamp(upper) - pd.Timedelta(days=1)).strftime('%Y-%m') if upper else None
+    vehicle, by = query_param(query, 'vehicle'), query_param(query, 'by')
+    sql, params = rollup_query(
+        query_param(query, 'granularity', 'month'),
+        by=by.split(',') if by else (),
+        filters={'vehicle_name': vehicle} if vehicle else None,
+        from_month=lower[:7] if lower else None,
+        to_month=to_month,
+        measure='volume',
+    )
+    return fetch_rows(conn, sql, params)
+
+
+def gas_series(conn, query):
+    """Average raw gasoline price per period."""
+    lower, upper = date_window(query)
+    where, params = range_conditions('timestamp', lower, upper)
+    return fetch_rows(conn, f"""
+        SELECT {period_sql(query, 'timestamp')} AS period, AVG(price) AS price, COUNT(*) AS observations
+        FROM gasoline_prices WHERE {where}
+        GROUP BY period ORDER BY period
+    """, params)
+
+
+# Endpoint -> (store key in the service's stores, query function)
+ENDPOINTS = {
+    '/series': ('merged', merged_series),
+    '/ev': ('ev', ev_series),
+    '/gas': ('gas', gas_series),
+}
+
+
+def respond(stores, path, query):
+    """
+    Answer one GET request.
+
+    Returns (status, etag, body); ``etag`` is None for errors.
+    """
+    if path == '/health':
+        return 200, None, json.dumps({'stores': {name: os.path.exists(db) for name, db in stores.items()}}).encode()
+    if path not in ENDPOINTS:
+        return 404, None, json.dumps({'error': f"Unknown endpoint {path}", 'endpoints': sorted(ENDPOINTS)}).encode()
+    store, handler = ENDPOINTS[path]
+    db_path = stores[store]
+    if not os.path.exists(db_path):
+        return 503, None, json.dumps({'error': f"The {store} store has not been built yet."}).encode()
+
+    key = (db_path, path, tuple(sorted((name, values[-1]) for name, values in query.items())))
+
+    def build():
+        with storage.read_connection(db_path) as conn:
+            return handler(conn, query)
+
+    try:
+        etag, body = cached_response(key, store_version(db_path), build)
+        return 200, etag, body
+    except ValueError as e:
+        return 400, None, json.dumps({'error': str(e)}).encode()
+    except (LookupError, sqlite3.OperationalError) as e:
+        return 503, None, json.dumps({'error': str(e)}).encode()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """HTTP front end of ``respond``; the stores are taken from the server."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, etag, body = respond(self.server.stores, url.path, parse_qs(url.query))
+        if etag and etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def make_server(paths, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Create the query server over the merged, EV and gas stores of ``paths`` (see main.resolve_paths).
+
+    Endpoints (all GET, JSON):
+    - /series: price and volume columns of merged_data.
+    - /ev: registration counts from the EV store.
+    - /gas: average prices from the gas store.
+    - /health: which stores exist.
+
+    The data endpoints take ``from`` and ``to`` ('YYYY-MM', inclusive) and
+    ``granularity`` ('month', 'quarter' or 'year').
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.stores = {'merged': paths['merged_db'], 'ev': paths['ev_db'], 'gas': paths['gas_db']}
+    return server
+
+
+def serve(paths, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the query server until interrupted."""
+    server = make_server(paths, host=host, port=port)
+    logger.info(f"Serving queries on http://{server.server_address[0]}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,221 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Configure logger
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def stage(name, func, inputs=(), outputs=(), params=None, deps=(), always_run=False):
+    """
+    Describe one pipeline stage.
+
+    Parameters:
+    - name: Unique stage name.
+    - func: Callable run without arguments when the stage is stale.
+    - inputs: Files the stage reads; their content is part of the cache key.
+    - outputs: Files the stage writes; a stage whose outputs are missing always reruns.
+    - params: JSON-serialisable parameters that change the stage's result (e.g. the year range).
+    - deps: Names of stages that must run first.
+    - always_run: Run on every execution (e.g. network fetches that revalidate themselves).
+    """
+    return {
+        'name': name,
+        'func': func,
+        'inputs': list(inputs),
+        'outputs': list(outputs),
+        'params': params or {},
+        'deps': list(deps),
+        'always_run': always_run,
+    }
+
+
+def load_state(cache_path):
+    """Load the stage cache state, or an empty state if the file is missing or unreadable."""
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable stage cache {cache_path}: {e}")
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(state, cache_path):
+    """Write the stage cache state atomically."""
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w') as cache_file:
+        json.dump(state, cache_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+
+def checkpoint_wal(path):
+    """
+    Copy the committed pages of a SQLite database's write-ahead log into the main file.
+
+    In WAL mode commits stay in ``<path>-wal`` while any connection (e.g. the
+    pooled writers of data_transform.storage) is open, so the main file alone
+    lags the database until the last connection closes.
+    """
+    if not os.path.exists(f"{path}-wal"):
+        return
+    conn = sqlite3.connect(path)
+    try:
+        busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    finally:
+        conn.close()
+    if busy:
+        logger.warning(f"Could not checkpoint {path} while it is being written; its digest may be stale.")
+
+
+def file_digest(path, file_index):
+    """
+    Return the SHA-256 of a file's content, or 'missing' if it does not exist.
+
+    Digests are remembered in ``file_index`` by size and mtime, so an
+    unchanged multi-hundred-MB input is hashed only once. SQLite databases
+    with a write-ahead log are checkpointed first, so their digest covers
+    every committed write.
+    """
+    if not os.path.exists(path):
+        return 'missing'
+    checkpoint_wal(path)
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = file_index.get(path)
+    if cached and cached['signature'] == signature:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    file_index[path] = {'signature': signature, 'sha256': digest.hexdigest()}
+    return file_index[path]['sha256']
+
+
+def stage_key(stage_spec, file_index):
+    """Hash a stage's name, parameters and input file contents into its cache key."""
+    payload = {
+        'name': stage_spec['name'],
+        'params': stage_spec['params'],
+        'inputs': {path: file_digest(path, file_index) for path in stage_spec['inputs']},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def topological_order(stages):
+    """Order stages so every stage comes after its dependencies."""
+    by_name = {stage_spec['name']: stage_spec for stage_spec in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Stage dependency cycle through '{name}'.")
+        if name not in by_name:
+            raise KeyError(f"Unknown stage dependency '{name}'.")
+        visiting.add(name)
+        for dep in by_name[name]['deps']:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+
+    for stage_spec in stages:
+        visit(stage_spec['name'])
+    return ordered
+
+
+def shares_files(stage_spec, other):
+    """Return True if one stage writes a file the other reads or writes."""
+    files = set(stage_spec['inputs']) | set(stage_spec['outputs'])
+    other_files = set(other['inputs']) | set(other['outputs'])
+    return bool(files & set(other['outputs']) or other_files & set(stage_spec['outputs']))
+
+
+def run_stages(stages, cache_path=None, max_workers=1):
+    """
+    Run stages in dependency order, skipping those whose cache key is unchanged.
+
+    A stage is skipped when its key (name + params + input file hashes) matches
+    the key recorded after its last successful run and all of its outputs still
+    exist. Because a stage's inputs are its upstream stages' outputs, changing a
+    parameter or a source file reruns only the stages downstream of it.
+
+    With ``max_workers > 1`` every stage whose dependencies have finished is
+    started right away on a worker thread, so independent branches (e.g.
+    fetch_gas -> ingest_gas and fetch_ev -> ingest_ev) overlap. Stages that
+    share a file one of them writes never run at the same time. Cache keys
+    are computed and the state is saved on the calling thread only. If a
+    stage fails, no new stages are started; the running ones finish and the
+    first error is raised.
+
+    Parameters:
+    - stages: List of stage dicts built with ``stage``.
+    - cache_path: JSON file holding the keys of the last successful runs; None disables caching.
+    - max_workers: Number of stages run at the same time.
+
+    Returns a dict mapping stage names to 'ran' or 'skipped'.
+    """
+    state = load_state(cache_path)
+    results = {}
+    pending = topological_order(stages)
+    running = {}
+    error = None
+
+    def finish(stage_spec):
+        results[stage_spec['name']] = 'ran'
+        if cache_path:
+            # Recompute: the stage itself may have rewritten its inputs (e.g. fetch)
+            state['stages'][stage_spec['name']] = stage_key(stage_spec, state['files'])
+            for path in stage_spec['outputs']:
+                if os.path.exists(path):
+                    file_digest(path, state['files'])
+            save_state(state, cache_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            for stage_spec in list(pending):
+                if error is not None or len(running) >= max(1, max_workers):
+                    break
+                if not all(results.get(dep) for dep in stage_spec['deps']):
+                    continue
+                if any(shares_files(stage_spec, other) for other in running.values()):
+                    continue
+                pending.remove(stage_spec)
+                name = stage_spec['name']
+                key = stage_key(stage_spec, state['files'])
+                outputs_exist = all(os.path.exists(path) for path in stage_spec['outputs'])
+                if (cache_path and not stage_spec['always_run'] and outputs_exist
+                        and state['stages'].get(name) == key):
+                    logger.info(f"Stage '{name}' is up to date; reusing cached outputs.")
+                    results[name] = 'skipped'
+                    continue
+                logger.info(f"Running stage '{name}'.")
+                running[executor.submit(stage_spec['func'])] = stage_spec
+            if not running:
+                if error is not None or not pending:
+                    break
+                # Only reachable when a dependency is neither finished nor pending
+                raise RuntimeError(f"Stages {[stage_spec['name'] for stage_spec in pending]} can never run.")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage_spec = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Stage '{stage_spec['name']}' failed: {e}")
+                    error = error or e
+                    continue
+                finish(stage_spec)
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,53 @@
+import os
+import pytest
+import pandas as pd
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from analytics.basic_analysis import plot_and_save_graph, plot_separate_graphs_with_normalization_and_save
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a merged_data table to plot."""
+    db_path = tmp_path / "merged.db"
+    merged_df = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-31", periods=4, freq="ME").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.1, 3.2, 3.3, 3.4],
+        "volume": [1000, 2000, 3000, 4000],
+    })
+    conn = sqlite3.connect(db_path)
+    merged_df.to_sql("merged_data", conn, index=False)
+    conn.close()
+    return db_path, tmp_path
+
+def test_charts_skip_unchanged_data(setup_environment):
+    """Test that charts are rendered once and re-rendered only when their data changes."""
+    db_path, output_dir = setup_environment
+
+    first = plot_separate_graphs_with_normalization_and_save(str(db_path), "merged_data", output_dir=str(output_dir))
+    assert set(first.values()) == {"rendered"}
+    assert all(os.path.getsize(path) > 0 for path in first)
+
+    second = plot_separate_graphs_with_normalization_and_save(str(db_path), "merged_data", output_dir=str(output_dir), max_workers=1)
+    assert set(second.values()) == {"skipped"}
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE merged_data SET volume = volume + 1")
+    conn.commit()
+    conn.close()
+    third = plot_separate_graphs_with_normalization_and_save(str(db_path), "merged_data", output_dir=str(output_dir), max_workers=1)
+    assert third[f"{output_dir}/gasoline_prices.png"] == "skipped"
+    assert third[f"{output_dir}/normalized_ev_volume.png"] == "rendered"
+
+def test_scale_factor_leaves_data_untouched(setup_environment):
+    """Test that scaling a series for the chart does not modify the caller's frame."""
+    _, output_dir = setup_environment
+    data = pd.DataFrame({"timestamp": pd.date_range("2023-01-31", periods=3, freq="ME"), "volume": [1000, 2000, 3000]})
+
+    plot_and_save_graph(data, "timestamp", "volume", "Volume", "EV Volume", str(output_dir / "volume.png"), "tab:orange", scale_factor=1000)
+
+    assert data["volume"].tolist() == [1000, 2000, 3000]
+    assert os.path.exists(output_dir / "volume.png")
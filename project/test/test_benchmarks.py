@@ -0,0 +1,65 @@
+import os
+import json
+import pytest
+import pandas as pd
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from benchmarks import synthetic
+from benchmarks.run_benchmarks import run_benchmarks, find_regressions, main
+from data_transform.ev_sales_data import preprocess_ev_sales_data
+
+def test_synthetic_data_is_deterministic():
+    """Test that the generator is reproducible and shaped like the real sources."""
+    first = synthetic.ev_registrations(1_000, seed=3)
+    pd.testing.assert_frame_equal(first, synthetic.ev_registrations(1_000, seed=3))
+    assert list(first.columns) == ["Registration Valid Date", "Vehicle Name"]
+    assert 0 < len(preprocess_ev_sales_data(first)) < 1_000
+
+    gas = synthetic.gas_weekly(500, seed=3)
+    assert list(gas.columns) == [synthetic.GAS_DATE_COLUMN, synthetic.GAS_PRICE_COLUMN]
+    assert set(gas[synthetic.GAS_DATE_COLUMN].diff().dt.days.dropna()) <= {7, 14}
+    assert len(synthetic.gas_weekly(10 ** 6)) == synthetic.MAX_GAS_WEEKS
+
+@pytest.mark.parametrize("text, rows", [("10k", 10_000), ("2.5M", 2_500_000), ("50m", 50_000_000), ("750", 750)])
+def test_parse_scale(text, rows):
+    """Test scale labels."""
+    assert synthetic.parse_scale(text) == rows
+
+def test_regressions_flagged_against_baseline(tmp_path):
+    """Test a small benchmark run, baseline storage and regression flagging."""
+    results = run_benchmarks(["400"], repeat=1, workdir=str(tmp_path), only=["process_ev_data", "save_to_db"])
+    assert set(results) == {"process_ev_data@400", "save_to_db@400"}
+    assert results["process_ev_data@400"]["rows"] == 400
+
+    baseline = {"process_ev_data@400": {"wall_seconds": 1.0, "tracemalloc_peak_bytes": 1000}}
+    current = {"process_ev_data@400": {"wall_seconds": 1.5, "tracemalloc_peak_bytes": 1100}}
+    regressions = find_regressions(current, baseline, threshold=0.2)
+    assert regressions == ["process_ev_data@400: wall_seconds 1 -> 1.5 (+50%)"]
+
+    baseline_path = str(tmp_path / "baseline.json")
+    assert main(["--scales", "400", "--repeat", "1", "--only", "process_ev_data", "--baseline", baseline_path, "--save-baseline"]) == 0
+    with open(baseline_path) as baseline_file:
+        assert "process_ev_data@400" in json.load(baseline_file)["results"]
+
+def test_only_builds_inputs_of_selected_benchmarks(tmp_path, monkeypatch):
+    """Test that --only skips generating the inputs of the other benchmarks."""
+    def unexpected(*args, **kwargs):
+        raise AssertionError("input of a skipped benchmark was built")
+    monkeypatch.setattr(synthetic, "ev_registrations", unexpected)
+    monkeypatch.setattr(synthetic, "gas_weekly", unexpected)
+    monkeypatch.setattr(synthetic, "gas_prices", unexpected)
+
+    results = run_benchmarks(["400"], repeat=1, workdir=str(tmp_path), only=["process_ev_data"])
+    assert set(results) == {"process_ev_data@400"}
+
+def test_capped_gas_benchmarks_are_labelled_by_their_rows(tmp_path, monkeypatch):
+    """Test that gas benchmarks past the weekly cap are keyed and measured once at the capped size."""
+    monkeypatch.setattr(synthetic, "MAX_GAS_WEEKS", 300)
+    results = run_benchmarks(["200", "400", "800"], repeat=1, workdir=str(tmp_path), only=["process_gas_data", "process_ev_data"])
+    assert set(results) == {"process_gas_data@200", "process_gas_data@300",
+                            "process_ev_data@200", "process_ev_data@400", "process_ev_data@800"}
+    assert results["process_gas_data@300"]["rows"] == 300
+    assert synthetic.format_scale(25_000) == "25k" and synthetic.parse_scale("2.5m") == 2_500_000
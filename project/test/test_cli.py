@@ -0,0 +1,89 @@
+import os
+import subprocess
+import pytest
+import pandas as pd
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(PROJECT_DIR)
+
+import cli
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a config file whose data directory is a temporary directory."""
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f"""
+[settings]
+gas_data_url = "https://example.com/gas.xls"
+ev_sales_data_url = "https://example.com/ev.csv"
+data_dir = "{tmp_path.as_posix()}"
+gas_data_file = "raw_Gas.xls"
+ev_sales_data_file = "raw_ev_sales.csv"
+gas_db_file = "gas.db"
+ev_sales_db_file = "ev_sales.db"
+gas_output_csv_file = "gas.csv"
+ev_output_csv_file = "ev.csv"
+merged_output_csv_file = "merged.csv"
+log_file = "log.txt"
+sep_log_file = "sep_log.txt"
+merged_db_file = "merged.db"
+""")
+    return config_path, tmp_path
+
+def test_status_runs_without_heavy_imports(setup_environment):
+    """Test that the status command neither imports pandas nor matplotlib."""
+    config_path, tmp_path = setup_environment
+    conn = sqlite3.connect(tmp_path / "gas.db")
+    conn.execute("CREATE TABLE etl_watermarks (table_name TEXT, column_name TEXT, high_water_mark TEXT, updated_at TEXT)")
+    conn.execute("INSERT INTO etl_watermarks VALUES ('gasoline_prices', 'timestamp', '2023-03-01 00:00:00', '2023-03-02')")
+    conn.commit()
+    conn.close()
+
+    script = (
+        "import sys, cli\n"
+        f"code = cli.main(['--config', {str(config_path)!r}, 'status'])\n"
+        "heavy = [name for name in ('pandas', 'matplotlib', 'requests') if name in sys.modules]\n"
+        "print('HEAVY', heavy)\n"
+        "sys.exit(code)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_DIR, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert "HEAVY []" in result.stdout
+    assert "gasoline_prices  2023-03-01 00:00:00" in result.stdout
+
+def test_merge_subcommand_passes_since(setup_environment, monkeypatch):
+    """Test that `merge --since` forwards the parsed date to the merge step."""
+    config_path, tmp_path = setup_environment
+    calls = []
+    monkeypatch.setattr(cli.pipeline_main, "merge_for_analysis", lambda config, paths, since=None: calls.append((paths["merged_db"], since)))
+
+    assert cli.main(["--config", str(config_path), "merge", "--since", "2023-03-01"]) == 0
+    assert calls == [(os.path.join(str(tmp_path), "merged.db"), pd.Timestamp("2023-03-01"))]
+
+def test_unknown_dataset_is_rejected(setup_environment):
+    """Test that argparse rejects datasets the fetch command does not know."""
+    config_path, _ = setup_environment
+    with pytest.raises(SystemExit):
+        cli.main(["--config", str(config_path), "fetch", "solar"])
+
+def test_correlate_subcommand_scans_merged_data(setup_environment, capsys):
+    """Test that `correlate` prints the best lag of each volume series in merged_data."""
+    config_path, tmp_path = setup_environment
+    price = pd.Series(range(40), dtype=float) % 7
+    merged = pd.DataFrame({
+        "timestamp": pd.date_range("2020-01-31", periods=40, freq="ME").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": price,
+        "volume": price.shift(2).fillna(0) * 10,
+    })
+    conn = sqlite3.connect(tmp_path / "merged.db")
+    merged.to_sql("merged_data", conn, index=False)
+    conn.close()
+
+    assert cli.main(["--config", str(config_path), "correlate", "--max-lag", "4"]) == 0
+    output = capsys.readouterr().out.splitlines()
+    assert output[0].split() == ["series", "best_lag", "correlation"]
+    assert output[1].split()[:2] == ["volume", "2"]
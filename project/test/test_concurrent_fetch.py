@@ -0,0 +1,170 @@
+import os
+import json
+import pytest
+import sqlite3
+import threading
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import main
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a config file that fetches and ingests the sources concurrently."""
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f"""
+[settings]
+gas_data_url = "https://example.com/gas.xls"
+ev_sales_data_url = "https://example.com/ev.csv"
+data_dir = "{tmp_path.as_posix()}"
+gas_data_file = "raw_Gas.xls"
+ev_sales_data_file = "raw_ev_sales.csv"
+gas_db_file = "gas.db"
+ev_sales_db_file = "ev_sales.db"
+gas_output_csv_file = "gas.csv"
+ev_output_csv_file = "ev.csv"
+merged_output_csv_file = "merged.csv"
+log_file = "log.txt"
+sep_log_file = "sep_log.txt"
+merged_db_file = "merged.db"
+run_report_file = "run_report.json"
+concurrent_fetch = true
+fetch_workers = 2
+ingest_workers = 2
+""")
+    return config_path, tmp_path
+
+def fake_ingest(file_path, db_path, **kwargs):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS rows (value INTEGER)")
+    conn.commit()
+    conn.close()
+
+def test_gas_ingest_overlaps_ev_download(setup_environment, monkeypatch):
+    """Test that the gas file is ingested while the EV download is still running, over one shared session."""
+    config_path, tmp_path = setup_environment
+    gas_ingested = threading.Event()
+    sessions, overlapped = [], []
+
+    def fake_fetch(url, save_to, session=None, **kwargs):
+        sessions.append(session)
+        if url.endswith("ev.csv"):
+            # The EV download only finishes once the gas ingest has run
+            overlapped.append(gas_ingested.wait(timeout=10))
+        return True
+
+    def fake_gas_ingest(file_path, db_path, **kwargs):
+        fake_ingest(file_path, db_path)
+        gas_ingested.set()
+
+    monkeypatch.setattr(main, "fetch_and_log", fake_fetch)
+    monkeypatch.setattr(main, "extract_process_gas_data", fake_gas_ingest)
+    monkeypatch.setattr(main, "extract_process_ev_data", fake_ingest)
+    monkeypatch.setattr(main, "merge_for_analysis", lambda config, paths, since=None: None)
+    monkeypatch.setattr(main, "basic_analysis", lambda *args, **kwargs: None)
+
+    main.pipeline(str(config_path))
+
+    assert overlapped == [True]
+    assert len(sessions) == 2 and sessions[0] is sessions[1] and sessions[0] is not None
+    with open(tmp_path / "run_report.json") as report_file:
+        stages = {record["name"]: record["status"] for record in json.load(report_file)["stages"]}
+    assert stages == {"fetch_gas": "ran", "fetch_ev": "ran", "ingest_gas": "ran", "ingest_ev": "ran", "merge": "ran", "plot": "ran"}
+
+def test_ingested_sources_skip_ingest(setup_environment, monkeypatch):
+    """Test that sources whose content is already stored skip their ingest, and a failed ingest is retried."""
+    config_path, tmp_path = setup_environment
+    (tmp_path / "raw_Gas.xls").write_bytes(b"gas")
+    (tmp_path / "raw_ev_sales.csv").write_bytes(b"ev v1")
+    ingested = []
+
+    def failing_ev_ingest(file_path, db_path, **kwargs):
+        raise ValueError("bad EV file")
+
+    def record_ingest(file_path, db_path, **kwargs):
+        fake_ingest(file_path, db_path)
+        ingested.append(os.path.basename(file_path))
+
+    monkeypatch.setattr(main, "fetch_and_log", lambda url, save_to, **kwargs: False)
+    monkeypatch.setattr(main, "extract_process_gas_data", record_ingest)
+    monkeypatch.setattr(main, "extract_process_ev_data", failing_ev_ingest)
+    config = main.load_config(str(config_path))
+    paths = main.resolve_paths(config)
+    run_report = main.new_report()
+    measure_stage = lambda name: main.measure(run_report, name)
+
+    with pytest.raises(ValueError):
+        main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report)
+    assert ingested == ["raw_Gas.xls"]
+
+    # The download reports "unchanged", but the EV file was never stored
+    monkeypatch.setattr(main, "extract_process_ev_data", record_ingest)
+    assert main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report) == [None, None]
+    assert ingested == ["raw_Gas.xls", "raw_ev_sales.csv"]
+    assert main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report) == [None, None]
+    assert ingested == ["raw_Gas.xls", "raw_ev_sales.csv"]
+    skipped = [record["name"] for record in run_report["stages"] if record["status"] == "skipped"]
+    assert sorted(skipped) == ["ingest_ev", "ingest_gas", "ingest_gas"]
+
+def test_changed_ingest_settings_rerun_ingest(setup_environment, monkeypatch):
+    """Test that switching the EV storage layout reruns the ingest of an unchanged file."""
+    config_path, tmp_path = setup_environment
+    (tmp_path / "raw_Gas.xls").write_bytes(b"gas")
+    (tmp_path / "raw_ev_sales.csv").write_bytes(b"ev v1")
+    ev_layouts = []
+
+    def record_ev_ingest(file_path, db_path, compact=False, **kwargs):
+        fake_ingest(file_path, db_path)
+        ev_layouts.append(compact)
+
+    monkeypatch.setattr(main, "fetch_and_log", lambda url, save_to, **kwargs: False)
+    monkeypatch.setattr(main, "extract_process_gas_data", fake_ingest)
+    monkeypatch.setattr(main, "extract_process_ev_data", record_ev_ingest)
+    config = main.load_config(str(config_path))
+    paths = main.resolve_paths(config)
+    run_report = main.new_report()
+    measure_stage = lambda name: main.measure(run_report, name)
+
+    main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report)
+    config["settings"]["ev_compact_schema"] = True
+    main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report)
+    main.fetch_and_ingest_concurrently(config["settings"], paths, measure_stage, run_report)
+
+    assert ev_layouts == [False, True]
+    skipped = [record["name"] for record in run_report["stages"] if record["status"] == "skipped"]
+    assert sorted(skipped) == ["ingest_ev", "ingest_gas", "ingest_gas"]
+
+def test_staged_pipeline_overlaps_fetch_and_ingest(setup_environment, monkeypatch):
+    """Test that the stage-cached pipeline also ingests the gas file while the EV download is running."""
+    config_path, tmp_path = setup_environment
+    config_path.write_text(config_path.read_text() + 'stage_cache_file = "stage_cache.json"\nstage_workers = 4\n')
+    gas_ingested = threading.Event()
+    sessions, overlapped = [], []
+
+    def fake_fetch(url, save_to, session=None, **kwargs):
+        sessions.append(session)
+        if url.endswith("ev.csv"):
+            overlapped.append(gas_ingested.wait(timeout=10))
+        with open(save_to, "w") as source_file:
+            source_file.write(url)
+        return True
+
+    def fake_gas_ingest(file_path, db_path, **kwargs):
+        fake_ingest(file_path, db_path)
+        gas_ingested.set()
+
+    monkeypatch.setattr(main, "fetch_and_log", fake_fetch)
+    monkeypatch.setattr(main, "extract_process_gas_data", fake_gas_ingest)
+    monkeypatch.setattr(main, "extract_process_ev_data", fake_ingest)
+    monkeypatch.setattr(main, "merge_for_analysis", lambda config, paths, since=None: fake_ingest(None, paths["merged_db"]))
+    monkeypatch.setattr(main, "basic_analysis", lambda *args, **kwargs: None)
+
+    main.pipeline(str(config_path))
+
+    assert overlapped == [True]
+    assert len(sessions) == 2 and sessions[0] is sessions[1] and sessions[0] is not None
+    with open(tmp_path / "run_report.json") as report_file:
+        stages = {record["name"]: record["status"] for record in json.load(report_file)["stages"]}
+    assert stages == {"fetch_gas": "ran", "fetch_ev": "ran", "ingest_gas": "ran", "ingest_ev": "ran", "merge": "ran", "plot": "ran"}
@@ -0,0 +1,73 @@
+import os
+import pytest
+import time
+import numpy as np
+import pandas as pd
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from analytics.cross_correlation import lagged_cross_correlation, best_lags, scan_merged_data
+
+@pytest.fixture
+def lagged_series():
+    """A price series and volume series that follow it with known lags, plus noise and gaps."""
+    rng = np.random.default_rng(7)
+    months = 160
+    price = pd.Series(rng.normal(0, 1, months + 20).cumsum())
+    series = pd.DataFrame({
+        "lead_3": price.shift(3) * 100 + rng.normal(0, 5, months + 20),
+        "lag_5": -price.shift(-5) * 10 + rng.normal(0, 1, months + 20),
+        "noise": rng.normal(0, 1, months + 20),
+    }).iloc[10:months + 10].reset_index(drop=True)
+    price = price.iloc[10:months + 10].reset_index(drop=True)
+    series.loc[[4, 50, 51], "noise"] = np.nan
+    price.iloc[[20, 90]] = np.nan
+    return price, series
+
+def test_matches_shifted_pandas_correlation(lagged_series):
+    """Test that every (series, lag) entry equals pandas' shift().corr()."""
+    price, series = lagged_series
+    lags, matrix = lagged_cross_correlation(price, series, max_lag=12)
+
+    expected = np.array([[price.corr(series[column].shift(-lag)) for lag in lags] for column in series])
+    assert matrix.shape == (3, 25)
+    np.testing.assert_allclose(matrix, expected, rtol=1e-8, atol=1e-10)
+
+def test_best_lag_per_series(lagged_series):
+    """Test that the strongest lag is found with its signed coefficient."""
+    price, series = lagged_series
+    result = best_lags(price, series, max_lag=12)
+
+    assert result["series"].tolist() == ["lead_3", "lag_5", "noise"]
+    assert result["best_lag"].tolist()[:2] == [3, -5]
+    assert result.loc[0, "correlation"] > 0.9 and result.loc[1, "correlation"] < -0.9
+
+def test_batch_scan_is_fast():
+    """Test that thousands of series are scanned in one vectorized batch."""
+    rng = np.random.default_rng(0)
+    price = rng.normal(0, 1, 240)
+    series = rng.normal(0, 1, (240, 5000))
+    started = time.perf_counter()
+    result = best_lags(price, series, max_lag=24)
+    assert len(result) == 5000
+    assert time.perf_counter() - started < 10
+
+def test_scan_merged_data(tmp_path, lagged_series):
+    """Test scanning the volume columns of merged_data."""
+    price, series = lagged_series
+    merged_df = pd.DataFrame({
+        "timestamp": pd.date_range("2010-01-31", periods=len(price), freq="ME").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": price,
+        "volume": series["lead_3"],
+        "volume_wa": series["noise"],
+    })
+    conn = sqlite3.connect(tmp_path / "merged.db")
+    merged_df.to_sql("merged_data", conn, index=False)
+    conn.close()
+
+    result = scan_merged_data(str(tmp_path / "merged.db"), max_lag=6)
+    assert result["series"].tolist() == ["volume", "volume_wa"]
+    assert result.loc[0, "best_lag"] == 3
@@ -1,5 +1,7 @@
 import os
+import json
 import pytest
+import numpy as np
 import pandas as pd
 import sqlite3
 import sys
@@ -7,7 +9,9 @@ import sys
 # Add parent directory to sys.path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
-from data_transform.pre_process import process_gas_data, process_ev_data, merge_data, save_to_db
+from data_transform.pre_process import process_gas_data, process_ev_data, merge_data, save_to_db, load_ev_monthly, fetch_and_process_data
+from data_transform.gap_repair import repair_gaps
+from data_transform.warehouse import build_warehouse
 
 @pytest.fixture
 def setup_environment(tmp_path):
@@ -166,3 +170,355 @@ def test_save_to_database(create_mock_data):
     assert "timestamp" in result_df.columns, "Saved database missing 'timestamp'."
     assert "price" in result_df.columns, "Saved database missing 'price'."
     assert "volume" in result_df.columns, "Saved database missing 'volume'."
+
+def reference_gap_repair(prices, timestamps):
+    """Row-by-row gap repair as originally implemented in process_gas_data."""
+    prices = list(prices)
+    week_diff = pd.Series(timestamps).diff().dt.days.tolist()
+    for i in range(1, len(prices)):
+        if week_diff[i] != 7:
+            if i + 1 < len(prices):
+                prices[i] = (prices[i - 1] + prices[i + 1]) / 2
+            else:
+                prices[i] = prices[i - 1]
+    return prices
+
+def test_neighbour_mean_matches_reference_loop():
+    """Test that the vectorized gap repair reproduces the original loop exactly."""
+    rng = np.random.default_rng(42)
+    steps = rng.choice([7, 7, 7, 7, 3, 10, 14], size=500)
+    timestamps = pd.Timestamp("2010-01-03") + pd.to_timedelta(np.r_[0, np.cumsum(steps)[:-1]], unit="D")
+    prices = rng.uniform(2.0, 5.0, size=500)
+    prices[[20, 21, 300]] = np.nan
+
+    gas_df = pd.DataFrame({"timestamp": timestamps, "price": prices})
+    repaired = repair_gaps(gas_df, strategy="neighbour_mean")
+
+    expected = reference_gap_repair(prices, timestamps)
+    np.testing.assert_array_equal(repaired["price"].to_numpy(), np.array(expected))
+
+@pytest.mark.parametrize("strategy", ["linear", "ffill", "calendar"])
+def test_alternative_gap_strategies(strategy):
+    """Test that every gap repair strategy yields a complete price series."""
+    gas_df = pd.DataFrame({
+        "timestamp": pd.to_datetime(["2023-01-01", "2023-01-08", "2023-01-18", "2023-01-22", "2023-01-29"]),
+        "price": [3.0, 3.2, 9.9, 3.6, 3.8],
+    })
+    repaired = repair_gaps(gas_df, strategy=strategy)
+
+    assert repaired["price"].notna().all()
+    if strategy == "calendar":
+        assert repaired["timestamp"].diff().dropna().dt.days.eq(7).all()
+    else:
+        assert len(repaired) == len(gas_df)
+        assert repaired["price"].iloc[2] != 9.9
+
+@pytest.mark.parametrize("report_name", ["report.jsonl", "report.db"])
+def test_quality_report_written_in_bulk(create_mock_data, report_name):
+    """Test that gap and missing-month checks land in a structured report with summaries."""
+    env = create_mock_data
+    report_path = str(env["db"].parent / report_name)
+
+    conn = sqlite3.connect(env["gas_db"])
+    gas_df = pd.read_sql_query("SELECT * FROM gasoline_prices", conn)
+    conn.close()
+    gas_monthly = process_gas_data(gas_df, str(env["log_file"]), report_path=report_path)
+
+    conn = sqlite3.connect(env["ev_db"])
+    ev_df = pd.read_sql_query("SELECT * FROM ev_sales", conn)
+    conn.close()
+    ev_monthly = process_ev_data(ev_df)
+    merge_data(gas_monthly, ev_monthly, str(env["merged_csv"]), str(env["log_file"]), report_path=report_path)
+
+    if report_name.endswith(".jsonl"):
+        lines = [json.loads(line) for line in open(report_path)]
+        summaries = {line["summary"]["check"]: line["summary"] for line in lines if "summary" in line}
+        issues = [line for line in lines if "summary" not in line]
+    else:
+        conn = sqlite3.connect(report_path)
+        summary_df = pd.read_sql_query("SELECT * FROM quality_summary", conn)
+        issues = pd.read_sql_query("SELECT * FROM quality_issues", conn).to_dict("records")
+        conn.close()
+        summaries = {row["check"]: row for row in summary_df.to_dict("records")}
+
+    assert summaries["weekly_gap"]["issue_count"] == 1
+    assert summaries["weekly_gap"]["max_gap_days"] == 10
+    assert summaries["missing_month"]["issue_count"] == 1
+    assert len(issues) == 2
+
+def test_sql_pushdown_matches_pandas_aggregation(tmp_path):
+    """Test that the SQLite month grouping equals the pandas aggregation."""
+    ev_db_path = tmp_path / "ev_sales.db"
+    ev_data = pd.DataFrame({
+        "registration_date": pd.to_datetime([
+            "2009-12-31", "2010-01-05", "2010-01-20", "2010-03-01", "2011-12-31", "2012-01-01", None
+        ]),
+        "vehicle_name": list("ABCDEFG"),
+    })
+    conn = sqlite3.connect(ev_db_path)
+    ev_data.to_sql("ev_sales", conn, if_exists="replace", index=False)
+    conn.close()
+
+    expected = load_ev_monthly(str(ev_db_path), "2010", "2011")
+    result = load_ev_monthly(str(ev_db_path), "2010", "2011", pushdown=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+    conn = sqlite3.connect(ev_db_path)
+    indexes = [row[1] for row in conn.execute("PRAGMA index_list('ev_sales')")]
+    conn.close()
+    assert "idx_ev_sales_registration_date" in indexes
+
+def test_incremental_merge_upserts_affected_months(tmp_path):
+    """Test that a merge with `since` upserts only the recomputed months."""
+    gas_db, ev_db, merged_db = (str(tmp_path / name) for name in ("gas.db", "ev.db", "merged.db"))
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-01", periods=13, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 5 + [4.0] * 4 + [5.0] * 4,
+    })
+    ev_data = pd.DataFrame({"registration_date": ["2023-01-10 00:00:00", "2023-02-10 00:00:00", "2023-03-10 00:00:00"]})
+    for db, table, df in ((gas_db, "gasoline_prices", gas_data), (ev_db, "ev_sales", ev_data)):
+        conn = sqlite3.connect(db)
+        df.to_sql(table, conn, if_exists="replace", index=False)
+        conn.close()
+
+    paths = [str(tmp_path / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+    fetch_and_process_data("2023", "2023", gas_db, ev_db, *paths, merged_db)
+
+    # New registrations arrive in March only
+    conn = sqlite3.connect(ev_db)
+    conn.executemany("INSERT INTO ev_sales VALUES (?)", [("2023-03-20 00:00:00",), ("2023-03-21 00:00:00",)])
+    conn.commit()
+    conn.close()
+    fetch_and_process_data("2023", "2023", gas_db, ev_db, *paths, merged_db, since=pd.Timestamp("2023-03-20"))
+
+    conn = sqlite3.connect(merged_db)
+    result_df = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    assert result_df["volume"].tolist() == [1, 1, 3]
+    assert result_df["price"].tolist() == [3.0, 4.0, 5.0]
+    assert len(pd.read_csv(paths[2])) == 1
+
+def test_merge_keeps_nullable_dtypes(create_mock_data):
+    """Test that merged price/volume stay nullable numeric and survive a CSV round trip."""
+    env = create_mock_data
+    gas_monthly = pd.DataFrame({"timestamp": pd.to_datetime(["2023-01-31", "2023-02-28"]), "price": [3.5, 3.9]})
+    ev_monthly = pd.DataFrame({"timestamp": pd.to_datetime(["2023-02-28", "2023-03-31"]), "volume": [200, 150]})
+
+    merged_data = merge_data(gas_monthly, ev_monthly, str(env["merged_csv"]), str(env["log_file"]))
+
+    assert merged_data["price"].dtype == "Float64"
+    assert merged_data["volume"].dtype == "Int64"
+    assert merged_data["volume"].isna().sum() == 1 and merged_data["price"].isna().sum() == 1
+
+    round_trip = pd.read_csv(env["merged_csv"], parse_dates=["timestamp"], dtype={"price": "Float64", "volume": "Int64"})
+    pd.testing.assert_frame_equal(round_trip, merged_data.reset_index(drop=True))
+
+    with open(env["log_file"], "r") as log:
+        logs = log.read()
+    assert "Gas - 3.5, EV - NIL" in logs
+
+@pytest.mark.parametrize("artifact_format", ["arrow", "parquet"])
+def test_columnar_artifacts_round_trip(create_mock_data, artifact_format):
+    """Test that intermediates are written as typed columnar artifacts and CSV can be skipped."""
+    pytest.importorskip("pyarrow")
+    from data_transform.artifacts import artifact_path, read_artifact
+    env = create_mock_data
+
+    fetch_and_process_data("2023", "2023", str(env["gas_db"]), str(env["ev_db"]), str(env["gas_csv"]), str(env["ev_csv"]),
+                           str(env["merged_csv"]), str(env["log_file"]), str(env["db"]),
+                           artifact_format=artifact_format, csv_export=False)
+
+    assert not os.path.exists(env["merged_csv"])
+    merged = read_artifact(artifact_path(str(env["merged_csv"]), artifact_format))
+    ev_monthly = read_artifact(artifact_path(str(env["ev_csv"]), artifact_format))
+
+    assert pd.api.types.is_datetime64_any_dtype(merged["timestamp"])
+    assert merged["price"].dtype == "Float64"
+    assert merged["volume"].dtype == "Int64"
+    assert ev_monthly["volume"].tolist() == [1, 1, 1]
+
+@pytest.mark.parametrize("single_file", [False, True])
+def test_warehouse_matches_pandas_merge(tmp_path, single_file):
+    """Test that the SQL-side join builds the same merged_data as the pandas merge."""
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-01", periods=13, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 5 + [4.0] * 4 + [5.0] * 4,
+    })
+    ev_data = pd.DataFrame({"registration_date": ["2022-12-31 00:00:00", "2023-01-10 00:00:00", "2023-01-11 00:00:00",
+                                                  "2023-03-10 00:00:00", "2023-05-01 00:00:00"]})
+    gas_db, ev_db = str(tmp_path / "gas.db"), str(tmp_path / "ev.db")
+    warehouse_db = gas_db if single_file else str(tmp_path / "warehouse.db")
+    for db, table, df in ((gas_db, "gasoline_prices", gas_data), (warehouse_db if single_file else ev_db, "ev_sales", ev_data)):
+        conn = sqlite3.connect(db)
+        df.to_sql(table, conn, if_exists="replace", index=False)
+        conn.close()
+    ev_db = warehouse_db if single_file else ev_db
+
+    paths = [str(tmp_path / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+    fetch_and_process_data("2023", "2023", gas_db, ev_db, *paths, str(tmp_path / "merged.db"))
+    conn = sqlite3.connect(tmp_path / "merged.db")
+    expected = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    expected_csv = pd.read_csv(paths[2])
+    with open(paths[3]) as log:
+        expected_log = log.read()
+
+    build_warehouse("2023", "2023", gas_db, ev_db, *paths, warehouse_db)
+    conn = sqlite3.connect(warehouse_db)
+    result = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(pd.read_csv(paths[2]), expected_csv)
+    with open(paths[3]) as log:
+        assert log.read() == expected_log
+    assert result["volume"].tolist() == [2, 1]
+
+def test_warehouse_incremental_upsert(tmp_path):
+    """Test that a warehouse build with `since` upserts only the recomputed months."""
+    gas_db, ev_db, warehouse_db = (str(tmp_path / name) for name in ("gas.db", "ev.db", "warehouse.db"))
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-01", periods=13, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 5 + [4.0] * 4 + [5.0] * 4,
+    })
+    ev_data = pd.DataFrame({"registration_date": ["2023-01-10 00:00:00", "2023-02-10 00:00:00", "2023-03-10 00:00:00"]})
+    for db, table, df in ((gas_db, "gasoline_prices", gas_data), (ev_db, "ev_sales", ev_data)):
+        conn = sqlite3.connect(db)
+        df.to_sql(table, conn, if_exists="replace", index=False)
+        conn.close()
+
+    paths = [str(tmp_path / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+    build_warehouse("2023", "2023", gas_db, ev_db, *paths, warehouse_db)
+    conn = sqlite3.connect(ev_db)
+    conn.executemany("INSERT INTO ev_sales VALUES (?)", [("2023-03-20 00:00:00",), ("2023-03-21 00:00:00",)])
+    conn.commit()
+    conn.close()
+    build_warehouse("2023", "2023", gas_db, ev_db, *paths, warehouse_db, since=pd.Timestamp("2023-03-20"))
+
+    conn = sqlite3.connect(warehouse_db)
+    result_df = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    assert result_df["volume"].tolist() == [1, 1, 3]
+    assert result_df["price"].tolist() == [3.0, 4.0, 5.0]
+    assert len(pd.read_csv(paths[2])) == 1
+
+@pytest.mark.parametrize("pushdown", [False, True])
+def test_compact_ev_layout_matches_legacy(tmp_path, pushdown):
+    """Test that monthly EV counts and the warehouse join read the compact layout like the legacy one."""
+    from data_transform.ev_sales_data import save_to_sqlite
+    ev_data = pd.DataFrame({
+        "registration_date": pd.to_datetime(["2009-12-31", "2010-01-05", "2010-01-20", "2010-03-01", "2011-12-31", "2012-01-01"]),
+        "vehicle_name": list("ABABCA"),
+    })
+    legacy_db, compact_db = str(tmp_path / "legacy.db"), str(tmp_path / "compact.db")
+    save_to_sqlite(ev_data.copy(), legacy_db)
+    save_to_sqlite(ev_data.copy(), compact_db, compact=True)
+
+    expected = load_ev_monthly(legacy_db, "2010", "2011", pushdown=pushdown)
+    result = load_ev_monthly(compact_db, "2010", "2011", pushdown=pushdown)
+    pd.testing.assert_frame_equal(result, expected)
+    since_result = load_ev_monthly(compact_db, "2010", "2011", pushdown=pushdown, since=pd.Timestamp("2010-03-15"))
+    assert since_result["volume"].tolist() == [1, 1]
+
+    gas_db = str(tmp_path / "gas.db")
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2010-01-01", periods=10, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 10,
+    })
+    conn = sqlite3.connect(gas_db)
+    gas_data.to_sql("gasoline_prices", conn, index=False)
+    conn.close()
+    paths = [str(tmp_path / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+    build_warehouse("2010", "2011", gas_db, compact_db, *paths, str(tmp_path / "warehouse.db"))
+    conn = sqlite3.connect(tmp_path / "warehouse.db")
+    merged = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    assert merged["volume"].tolist() == [2, 1]
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_partitioned_ev_store_prunes_years(tmp_path, compact):
+    """Test that year partitions give the same monthly counts while reading only the window's partitions."""
+    from data_transform.ev_sales_data import save_to_sqlite, save_to_partitions
+    from data_transform.ev_partitions import ev_source_sql
+    ev_data = pd.DataFrame({
+        "registration_date": pd.to_datetime(["2009-12-31", "2010-01-05", "2010-01-20", "2010-03-01", "2011-12-31", "2012-01-01"]),
+        "vehicle_name": list("ABABCA"),
+    })
+    single_db, partitioned_db = str(tmp_path / "single.db"), str(tmp_path / "partitioned.db")
+    save_to_sqlite(ev_data.copy(), single_db, compact=compact)
+    save_to_partitions(ev_data.copy(), partitioned_db, compact=compact)
+
+    for pushdown in (False, True):
+        expected = load_ev_monthly(single_db, "2010", "2011", pushdown=pushdown)
+        pd.testing.assert_frame_equal(load_ev_monthly(partitioned_db, "2010", "2011", pushdown=pushdown), expected)
+    conn = sqlite3.connect(partitioned_db)
+    assert ev_source_sql(conn, "2010", "2010") == "main.ev_sales_2010"
+    assert "ev_sales_2009" not in ev_source_sql(conn, "2010", "2012")
+    assert "ev_sales_2010" not in ev_source_sql(conn, "2010", "2012", since=pd.Timestamp("2011-06-01"))
+    conn.close()
+
+    gas_db = str(tmp_path / "gas.db")
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2010-01-01", periods=10, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 10,
+    })
+    conn = sqlite3.connect(gas_db)
+    gas_data.to_sql("gasoline_prices", conn, index=False)
+    conn.close()
+    paths = [str(tmp_path / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+    build_warehouse("2010", "2011", gas_db, partitioned_db, *paths, str(tmp_path / "warehouse.db"))
+    conn = sqlite3.connect(tmp_path / "warehouse.db")
+    merged = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    assert merged["volume"].tolist() == [2, 1]
+
+def read_quality_report(report_path):
+    """Return the issues and the summaries (without their timestamps) of a JSON Lines or SQLite report."""
+    if report_path.endswith(".jsonl"):
+        lines = [json.loads(line) for line in open(report_path)]
+        issues = [line for line in lines if "summary" not in line]
+        summaries = [line["summary"] for line in lines if "summary" in line]
+    else:
+        conn = sqlite3.connect(report_path)
+        issues = pd.read_sql_query('SELECT * FROM quality_issues ORDER BY "check", timestamp', conn).to_dict("records")
+        summaries = pd.read_sql_query('SELECT * FROM quality_summary ORDER BY "check"', conn).to_dict("records")
+        conn.close()
+    return pd.DataFrame(issues), pd.DataFrame(summaries).drop(columns="generated_at")
+
+@pytest.mark.parametrize("warehouse", [False, True])
+@pytest.mark.parametrize("report_name", ["report.jsonl", "report.db"])
+def test_incremental_merge_keeps_full_history_logs(tmp_path, warehouse, report_name):
+    """Test that a `since` merge leaves the same log and quality report as a full rebuild of the same data."""
+    # Weekly gaps in January and April; EV registrations are missing for February and May
+    timestamps = pd.date_range("2023-01-01", periods=26, freq="7D").delete([2, 15])
+    gas_data = pd.DataFrame({"timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"), "price": np.linspace(3.0, 4.0, len(timestamps))})
+    ev_data = pd.DataFrame({"registration_date": ["2023-01-10 00:00:00", "2023-03-10 00:00:00", "2023-04-10 00:00:00", "2023-06-10 00:00:00"]})
+    cutoff = "2023-03-20 00:00:00"
+
+    def build(directory, since=None, rows=None):
+        directory.mkdir(exist_ok=True)
+        gas_db, ev_db = str(directory / "gas.db"), str(directory / "ev.db")
+        for db, table, df, column in ((gas_db, "gasoline_prices", gas_data, "timestamp"), (ev_db, "ev_sales", ev_data, "registration_date")):
+            conn = sqlite3.connect(db)
+            (df if rows is None else df[df[column] < rows]).to_sql(table, conn, if_exists="replace", index=False)
+            conn.close()
+        paths = [str(directory / name) for name in ("gas.csv", "ev.csv", "merged.csv", "log.txt")]
+        report_path = str(directory / report_name)
+        merged_db = str(directory / "merged.db")
+        if warehouse:
+            build_warehouse("2023", "2023", gas_db, ev_db, *paths, merged_db, report_path=report_path, since=since)
+        else:
+            fetch_and_process_data("2023", "2023", gas_db, ev_db, *paths, merged_db, report_path=report_path, since=since)
+        return paths[3], report_path
+
+    build(tmp_path / "incremental", rows=cutoff)
+    log_file, report_path = build(tmp_path / "incremental", since=pd.Timestamp(cutoff))
+    expected_log_file, expected_report_path = build(tmp_path / "full")
+
+    with open(log_file) as log, open(expected_log_file) as expected_log:
+        assert log.read() == expected_log.read()
+    issues, summaries = read_quality_report(report_path)
+    expected_issues, expected_summaries = read_quality_report(expected_report_path)
+    pd.testing.assert_frame_equal(issues, expected_issues)
+    pd.testing.assert_frame_equal(summaries, expected_summaries)
+    assert summaries["issue_count"].tolist() == [2, 2]
@@ -0,0 +1,95 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from data_transform.ev_sales_data import fetch_and_preprocess_ev_sales
+from data_transform.ev_schema import read_ev_sales
+from data_transform.ev_cube import has_cube, rollup, rollup_query
+from data_transform.pre_process import load_ev_monthly
+
+def registrations(rows, start, days, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+    return pd.DataFrame({
+        "Registration Valid Date": dates.strftime("%Y-%m-%d"),
+        "Vehicle Name": rng.choice(["MODEL 3", "LEAF", "BOLT", "I3"], rows),
+    })
+
+def expected_counts(db_path, freq):
+    """Reference counts from the raw registration rows."""
+    conn = sqlite3.connect(db_path)
+    df = read_ev_sales(conn)
+    conn.close()
+    period = df["registration_date"].dt.to_period(freq).astype(str)
+    return df.groupby([period, df["vehicle_name"].astype(str)]).size()
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a registrations CSV spanning three years."""
+    csv_path = tmp_path / "ev.csv"
+    registrations(400, "2021-01-01", 3 * 365, seed=1).to_csv(csv_path, index=False)
+    return csv_path, tmp_path / "ev.sqlite"
+
+@pytest.mark.parametrize("compact, partitioned, chunksize", [(False, False, None), (True, False, 150), (True, True, None)])
+def test_cube_matches_raw_rows_incrementally(setup_environment, compact, partitioned, chunksize):
+    """Test that the cube equals raw counts after a full load and after an incremental drop."""
+    csv_path, db_path = setup_environment
+    options = dict(chunksize=chunksize, compact=compact, partitioned=partitioned, cube=True)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), **options)
+
+    # The next drop repeats the old rows and adds registrations from mid-2023 on
+    new_rows = registrations(100, "2023-07-01", 365, seed=2)
+    pd.concat([pd.read_csv(csv_path), new_rows]).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), incremental=True, **options)
+
+    monthly = rollup(str(db_path), by=("vehicle_name",)).set_index(["period", "vehicle_name"])["registrations"]
+    expected = expected_counts(db_path, "M")
+    pd.testing.assert_series_equal(monthly, expected, check_names=False, check_index_type=False)
+
+    quarterly = rollup(str(db_path), granularity="quarter").set_index("period")["registrations"]
+    expected_quarters = expected_counts(db_path, "Q").groupby(level=0).sum()
+    expected_quarters.index = expected_quarters.index.str.replace("Q", "-Q")
+    pd.testing.assert_series_equal(quarterly, expected_quarters, check_names=False)
+
+    yearly = rollup(str(db_path), granularity="year", filters={"vehicle_name": "LEAF"}, from_month="2022-01", to_month="2023-12")
+    assert yearly["period"].tolist() == ["2022", "2023"]
+    assert yearly["registrations"].tolist() == expected_counts(db_path, "Y").xs("LEAF", level=1).loc[["2022", "2023"]].tolist()
+
+def test_monthly_volume_read_from_cube(setup_environment):
+    """Test that the pushdown loader sums cube cells and matches counting the registrations."""
+    csv_path, db_path = setup_environment
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), compact=True)
+    expected = load_ev_monthly(str(db_path), "2021", "2022", pushdown=True, since=pd.Timestamp("2021-05-20"))
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), compact=True, cube=True)
+    result = load_ev_monthly(str(db_path), "2021", "2022", pushdown=True, since=pd.Timestamp("2021-05-20"))
+    pd.testing.assert_frame_equal(result, expected)
+    assert result["timestamp"].min() == pd.Timestamp("2021-05-31")
+
+def test_rollup_rejects_unknown_dimensions():
+    """Test that roll-ups only accept the cube's granularities and dimensions."""
+    with pytest.raises(ValueError):
+        rollup_query("week")
+    with pytest.raises(ValueError):
+        rollup_query(by=("county",))
+
+@pytest.mark.parametrize("incremental, partitioned", [(False, False), (True, False), (False, True)])
+def test_load_without_cube_drops_it(setup_environment, incremental, partitioned):
+    """Test that a load with the cube turned off drops the cube instead of leaving stale counts behind."""
+    csv_path, db_path = setup_environment
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), compact=True, partitioned=partitioned, cube=True)
+    new_rows = registrations(50, "2023-12-01", 60, seed=3)
+    pd.concat([pd.read_csv(csv_path), new_rows]).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), compact=True, partitioned=partitioned, incremental=incremental)
+
+    conn = sqlite3.connect(db_path)
+    assert not has_cube(conn)
+    registrations_2023 = len(read_ev_sales(conn).query("registration_date.dt.year == 2023"))
+    conn.close()
+    monthly = load_ev_monthly(str(db_path), "2023", "2023", pushdown=True)
+    assert monthly["volume"].sum() == registrations_2023
@@ -8,6 +8,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 from data_transform.ev_sales_data import fetch_and_preprocess_ev_sales, preprocess_ev_sales_data, save_to_sqlite
+from data_transform.ev_schema import read_ev_sales
 
 @pytest.fixture
 def setup_environment(tmp_path):
@@ -109,3 +110,209 @@ def test_save_to_nonexistent_directory(setup_environment):
     conn.close()
 
     assert len(result_df) == 5, "Expected 5 rows in the database."
+
+def test_chunked_ingestion_matches_full_load(setup_environment, tmp_path):
+    """Test that chunked ingestion stores the same rows as the in-memory path."""
+    csv_path, db_path = setup_environment
+    data = {
+        "Registration Valid Date": ["2023-01-01", "InvalidDate", "2023-02-15", None, "2023-03-01", "2023-03-20", "2023-04-02"],
+        "Vehicle Name": ["Car A", "Car B", "Car C", "Car D", None, "Car F", "Car G"],
+        "Unused Column": list(range(7)),
+    }
+    pd.DataFrame(data).to_csv(csv_path, index=False)
+
+    full_db_path = tmp_path / "full.sqlite"
+    fetch_and_preprocess_ev_sales(str(csv_path), str(full_db_path))
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=2)
+
+    conn = sqlite3.connect(full_db_path)
+    expected_df = pd.read_sql_query("SELECT registration_date, vehicle_name FROM ev_sales", conn)
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    result_df = pd.read_sql_query("SELECT * FROM ev_sales", conn)
+    conn.close()
+
+    assert list(result_df.columns) == ["registration_date", "vehicle_name"]
+    pd.testing.assert_frame_equal(result_df, expected_df)
+
+def test_chunked_ingestion_missing_columns(setup_environment):
+    """Test that chunked ingestion validates the header before reading."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({"Invalid Column": [1, 2, 3]}).to_csv(csv_path, index=False)
+
+    with pytest.raises(ValueError, match="The expected columns .* are missing from the CSV file"):
+        fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=2)
+
+@pytest.mark.parametrize("chunksize", [None, 2])
+def test_incremental_ingestion_appends_new_rows(setup_environment, chunksize):
+    """Test that incremental ingestion keeps old rows and appends only newer registrations."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize)
+
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01", "2023-03-01", "2023-04-01"],
+        "Vehicle Name": ["Car A", "Car B", "Car C", "Car D"],
+    }).to_csv(csv_path, index=False)
+    earliest = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, incremental=True)
+
+    conn = sqlite3.connect(db_path)
+    result_df = pd.read_sql_query("SELECT * FROM ev_sales ORDER BY registration_date", conn)
+    conn.close()
+
+    assert earliest == pd.Timestamp("2023-03-01")
+    assert result_df["vehicle_name"].tolist() == ["Car A", "Car B", "Car C", "Car D"]
+
+@pytest.mark.parametrize("chunksize, compact", [(None, False), (2, False), (2, True)])
+def test_incremental_ingestion_keeps_late_rows_for_watermark_day(setup_environment, chunksize, compact):
+    """Test that registrations arriving late for the watermark's own day are appended once."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, compact=compact)
+
+    # A second Car B and a Car E were registered on 2023-02-01 after it was loaded
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01", "2023-02-01", "2023-02-01", "2023-03-01"],
+        "Vehicle Name": ["Car A", "Car B", "Car B", "Car E", "Car C"],
+    }).to_csv(csv_path, index=False)
+    earliest = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, incremental=True, compact=compact)
+    rerun = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, incremental=True, compact=compact)
+
+    conn = sqlite3.connect(db_path)
+    result_df = read_ev_sales(conn).sort_values(["registration_date", "vehicle_name"])
+    conn.close()
+
+    assert earliest == pd.Timestamp("2023-02-01")
+    assert rerun is None
+    assert result_df["vehicle_name"].astype(str).tolist() == ["Car A", "Car B", "Car B", "Car E", "Car C"]
+
+@pytest.mark.parametrize("chunksize, partitioned", [(None, False), (2, False), (2, True)])
+def test_rebuild_from_empty_input_resets_watermark(setup_environment, chunksize, partitioned):
+    """Test that a full rebuild that stores nothing does not leave the old high-water mark behind."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, partitioned=partitioned)
+
+    pd.DataFrame({"Registration Valid Date": [], "Vehicle Name": []}).to_csv(csv_path, index=False)
+    assert fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, partitioned=partitioned) is None
+
+    pd.DataFrame({
+        "Registration Valid Date": ["2022-05-01", "2022-06-01"],
+        "Vehicle Name": ["Car C", "Car D"],
+    }).to_csv(csv_path, index=False)
+    earliest = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, incremental=True, partitioned=partitioned)
+
+    conn = sqlite3.connect(db_path)
+    result_df = read_ev_sales(conn).sort_values("registration_date")
+    conn.close()
+
+    assert earliest == pd.Timestamp("2022-05-01")
+    assert result_df["vehicle_name"].astype(str).tolist() == ["Car C", "Car D"]
+
+@pytest.mark.parametrize("chunksize", [None, 2])
+def test_compact_schema_round_trip(setup_environment, tmp_path, chunksize):
+    """Test that the dictionary-encoded layout stores and reloads the same registrations."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "InvalidDate", "2023-02-15", "2023-03-01", "2023-03-20"],
+        "Vehicle Name": ["Car A", "Car B", "Car A", "Car C", "Car A"],
+    }).to_csv(csv_path, index=False)
+
+    legacy_db_path = tmp_path / "legacy.sqlite"
+    fetch_and_preprocess_ev_sales(str(csv_path), str(legacy_db_path), chunksize=chunksize)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, compact=True)
+
+    conn = sqlite3.connect(db_path)
+    stored = pd.read_sql_query("SELECT * FROM ev_sales", conn)
+    vehicles = pd.read_sql_query("SELECT * FROM vehicles", conn)
+    result_df = read_ev_sales(conn)
+    conn.close()
+    conn = sqlite3.connect(legacy_db_path)
+    expected_df = read_ev_sales(conn)
+    conn.close()
+
+    assert list(stored.columns) == ["registration_day", "vehicle_id"]
+    assert stored["registration_day"].tolist()[0] == 19358
+    assert sorted(vehicles["vehicle_name"]) == ["Car A", "Car C"]
+    assert result_df["vehicle_name"].dtype == "category"
+    pd.testing.assert_frame_equal(result_df.astype({"vehicle_name": str}), expected_df.astype({"vehicle_name": str}))
+
+def test_compact_incremental_rebuilds_legacy_table(setup_environment):
+    """Test that an incremental compact load over a legacy table rebuilds it, then appends new rows."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=2)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=2, incremental=True, compact=True)
+
+    pd.DataFrame({
+        "Registration Valid Date": ["2023-01-01", "2023-02-01", "2023-03-01"],
+        "Vehicle Name": ["Car A", "Car B", "Car A"],
+    }).to_csv(csv_path, index=False)
+    earliest = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=2, incremental=True, compact=True)
+
+    conn = sqlite3.connect(db_path)
+    result_df = read_ev_sales(conn).sort_values("registration_date")
+    vehicle_count = conn.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0]
+    conn.close()
+
+    assert earliest == pd.Timestamp("2023-03-01")
+    assert result_df["vehicle_name"].tolist() == ["Car A", "Car B", "Car A"]
+    assert vehicle_count == 2
+
+@pytest.mark.parametrize("chunksize, compact", [(None, False), (2, False), (2, True)])
+def test_partitioned_store_rewrites_only_latest_year(setup_environment, chunksize, compact):
+    """Test that an incremental drop into the year partitions leaves the closed years untouched."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2021-05-01", "2022-01-10", "2022-06-01", "InvalidDate", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B", "Car A", "Car C", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, compact=compact, partitioned=True)
+
+    # The new drop corrects 2022 (ignored: closed year) and adds rows to 2023 and 2024
+    pd.DataFrame({
+        "Registration Valid Date": ["2021-05-01", "2022-01-10", "2023-02-01", "2023-07-01", "2024-01-03"],
+        "Vehicle Name": ["Car A", "Car B", "Car B", "Car D", "Car A"],
+    }).to_csv(csv_path, index=False)
+    earliest = fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), chunksize=chunksize, incremental=True,
+                                             compact=compact, partitioned=True)
+
+    conn = sqlite3.connect(db_path)
+    catalog = pd.read_sql_query("SELECT year, table_name, row_count, min_date, max_date FROM ev_partitions ORDER BY year", conn)
+    result_df = read_ev_sales(conn).sort_values("registration_date")
+    conn.close()
+
+    assert earliest == pd.Timestamp("2023-02-01")
+    assert catalog["year"].tolist() == [2021, 2022, 2023, 2024]
+    assert catalog["table_name"].tolist() == ["ev_sales_2021", "ev_sales_2022", "ev_sales_2023", "ev_sales_2024"]
+    assert catalog["row_count"].tolist() == [1, 2, 2, 1]
+    assert catalog["max_date"].str[:10].tolist() == ["2021-05-01", "2022-06-01", "2023-07-01", "2024-01-03"]
+    assert result_df["vehicle_name"].astype(str).tolist() == ["Car A", "Car B", "Car A", "Car B", "Car D", "Car A"]
+
+def test_unpartitioned_load_replaces_partitions(setup_environment):
+    """Test switching a partitioned store back to a single ev_sales table."""
+    csv_path, db_path = setup_environment
+    pd.DataFrame({
+        "Registration Valid Date": ["2022-01-10", "2023-02-01"],
+        "Vehicle Name": ["Car A", "Car B"],
+    }).to_csv(csv_path, index=False)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), partitioned=True)
+    fetch_and_preprocess_ev_sales(str(csv_path), str(db_path), incremental=True)
+
+    conn = sqlite3.connect(db_path)
+    tables = {row[0]: row[1] for row in conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')")}
+    conn.close()
+    assert tables["ev_sales"] == "table"
+    assert not any(name.startswith("ev_sales_") or name == "ev_partitions" for name in tables)
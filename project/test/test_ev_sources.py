@@ -0,0 +1,82 @@
+import os
+import pytest
+import sqlite3
+import pandas as pd
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import main
+from data_transform.ev_sources import load_sources, fan_out_sources, reduce_source_volumes
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup two EV source CSVs with different headers and a gas price database."""
+    pd.DataFrame({
+        "Registration Valid Date": ["2022-12-31", "2023-01-05", "2023-01-20", "bad", "2023-03-01"],
+        "Vehicle Name": ["Car A", "Car B", "Car A", "Car C", "Car B"],
+    }).to_csv(tmp_path / "raw_ev_sales_wa.csv", index=False)
+    pd.DataFrame({
+        "Model": ["X", "Y", "X"],
+        "Registered": ["2023-01-02", "2023-02-14", "2023-02-15"],
+        "County": ["A", "B", "C"],
+    }).to_csv(tmp_path / "oregon.csv", index=False)
+
+    gas_data = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-01", periods=13, freq="7D").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0] * 5 + [4.0] * 4 + [5.0] * 4,
+    })
+    conn = sqlite3.connect(tmp_path / "gas.db")
+    gas_data.to_sql("gasoline_prices", conn, index=False)
+    conn.close()
+
+    config = {
+        "settings": {
+            "data_dir": str(tmp_path), "gas_data_file": "raw_Gas.xls", "ev_sales_data_file": "raw_ev_sales.csv",
+            "gas_db_file": "gas.db", "ev_sales_db_file": "ev.db", "gas_output_csv_file": "gas.csv",
+            "ev_output_csv_file": "ev.csv", "merged_output_csv_file": "merged.csv", "log_file": "log.txt",
+            "sep_log_file": "sep_log.txt", "merged_db_file": "merged.db", "from_yr": "2023", "to_yr": "2023",
+            "ev_source_workers": 2, "ev_chunksize": 2,
+        },
+        "ev_sources": [
+            {"name": "wa"},
+            {"name": "or", "file": "oregon.csv", "columns": {"registration_date": "Registered", "vehicle_name": "Model"}},
+        ],
+    }
+    return config, tmp_path
+
+def test_sources_reduced_per_month(setup_environment):
+    """Test that every source is aggregated in a worker and reduced into total and per-source volumes."""
+    config, tmp_path = setup_environment
+    sources = load_sources(config, str(tmp_path))
+    assert [source["path"] for source in sources] == [str(tmp_path / "raw_ev_sales_wa.csv"), str(tmp_path / "oregon.csv")]
+
+    volumes = fan_out_sources(sources, "2023", "2023", max_workers=2, chunksize=2)
+    reduced = reduce_source_volumes(volumes)
+
+    assert list(reduced.columns) == ["timestamp", "volume", "volume_wa", "volume_or"]
+    assert reduced["timestamp"].tolist() == list(pd.to_datetime(["2023-01-31", "2023-02-28", "2023-03-31"]))
+    assert reduced["volume_wa"].tolist() == [2, 0, 1]
+    assert reduced["volume_or"].tolist() == [1, 2, 0]
+    assert reduced["volume"].tolist() == [3, 2, 1]
+
+def test_merge_breaks_out_volume_per_source(setup_environment):
+    """Test that the merge stage writes per-source volume columns into merged_data."""
+    config, tmp_path = setup_environment
+    paths = main.resolve_paths(config)
+    main.merge_for_analysis(config, paths)
+
+    conn = sqlite3.connect(paths["merged_db"])
+    merged = pd.read_sql_query("SELECT * FROM merged_data ORDER BY timestamp", conn)
+    conn.close()
+    assert list(merged.columns) == ["timestamp", "price", "volume", "volume_wa", "volume_or"]
+    assert merged["volume"].tolist() == [3, 2, 1]
+    assert merged["volume_or"].tolist() == [1, 2, 0]
+
+def test_invalid_source_name(setup_environment):
+    """Test that source names must be usable as column suffixes."""
+    config, tmp_path = setup_environment
+    config["ev_sources"].append({"name": "New Mexico"})
+    with pytest.raises(ValueError):
+        load_sources(config, str(tmp_path))
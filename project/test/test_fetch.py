@@ -6,7 +6,7 @@ from requests.exceptions import Timeout, ConnectionError, HTTPError, RequestExce
 
 # Add the parent directory to sys.path to import fetch_data_from_url
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
-from data_process.fetch_data import fetch_data_from_url, download_file
+from data_process.fetch_data import fetch_data_from_url, download_file, new_session
 
 import requests
  
@@ -97,3 +97,174 @@ def test_general_request_exception(setup_test_environment, monkeypatch):
     # Assert general request exception is raised
     with pytest.raises(requests.exceptions.RequestException):
         fetch_data_from_url(test_url, str(test_file_path))
+
+class MockStreamResponse:
+    """Minimal stand-in for a streamed requests.Response."""
+
+    def __init__(self, status_code, chunks, fail_after=None, headers=None):
+        self.status_code = status_code
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size=1):
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and i == self.fail_after:
+                raise requests.exceptions.ConnectionError("Mocked dropped connection")
+            yield chunk
+
+def test_stream_download_writes_chunks(setup_test_environment, monkeypatch):
+    """Test that a streamed download writes every chunk and leaves no partial file."""
+    test_file_path = setup_test_environment
+
+    def mock_request_get(*args, **kwargs):
+        assert kwargs.get("stream") is True
+        return MockStreamResponse(200, [b"a,b\n", b"1,2\n", b"3,4\n"])
+
+    monkeypatch.setattr("requests.get", mock_request_get)
+
+    fetch_data_from_url("https://www.example.com/data.csv", str(test_file_path), stream=True)
+
+    assert test_file_path.read_bytes() == b"a,b\n1,2\n3,4\n"
+    assert not os.path.exists(f"{test_file_path}.part")
+
+def test_stream_download_resumes_with_range(setup_test_environment, monkeypatch):
+    """Test that an interrupted streamed download resumes from the partial file."""
+    test_file_path = setup_test_environment
+    seen_headers = []
+
+    def mock_request_get(*args, **kwargs):
+        headers = kwargs.get("headers") or {}
+        seen_headers.append(headers)
+        if "Range" not in headers:
+            return MockStreamResponse(200, [b"first-", b"never"], fail_after=1, headers={"ETag": '"v1"'})
+        return MockStreamResponse(206, [b"second"])
+
+    monkeypatch.setattr("requests.get", mock_request_get)
+
+    download_file("https://www.example.com/data.csv", str(test_file_path), stream=True)
+
+    assert seen_headers[1] == {"Range": "bytes=6-", "If-Range": '"v1"'}
+    assert test_file_path.read_bytes() == b"first-second"
+    assert os.listdir(test_file_path.parent) == [test_file_path.name]
+
+def test_stale_partial_download_is_not_spliced(setup_test_environment, monkeypatch):
+    """Test that leftover partial files are only resumed against a validator and only accepted when complete."""
+    test_file_path = setup_test_environment
+    part_path = f"{test_file_path}.part"
+    url = "https://www.example.com/data.csv"
+    seen_headers = []
+
+    def mock_request_get(*args, **kwargs):
+        headers = kwargs.get("headers") or {}
+        seen_headers.append(headers)
+        if headers.get("If-Range") == '"v1"':
+            # The resource changed since the partial file was written: full body
+            return MockStreamResponse(200, [b"new,body\n"], headers={"ETag": '"v2"'})
+        if headers.get("If-Range") == '"v2"':
+            return MockStreamResponse(416, [], headers={"Content-Range": "bytes */100"})
+        return MockStreamResponse(200, [b"fresh\n"], headers={"ETag": '"v3"'})
+
+    monkeypatch.setattr("requests.get", mock_request_get)
+
+    # A partial file without a validator is never resumed
+    with open(part_path, "wb") as part:
+        part.write(b"old,")
+    download_file(url, str(test_file_path), stream=True)
+    assert "Range" not in seen_headers[-1]
+    assert test_file_path.read_bytes() == b"fresh\n"
+
+    # A changed resource replaces the stale bytes instead of being appended to them
+    with open(part_path, "wb") as part:
+        part.write(b"old,")
+    with open(f"{part_path}.meta.json", "w") as meta:
+        meta.write(f'{{"url": "{url}", "validator": "\\"v1\\""}}')
+    download_file(url, str(test_file_path), stream=True)
+    assert seen_headers[-1] == {"Range": "bytes=4-", "If-Range": '"v1"'}
+    assert test_file_path.read_bytes() == b"new,body\n"
+
+    # A 416 whose length does not match the partial file restarts the download
+    with open(part_path, "wb") as part:
+        part.write(b"old,")
+    with open(f"{part_path}.meta.json", "w") as meta:
+        meta.write(f'{{"url": "{url}", "validator": "\\"v2\\""}}')
+    download_file(url, str(test_file_path), stream=True)
+    assert "Range" not in seen_headers[-1]
+    assert test_file_path.read_bytes() == b"fresh\n"
+    assert not os.path.exists(part_path)
+
+def test_conditional_get_skips_unchanged_file(setup_test_environment, monkeypatch):
+    """Test that cached validators are sent back and a 304 keeps the local file."""
+    test_file_path = setup_test_environment
+    seen_headers = []
+
+    def mock_request_get(*args, **kwargs):
+        headers = kwargs.get("headers") or {}
+        seen_headers.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return MockStreamResponse(304, [])
+        return MockStreamResponse(200, [b"a,b\n1,2\n"], headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr("requests.get", mock_request_get)
+
+    url = "https://www.example.com/data.csv"
+    assert fetch_data_from_url(url, str(test_file_path), stream=True, use_cache=True) is True
+    assert os.path.exists(f"{test_file_path}.meta.json")
+
+    assert fetch_data_from_url(url, str(test_file_path), stream=True, use_cache=True) is False
+    assert seen_headers[1] == {"If-None-Match": '"v1"'}
+    assert test_file_path.read_bytes() == b"a,b\n1,2\n"
+
+def test_downloads_use_shared_session(setup_test_environment, monkeypatch):
+    """Test that a passed session serves the download instead of requests.get."""
+    test_file_path = setup_test_environment
+    session = new_session(pool_size=2)
+    calls = []
+
+    def mock_session_get(url, **kwargs):
+        calls.append(kwargs.get("stream", False))
+        return MockStreamResponse(200, [b"a,b\n", b"1,2\n"])
+
+    monkeypatch.setattr(session, "get", mock_session_get)
+    monkeypatch.setattr("requests.get", lambda *args, **kwargs: pytest.fail("requests.get used"))
+
+    assert fetch_data_from_url("https://www.example.com/data.csv", str(test_file_path), stream=True, session=session) is True
+    assert test_file_path.read_bytes() == b"a,b\n1,2\n"
+    assert calls == [True]
+    assert session.get_adapter("https://www.example.com")._pool_maxsize == 2
+
+def test_resumed_download_keeps_cache_validators(setup_test_environment, monkeypatch):
+    """Test that a download resumed from an earlier run still records its ETag for the next conditional GET."""
+    test_file_path = setup_test_environment
+    url = "https://www.example.com/data.csv"
+    seen_headers = []
+
+    def interrupted_get(*args, **kwargs):
+        return MockStreamResponse(200, [b"first-", b"never"], fail_after=1, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr("requests.get", interrupted_get)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        download_file(url, str(test_file_path), stream=True, max_retries=0, use_cache=True)
+
+    def mock_request_get(*args, **kwargs):
+        headers = kwargs.get("headers") or {}
+        seen_headers.append(headers)
+        if headers.get("If-None-Match") == '"v1"' and "Range" not in headers:
+            return MockStreamResponse(304, [])
+        return MockStreamResponse(206, [b"second"])
+
+    monkeypatch.setattr("requests.get", mock_request_get)
+    assert download_file(url, str(test_file_path), stream=True, use_cache=True) is True
+    assert test_file_path.read_bytes() == b"first-second"
+    assert download_file(url, str(test_file_path), stream=True, use_cache=True) is False
+    assert seen_headers[-1] == {"If-None-Match": '"v1"'}
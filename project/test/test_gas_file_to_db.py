@@ -106,4 +106,121 @@ def test_transform_and_store_permission_error(setup_environment, monkeypatch):
     with pytest.raises(PermissionError, match="No write permissions"):
         transform_and_store_data(df, str(db_path))
 
- 
\ No newline at end of file
+ 
+def test_transform_and_store_incremental(setup_environment):
+    """Test that incremental mode appends only rows past the high-water mark."""
+    db_path = setup_environment
+    column = "Weekly U.S. All Grades All Formulations Retail Gasoline Prices  (Dollars per Gallon)"
+
+    first = pd.DataFrame({"Date": pd.date_range(start="2023-01-01", periods=3, freq="W"), column: [3.5, 3.6, 3.7]})
+    transform_and_store_data(first, str(db_path))
+
+    # Second drop overlaps the first by two weeks
+    second = pd.DataFrame({"Date": pd.date_range(start="2023-01-08", periods=4, freq="W"), column: [9.9, 9.9, 3.8, 3.9]})
+    earliest = transform_and_store_data(second, str(db_path), incremental=True)
+
+    conn = sqlite3.connect(db_path)
+    result_df = pd.read_sql_query("SELECT * FROM gasoline_prices ORDER BY timestamp", conn)
+    watermark = conn.execute("SELECT high_water_mark FROM etl_watermarks WHERE table_name = 'gasoline_prices'").fetchone()[0]
+    conn.close()
+
+    assert earliest == pd.Timestamp("2023-01-22")
+    assert result_df["price"].tolist() == [3.5, 3.6, 3.7, 3.8, 3.9]
+    assert watermark == "2023-01-29 00:00:00"
+    assert transform_and_store_data(second, str(db_path), incremental=True) is None
+
+def test_rebuild_from_empty_input_resets_watermark(setup_environment):
+    """Test that a full rebuild that stores nothing does not leave the old high-water mark behind."""
+    db_path = setup_environment
+    column = "Weekly U.S. All Grades All Formulations Retail Gasoline Prices  (Dollars per Gallon)"
+
+    transform_and_store_data(pd.DataFrame({"Date": pd.date_range(start="2023-01-01", periods=3, freq="W"), column: [3.5, 3.6, 3.7]}), str(db_path))
+    empty = pd.DataFrame({"Date": pd.Series(dtype="datetime64[ns]"), column: pd.Series(dtype=float)})
+    assert transform_and_store_data(empty, str(db_path)) is None
+
+    older = pd.DataFrame({"Date": pd.date_range(start="2022-01-02", periods=2, freq="W"), column: [3.1, 3.2]})
+    earliest = transform_and_store_data(older, str(db_path), incremental=True)
+
+    conn = sqlite3.connect(db_path)
+    result_df = pd.read_sql_query("SELECT * FROM gasoline_prices ORDER BY timestamp", conn)
+    conn.close()
+
+    assert earliest == pd.Timestamp("2022-01-02")
+    assert result_df["price"].tolist() == [3.1, 3.2]
+
+def test_read_gas_workbook_uses_parsed_sidecar(tmp_path, monkeypatch):
+    """Test that the workbook is streamed once and re-runs load the hashed sidecar."""
+    openpyxl = pytest.importorskip("openpyxl")
+    import data_transform.gas_source as gas_source
+    column = "Weekly U.S. All Grades All Formulations Retail Gasoline Prices  (Dollars per Gallon)"
+
+    workbook_path = tmp_path / "raw_Gas.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data 1"
+    sheet.append(["Back to Contents", "Data 1: Weekly Prices"])
+    sheet.append(["Sourcekey", "EMM_EPM0_PTE_NUS_DPG"])
+    sheet.append(["Date", column, "Unused"])
+    for i, day in enumerate(pd.date_range(start="2023-01-01", periods=5, freq="W")):
+        sheet.append([day.to_pydatetime(), 3.5 + i / 10, "x"])
+    workbook.save(workbook_path)
+
+    df = gas_source.read_gas_workbook(str(workbook_path))
+    assert list(df.columns) == ["Date", column]
+    assert len(df) == 5
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("The workbook should not be parsed again.")
+
+    monkeypatch.setattr(gas_source, "stream_gas_columns", fail_parse)
+    cached_df = gas_source.read_gas_workbook(str(workbook_path))
+    pd.testing.assert_frame_equal(cached_df, df)
+
+    transform_and_store_data(cached_df, str(tmp_path / "gas.db"))
+    conn = sqlite3.connect(tmp_path / "gas.db")
+    assert conn.execute("SELECT COUNT(*) FROM gasoline_prices").fetchone()[0] == 5
+    conn.close()
+
+def test_stream_gas_columns_reads_xls_sheet_on_demand(tmp_path, monkeypatch):
+    """Test that legacy .xls workbooks are read through xlrd's on-demand loader, two cells per row."""
+    xlrd = pytest.importorskip("xlrd")
+    from xlrd.sheet import Cell
+    import data_transform.gas_source as gas_source
+    column = "Weekly U.S. All Grades All Formulations Retail Gasoline Prices  (Dollars per Gallon)"
+    rows = [
+        [Cell(xlrd.XL_CELL_TEXT, "Back to Contents")],
+        [Cell(xlrd.XL_CELL_TEXT, "Sourcekey"), Cell(xlrd.XL_CELL_TEXT, "EMM_EPM0_PTE_NUS_DPG")],
+        [Cell(xlrd.XL_CELL_TEXT, "Date"), Cell(xlrd.XL_CELL_TEXT, column)],
+        [Cell(xlrd.XL_CELL_DATE, 44927.0), Cell(xlrd.XL_CELL_NUMBER, 3.5)],
+        [Cell(xlrd.XL_CELL_DATE, 44934.0), Cell(xlrd.XL_CELL_EMPTY, "")],
+        [Cell(xlrd.XL_CELL_DATE, 44941.0)],
+    ]
+    opened = []
+
+    class FakeSheet:
+        nrows = len(rows)
+
+        def row_slice(self, rowx, start_colx=0, end_colx=None):
+            return rows[rowx][start_colx:end_colx]
+
+    class FakeBook:
+        datemode = 0
+
+        def sheet_by_name(self, name):
+            assert name == "Data 1"
+            return FakeSheet()
+
+        def release_resources(self):
+            opened.append("released")
+
+    def open_workbook(path, on_demand=False):
+        opened.append(on_demand)
+        return FakeBook()
+
+    monkeypatch.setattr(xlrd, "open_workbook", open_workbook)
+    df = gas_source.stream_gas_columns(str(tmp_path / "raw_Gas.xls"))
+
+    assert opened == [True, "released"]
+    assert list(df.columns) == ["Date", column]
+    assert df["Date"].tolist() == list(pd.to_datetime(["2023-01-01", "2023-01-08", "2023-01-15"]))
+    assert df[column].iloc[0] == 3.5 and df[column].iloc[1:].isna().all()
@@ -0,0 +1,129 @@
+import os
+import json
+import pytest
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import main
+from instrumentation import new_report, measure, write_report
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a config file with a run report and stubbed stage functions' outputs."""
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f"""
+[settings]
+gas_data_url = "https://example.com/gas.xls"
+ev_sales_data_url = "https://example.com/ev.csv"
+data_dir = "{tmp_path.as_posix()}"
+gas_data_file = "raw_Gas.xls"
+ev_sales_data_file = "raw_ev_sales.csv"
+gas_db_file = "gas.db"
+ev_sales_db_file = "ev_sales.db"
+gas_output_csv_file = "gas.csv"
+ev_output_csv_file = "ev.csv"
+merged_output_csv_file = "merged.csv"
+log_file = "log.txt"
+sep_log_file = "sep_log.txt"
+merged_db_file = "merged.db"
+run_report_file = "run_report.json"
+trace_memory = true
+profile_stages = true
+""")
+    return config_path, tmp_path
+
+def test_measure_records_metrics_and_failures(tmp_path):
+    """Test that measured stages record timings, rows and bytes, including failed stages."""
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"x" * 2048)
+    report = new_report()
+
+    with measure(report, "copy", files_in=[str(source)], files_out=[str(tmp_path / "copy.bin")],
+                 rows_in=lambda: 10, rows_out=lambda: 7, trace_memory=True):
+        (tmp_path / "copy.bin").write_bytes(source.read_bytes() * 2)
+        [bytearray(1024) for _ in range(100)]
+    with pytest.raises(RuntimeError):
+        with measure(report, "broken"):
+            raise RuntimeError("disk full")
+
+    copy, broken = report["stages"]
+    assert (copy["status"], copy["rows_in"], copy["rows_out"]) == ("ran", 10, 7)
+    assert (copy["bytes_read"], copy["bytes_written"]) == (2048, 4096)
+    assert copy["wall_seconds"] >= 0 and copy["cpu_seconds"] >= 0
+    assert copy["tracemalloc_peak_bytes"] > 0
+    assert (broken["status"], broken["error"]) == ("failed", "disk full")
+    assert "rows_out" not in broken
+
+    written = write_report(report, str(tmp_path / "report.json"))
+    with open(tmp_path / "report.json") as report_file:
+        assert json.load(report_file) == written
+
+def test_overlapping_stages_share_the_tracer(tmp_path):
+    """Test that stages measured on parallel threads keep one tracemalloc session and are marked as overlapping."""
+    import threading
+    import tracemalloc
+    report = new_report()
+    first_started, second_done = threading.Event(), threading.Event()
+
+    def first():
+        with measure(report, "first", trace_memory=True):
+            first_started.set()
+            second_done.wait(timeout=10)
+            # The second stage ended in the meantime; tracing must still be on
+            assert tracemalloc.is_tracing()
+            [bytearray(1024) for _ in range(100)]
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    first_started.wait(timeout=10)
+    with measure(report, "second", trace_memory=True):
+        [bytearray(1024) for _ in range(10)]
+    second_done.set()
+    thread.join()
+
+    stages = {record["name"]: record for record in report["stages"]}
+    assert stages["first"]["status"] == "ran"
+    assert stages["first"]["overlapped_with"] == ["second"] and stages["second"]["overlapped_with"] == ["first"]
+    assert stages["first"]["tracemalloc_peak_bytes"] >= 100 * 1024
+    assert not tracemalloc.is_tracing()
+    assert "peak_rss_bytes" not in stages["first"]
+
+def test_pipeline_writes_run_report(setup_environment, monkeypatch):
+    """Test that pipeline() measures each stage and writes the JSON run report with cProfile dumps."""
+    config_path, tmp_path = setup_environment
+
+    def fake_ingest(file_path, db_path, **kwargs):
+        conn = sqlite3.connect(db_path)
+        table = "gasoline_prices" if db_path.endswith("gas.db") else "ev_sales"
+        conn.execute(f"CREATE TABLE {table} (value INTEGER)")
+        conn.executemany(f"INSERT INTO {table} VALUES (?)", [(i,) for i in range(3)])
+        conn.commit()
+        conn.close()
+
+    def fake_merge(config, paths, since=None):
+        conn = sqlite3.connect(paths["merged_db"])
+        conn.execute("CREATE TABLE merged_data (value INTEGER)")
+        conn.execute("INSERT INTO merged_data VALUES (1)")
+        conn.commit()
+        conn.close()
+
+    monkeypatch.setattr(main, "fetch_and_log", lambda url, save_to, **kwargs: True)
+    monkeypatch.setattr(main, "extract_process_gas_data", fake_ingest)
+    monkeypatch.setattr(main, "extract_process_ev_data", fake_ingest)
+    monkeypatch.setattr(main, "merge_for_analysis", fake_merge)
+    monkeypatch.setattr(main, "basic_analysis", lambda *args, **kwargs: None)
+
+    main.pipeline(str(config_path))
+
+    with open(tmp_path / "run_report.json") as report_file:
+        report = json.load(report_file)
+    stages = {record["name"]: record for record in report["stages"]}
+    assert list(stages) == ["fetch_gas", "fetch_ev", "ingest_gas", "ingest_ev", "merge", "plot"]
+    assert stages["ingest_gas"]["rows_out"] == 3
+    assert (stages["merge"]["rows_in"], stages["merge"]["rows_out"]) == (6, 1)
+    assert stages["plot"]["rows_in"] == 1
+    assert all(os.path.exists(record["profile"]) for record in stages.values())
+    assert report["wall_seconds"] >= 0
@@ -0,0 +1,106 @@
+import os
+import json
+import pytest
+import sqlite3
+import threading
+import urllib.request
+import urllib.error
+import pandas as pd
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import query_service
+from data_transform.ev_sales_data import save_to_partitions
+from data_transform.ev_cube import update_ev_cube
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup merged, EV and gas stores and a running query server."""
+    paths = {name: str(tmp_path / f"{name}.db") for name in ("merged_db", "ev_db", "gas_db")}
+    merged_df = pd.DataFrame({
+        "timestamp": pd.date_range("2022-10-31", periods=6, freq="ME").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": [3.0, 3.2, 3.4, 3.6, 3.8, 4.0],
+        "volume": [10, 20, 30, 40, 50, 60],
+    })
+    conn = sqlite3.connect(paths["merged_db"])
+    conn.execute("PRAGMA journal_mode=WAL")
+    merged_df.to_sql("merged_data", conn, index=False)
+    conn.close()
+    save_to_partitions(pd.DataFrame({
+        "registration_date": pd.to_datetime(["2022-11-02", "2022-12-24", "2023-01-05", "2023-01-09", "2024-02-01"]),
+        "vehicle_name": list("ABABC"),
+    }), paths["ev_db"], compact=True)
+
+    query_service.response_cache.clear()
+    server = query_service.make_server(paths, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", paths
+    server.shutdown()
+    server.server_close()
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers.get("ETag"), json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, e.headers.get("ETag"), json.loads(body) if body else None
+
+def test_series_by_granularity(setup_environment):
+    """Test date filtering and quarter/year roll-ups of merged_data."""
+    base_url, _ = setup_environment
+    status, _, monthly = get(f"{base_url}/series?from=2022-12&to=2023-01")
+    assert status == 200
+    assert [row["period"] for row in monthly["rows"]] == ["2022-12", "2023-01"]
+
+    _, _, quarterly = get(f"{base_url}/series?granularity=quarter")
+    assert [(row["period"], row["volume"]) for row in quarterly["rows"]] == [("2022-Q4", 60), ("2023-Q1", 150)]
+    assert quarterly["rows"][0]["price"] == pytest.approx(3.2)
+
+    _, _, ev = get(f"{base_url}/ev?from=2023-01&to=2023-12&granularity=year")
+    assert ev["rows"] == [{"period": "2023", "volume": 2}]
+
+def test_etag_and_invalidation(setup_environment):
+    """Test 304 responses for unchanged data and cache invalidation after a write."""
+    base_url, paths = setup_environment
+    url = f"{base_url}/series?granularity=year"
+    status, etag, first = get(url)
+    assert status == 200 and etag
+    status, same_etag, body = get(url, etag=etag)
+    assert (status, same_etag, body) == (304, etag, None)
+
+    conn = sqlite3.connect(paths["merged_db"])
+    conn.execute("UPDATE merged_data SET volume = volume + 1")
+    conn.commit()
+    conn.close()
+    status, new_etag, second = get(url, etag=etag)
+    assert status == 200 and new_etag != etag
+    assert second["rows"][1]["volume"] == first["rows"][1]["volume"] + 3
+
+def test_ev_drill_down_from_cube(setup_environment):
+    """Test that /ev rolls up the cube and drills down by vehicle once the cube exists."""
+    base_url, paths = setup_environment
+    assert get(f"{base_url}/ev?vehicle=A")[0] == 400
+    update_ev_cube(paths["ev_db"])
+    _, _, ev = get(f"{base_url}/ev?from=2023-01&to=2023-12&granularity=year")
+    assert ev["rows"] == [{"period": "2023", "volume": 2}]
+    _, _, by_vehicle = get(f"{base_url}/ev?granularity=quarter&by=vehicle_name")
+    assert [(row["period"], row["vehicle_name"], row["volume"]) for row in by_vehicle["rows"]] == [
+        ("2022-Q4", "A", 1), ("2022-Q4", "B", 1), ("2023-Q1", "A", 1), ("2023-Q1", "B", 1), ("2024-Q1", "C", 1),
+    ]
+    _, _, filtered = get(f"{base_url}/ev?vehicle=A")
+    assert [(row["period"], row["volume"]) for row in filtered["rows"]] == [("2022-11", 1), ("2023-01", 1)]
+    assert get(f"{base_url}/ev?by=county")[0] == 400
+
+def test_errors(setup_environment):
+    """Test error responses for bad parameters, unknown endpoints and missing stores."""
+    base_url, _ = setup_environment
+    assert get(f"{base_url}/series?granularity=week")[0] == 400
+    assert get(f"{base_url}/series?from=notadate")[0] == 400
+    assert get(f"{base_url}/nothing")[0] == 404
+    assert get(f"{base_url}/gas")[0] == 503
+    assert get(f"{base_url}/health")[2]["stores"] == {"merged": True, "ev": True, "gas": False}
@@ -0,0 +1,83 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import sqlite3
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from analytics.rolling_stats import new_window, push, update_rolling_stats, load_rolling_stats
+
+def merged_frame(months, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2015-01-31", periods=months, freq="ME").strftime("%Y-%m-%d %H:%M:%S"),
+        "price": np.round(3 + rng.normal(0, 0.3, months).cumsum(), 3),
+        "volume": rng.integers(100, 5000, months),
+    })
+
+def expected_stats(merged_df, window):
+    """Reference rolling statistics computed over the full history with pandas."""
+    rolling = merged_df[["price", "volume"]].astype(float).rolling(window)
+    mean, std = rolling.mean(), rolling.std()
+    return pd.DataFrame({
+        "price_mean": mean["price"],
+        "price_std": std["price"],
+        "price_zscore": (merged_df["price"] - mean["price"]) / std["price"],
+        "volume_mean": mean["volume"],
+        "volume_std": std["volume"],
+        "volume_zscore": (merged_df["volume"] - mean["volume"]) / std["volume"],
+        "price_volume_corr": merged_df["price"].rolling(window).corr(merged_df["volume"].astype(float)),
+    })
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a merged_data table holding the first 30 of 40 months."""
+    db_path = tmp_path / "merged.db"
+    merged_df = merged_frame(40)
+    conn = sqlite3.connect(db_path)
+    merged_df.iloc[:30].to_sql("merged_data", conn, index=False)
+    conn.close()
+    return str(db_path), merged_df
+
+def test_streaming_window_matches_pandas():
+    """Test that the Welford window reproduces pandas' rolling statistics."""
+    merged_df = merged_frame(50, seed=1)
+    state = new_window(6)
+    results = [push(state, price, volume) or {} for price, volume in zip(merged_df["price"], merged_df["volume"])]
+    result = pd.DataFrame(results, columns=expected_stats(merged_df, 6).columns, dtype=float)
+    pd.testing.assert_frame_equal(result, expected_stats(merged_df, 6), rtol=1e-9)
+
+def test_appended_months_update_incrementally(setup_environment):
+    """Test that appended and revised months only recompute the affected tail of rolling_stats."""
+    db_path, merged_df = setup_environment
+    assert update_rolling_stats(db_path, window=12) == 30
+    assert update_rolling_stats(db_path, window=12) == 0
+
+    conn = sqlite3.connect(db_path)
+    merged_df.iloc[30:].to_sql("merged_data", conn, index=False, if_exists="append")
+    conn.commit()
+    conn.close()
+    assert update_rolling_stats(db_path, window=12) == 10
+
+    # A revised month recomputes only that month and the ones after it
+    merged_df.loc[35, "volume"] += 1000
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE merged_data SET volume = ? WHERE timestamp = ?", (int(merged_df.loc[35, "volume"]), merged_df.loc[35, "timestamp"]))
+    conn.commit()
+    conn.close()
+    assert update_rolling_stats(db_path, window=12) == 5
+
+    result = load_rolling_stats(db_path)
+    assert len(result) == 40 and result["window_size"].eq(12).all()
+    pd.testing.assert_frame_equal(result[expected_stats(merged_df, 12).columns], expected_stats(merged_df, 12), rtol=1e-9)
+
+    # Changing the window recomputes everything
+    assert update_rolling_stats(db_path, window=3) == 40
+
+def test_window_too_small():
+    """Test that a window needs at least two observations for a variance."""
+    with pytest.raises(ValueError):
+        new_window(1)
@@ -0,0 +1,151 @@
+import os
+import pytest
+import sys
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from stage_cache import stage, run_stages
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a two-stage DAG that copies a source file and then counts its lines."""
+    source = tmp_path / "source.txt"
+    copied = tmp_path / "copied.txt"
+    counted = tmp_path / "counted.txt"
+    cache_path = tmp_path / "stage_cache.json"
+    source.write_text("a\nb\n")
+    calls = []
+
+    def build(year):
+        def copy():
+            calls.append("copy")
+            copied.write_text(source.read_text())
+
+        def count():
+            calls.append("count")
+            counted.write_text(f"{year}:{len(copied.read_text().splitlines())}")
+
+        return [
+            stage("count", count, inputs=[str(copied)], outputs=[str(counted)], params={"year": year}, deps=["copy"]),
+            stage("copy", copy, inputs=[str(source)], outputs=[str(copied)]),
+        ]
+
+    return {"build": build, "calls": calls, "source": source, "counted": counted, "cache": str(cache_path)}
+
+def test_unchanged_stages_are_skipped(setup_environment):
+    """Test that a rerun with identical inputs and params skips every stage."""
+    env = setup_environment
+
+    assert run_stages(env["build"](2023), env["cache"]) == {"copy": "ran", "count": "ran"}
+    assert run_stages(env["build"](2023), env["cache"]) == {"copy": "skipped", "count": "skipped"}
+    assert env["calls"] == ["copy", "count"]
+
+def test_param_change_reruns_only_downstream(setup_environment):
+    """Test that changing a stage parameter reruns that stage but not its upstream."""
+    env = setup_environment
+    run_stages(env["build"](2023), env["cache"])
+
+    results = run_stages(env["build"](2024), env["cache"])
+
+    assert results == {"copy": "skipped", "count": "ran"}
+    assert env["counted"].read_text() == "2024:2"
+
+def test_input_change_and_missing_output_rerun(setup_environment):
+    """Test that new input content or a deleted output invalidates the cache."""
+    env = setup_environment
+    run_stages(env["build"](2023), env["cache"])
+
+    env["source"].write_text("a\nb\nc\n")
+    assert run_stages(env["build"](2023), env["cache"]) == {"copy": "ran", "count": "ran"}
+    assert env["counted"].read_text() == "2023:3"
+
+    os.remove(env["counted"])
+    assert run_stages(env["build"](2023), env["cache"]) == {"copy": "skipped", "count": "ran"}
+
+def test_wal_writes_reach_downstream_keys(tmp_path):
+    """Test that rows committed to a WAL database by a pooled writer rerun the stages that read it."""
+    import data_transform.storage as storage
+    source = tmp_path / "source.txt"
+    db_path = str(tmp_path / "store.db")
+    total = tmp_path / "total.txt"
+    cache_path = str(tmp_path / "stage_cache.json")
+    calls = []
+
+    def ingest():
+        calls.append("ingest")
+        with storage.transaction(db_path) as conn:
+            conn.execute("DROP TABLE IF EXISTS rows")
+            conn.execute("CREATE TABLE rows (value INTEGER)")
+            conn.executemany("INSERT INTO rows VALUES (?)", [(int(v),) for v in source.read_text().split()])
+
+    def summarize():
+        calls.append("summarize")
+        conn = storage.get_connection(db_path)
+        total.write_text(str(conn.execute("SELECT SUM(value) FROM rows").fetchone()[0]))
+        storage.release(conn)
+
+    stages = [
+        stage("ingest", ingest, inputs=[str(source)], outputs=[db_path]),
+        stage("summarize", summarize, inputs=[db_path], outputs=[str(total)], deps=["ingest"]),
+    ]
+    storage.configure(journal_mode="WAL")
+    try:
+        source.write_text("1 2")
+        assert run_stages(stages, cache_path) == {"ingest": "ran", "summarize": "ran"}
+        assert run_stages(stages, cache_path) == {"ingest": "skipped", "summarize": "skipped"}
+        source.write_text("1 2 3")
+        assert run_stages(stages, cache_path) == {"ingest": "ran", "summarize": "ran"}
+        assert total.read_text() == "6"
+        assert calls == ["ingest", "summarize", "ingest", "summarize"]
+    finally:
+        storage.close_all()
+
+def test_independent_stages_overlap(tmp_path):
+    """Test that a ready stage starts while an independent one is still running, and writers of one file never overlap."""
+    import threading
+    gas_ingested = threading.Event()
+    active, overlaps, seen = set(), [], []
+    lock = threading.Lock()
+
+    def step(name, wait_for=None, done=None):
+        def run():
+            with lock:
+                overlaps.append((name, sorted(active)))
+                active.add(name)
+            if wait_for is not None:
+                seen.append(wait_for.wait(timeout=10))
+            if done is not None:
+                done.set()
+            with lock:
+                active.discard(name)
+        return run
+
+    store = str(tmp_path / "store.db")
+    stages = [
+        stage("fetch_gas", step("fetch_gas"), outputs=[str(tmp_path / "gas.xls")]),
+        stage("fetch_ev", step("fetch_ev", wait_for=gas_ingested), outputs=[str(tmp_path / "ev.csv")]),
+        stage("ingest_gas", step("ingest_gas", done=gas_ingested), inputs=[str(tmp_path / "gas.xls")], outputs=[store], deps=["fetch_gas"]),
+        stage("ingest_ev", step("ingest_ev"), inputs=[str(tmp_path / "ev.csv")], outputs=[store], deps=["fetch_ev"]),
+    ]
+    assert run_stages(stages, max_workers=4) == {"fetch_gas": "ran", "fetch_ev": "ran", "ingest_gas": "ran", "ingest_ev": "ran"}
+    # fetch_ev only returns once ingest_gas has run next to it
+    assert seen == [True]
+    assert all("ingest_gas" not in others for name, others in overlaps if name == "ingest_ev")
+
+def test_failed_stage_stops_scheduling(setup_environment):
+    """Test that a failing stage raises after the running stages finish and its dependents never start."""
+    env = setup_environment
+    calls = []
+
+    def fail():
+        raise ValueError("broken source")
+
+    stages = [
+        stage("broken", fail),
+        stage("after", lambda: calls.append("after"), deps=["broken"]),
+        stage("slow", lambda: calls.append("slow")),
+    ]
+    with pytest.raises(ValueError):
+        run_stages(stages, env["cache"], max_workers=2)
+    assert "after" not in calls
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import pytest
+import sys
+import pandas as pd
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import data_transform.storage as storage
+
+@pytest.fixture
+def setup_environment(tmp_path):
+    """Setup a frame with timestamps and nullable columns, and reset the shared settings afterwards."""
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-01", periods=3, freq="MS"),
+        "price": pd.array([3.1, None, 3.3], dtype="Float64"),
+        "volume": pd.array([10, 20, None], dtype="Int64"),
+    })
+    yield df, str(tmp_path / "store.db")
+    storage.configure(journal_mode='WAL', synchronous='NORMAL', pool=True, bulk_load=False,
+                      batch_size=storage.BATCH_SIZE)
+
+def test_write_frame_round_trip(setup_environment):
+    """Test rows, NULLs, timestamps and indexes written through the shared writer."""
+    df, db_path = setup_environment
+    storage.configure(batch_size=2, bulk_load=True)
+
+    assert storage.write_frame(db_path, "merged_data", df, indexes=["timestamp"]) == 3
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT timestamp, price, volume FROM merged_data ORDER BY timestamp").fetchall()
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(merged_data)")]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert rows == [
+        ("2023-01-01 00:00:00", 3.1, 10),
+        ("2023-02-01 00:00:00", None, 20),
+        ("2023-03-01 00:00:00", 3.3, None),
+    ]
+    assert indexes == ["idx_merged_data_timestamp"]
+    assert journal_mode == "wal"
+
+def test_transaction_rolls_back_on_error(setup_environment):
+    """Test that a failing load leaves the previous table contents untouched."""
+    df, db_path = setup_environment
+    storage.write_frame(db_path, "merged_data", df)
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction(db_path) as conn:
+            storage.insert_frame(conn, "merged_data", df)
+            raise RuntimeError("load failed")
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM merged_data").fetchone()[0] == 3
+
+def test_read_connections_are_pooled_and_read_only(setup_environment):
+    """Test that read-only connections are reused and cannot write."""
+    df, db_path = setup_environment
+    storage.configure(journal_mode='DELETE')
+    storage.write_frame(db_path, "merged_data", df)
+
+    with storage.read_connection(db_path) as first:
+        assert first.execute("SELECT COUNT(*) FROM merged_data").fetchone()[0] == 3
+        with pytest.raises(sqlite3.OperationalError):
+            first.execute("DELETE FROM merged_data")
+    with storage.read_connection(db_path) as second:
+        assert second is first
+
+    # A replaced database file is reopened instead of reading the old one
+    storage.write_frame(db_path + ".new", "merged_data", df.iloc[:1])
+    os.replace(db_path + ".new", db_path)
+    with storage.read_connection(db_path) as third:
+        assert third is not first
+        assert third.execute("SELECT COUNT(*) FROM merged_data").fetchone()[0] == 1
+
+def test_worker_thread_connections_are_closed(setup_environment):
+    """Test that writers on worker threads are closed on release while the main thread's stays pooled."""
+    from concurrent.futures import ThreadPoolExecutor
+    df, db_path = setup_environment
+    storage.write_frame(db_path, "merged_data", df)
+    main_conn = storage.get_connection(db_path)
+    storage.release(main_conn)
+    assert storage.get_connection(db_path) is main_conn
+
+    def write_on_worker():
+        with storage.transaction(db_path) as conn:
+            storage.insert_frame(conn, "merged_data", df)
+        return conn
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        worker_conns = list(executor.map(lambda _: write_on_worker(), range(4)))
+
+    for conn in worker_conns:
+        assert conn is not main_conn
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    assert [entry[0] for entry in storage.pool.values()] == [main_conn]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM merged_data").fetchone()[0] == 15